@@ -24,12 +24,69 @@ PROD_MODEL_PATH = os.getenv(
 )
 ANOMALY_MODEL_PATH = '/app/data/models/anomaly_detector.pkl'
 
+# Local Parquet lake written by the trips_lake asset (hive layout year=/month=)
+LAKE_PATH = os.getenv(
+    'LAKE_PATH',
+    str(Path(__file__).parent / '..' / '..' / '..' / '..' / 'data' / 'lake'),
+)
+LAKE_TRIPS_GLOB = os.path.join(LAKE_PATH, 'trips', '**', '*.parquet')
+
+# Holiday calendar written by the raw_holidays_data asset (and read by the API)
+HOLIDAY_CALENDAR_PATH = os.getenv(
+    'HOLIDAY_CALENDAR_PATH',
+    str(
+        Path(__file__).parent
+        / '..'
+        / '..'
+        / '..'
+        / '..'
+        / 'data'
+        / 'reference'
+        / 'holiday_calendar.bin'
+    ),
+)
+
+# Engineered training frames, reused while the source data is unchanged
+FEATURE_CACHE_DIR = os.getenv(
+    'FEATURE_CACHE_DIR',
+    str(
+        Path(__file__).parent
+        / '..'
+        / '..'
+        / '..'
+        / '..'
+        / 'data'
+        / 'cache'
+        / 'features'
+    ),
+)
+# Least recently used entries are evicted beyond this size
+FEATURE_CACHE_MAX_BYTES = int(os.getenv('FEATURE_CACHE_MAX_BYTES', str(5 * 1024**3)))
+
 # MLflow Configuration
 MLFLOW_TRACKING_URI = os.getenv('MLFLOW_TRACKING_URI', 'sqlite:///mlflow.db')
 EXPERIMENT_NAME = 'price_prediction_v2'
 ANOMALY_EXPERIMENT_NAME = 'anomaly_detection_v1'
 
 # Data Configuration
+ANOMALY_ROW_LIMIT = 100_000
+
+# Full loads are split by pickup zone into this many queries, which
+# connectorx runs in parallel over separate connections
+DATA_PARTITION_COLUMN = 'pickup_location_id'
+DATA_PARTITION_RANGE = (1, 265)  # TLC taxi zone ids
+DATA_PARTITIONS = int(os.getenv('DATA_PARTITIONS', '4'))
+
+# In-memory loads without a start date cover this many months, up to the
+# latest pickup; only streaming training reads all history by default
+DATA_DEFAULT_MONTHS = int(os.getenv('DATA_DEFAULT_MONTHS', '3'))
+
+# Streaming (external memory) training: rows per Arrow batch read from the source
+DATA_BATCH_ROWS = int(os.getenv('DATA_BATCH_ROWS', '100000'))
+# Where the streamed batches are spilled (Arrow IPC) and XGBoost keeps its pages
+DATA_SPILL_DIR = os.getenv('DATA_SPILL_DIR') or None  # None: a temporary directory
+
+# {pickup_filter} restricts pickup_datetime to the requested window, if any
 DATA_QUERY = """
 SELECT 
     pickup_location_id,
@@ -42,21 +99,33 @@ SELECT
     case when is_holiday then 1 else 0 end as is_holiday_int
 FROM dbt_dev.fct_trips
 WHERE total_amount > 0 AND total_amount < 200 AND trip_distance > 0
-LIMIT 500000
+{pickup_filter}
 """
 
-ANOMALY_DATA_QUERY = """
+ANOMALY_DATA_QUERY = f"""
 SELECT 
     trip_distance,
     total_amount,
     EXTRACT(EPOCH FROM (dropoff_datetime - pickup_datetime)) as duration_seconds
 FROM dbt_dev.fct_trips
 WHERE total_amount > 0 AND trip_distance > 0
-LIMIT 100000
+LIMIT {ANOMALY_ROW_LIMIT}
 """
 
 # Feature Configuration
 CATEGORICAL_FEATURES = ['pickup_location_id', 'dropoff_location_id', 'pickup_day']
+# Every level of each categorical feature, so the one-hot columns do not
+# depend on which zones happen to be in the (first) training batch
+CATEGORY_LEVELS = {
+    'pickup_location_id': list(range(1, 266)),
+    'dropoff_location_id': list(range(1, 266)),
+    'pickup_day': list(range(1, 8)),  # ISO weekday
+}
+# How the categorical features reach the model:
+#   onehot  dense one-hot columns (one per level, ~540 in all)
+#   sparse  the same one-hot columns, kept in a sparse matrix end to end
+#   native  one integer code per feature, split on natively (XGBoost only)
+ENCODINGS = ['onehot', 'sparse', 'native']
 NUMERICAL_FEATURES = [
     'pickup_hour',
     'trip_distance',
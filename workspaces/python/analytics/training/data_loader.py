@@ -1,22 +1,151 @@
+import datetime
+import os
+import struct
+
+import connectorx as cx
+import numpy as np
 import polars as pl
 from sklearn.model_selection import train_test_split
 
 from .config import (
     ANOMALY_DATA_QUERY,
     ANOMALY_NUMERICAL_FEATURES,
+    ANOMALY_ROW_LIMIT,
+    DATA_BATCH_ROWS,
+    DATA_DEFAULT_MONTHS,
+    DATA_PARTITION_COLUMN,
+    DATA_PARTITION_RANGE,
+    DATA_PARTITIONS,
     DATA_QUERY,
     DB_URI,
+    HOLIDAY_CALENDAR_PATH,
+    LAKE_TRIPS_GLOB,
     TARGET_COLUMN,
 )
+from .feature_cache import cache_key, cached_frame, source_watermark
+
+# Header of the holiday calendar file. Copied from its owner,
+# pipelines/orchestrator/utils/holiday_calendar.py; kept in step by
+# pipelines/tests/test_holiday_calendar.py
+CALENDAR_MAGIC = b'MFHC'
+CALENDAR_VERSION = 1
+CALENDAR_HEADER = struct.Struct('<4sHHiI')
+
+# Model inputs, in the order the API builds them
+FEATURE_COLUMNS = [
+    'pickup_location_id',
+    'dropoff_location_id',
+    'pickup_hour',
+    'pickup_day',
+    'trip_distance',
+    'precip_mm',
+    'temp_c',
+    'is_holiday_int',
+]
+
+
+def holiday_flags(dates, path=HOLIDAY_CALENDAR_PATH):
+    """
+    Vectorized is-holiday lookup (0/1) of a Date/Datetime series in the
+    holiday calendar file, so training sees the same holidays as the API.
+    None if the file is not a calendar this code can read.
+    """
+    if os.path.getsize(path) < CALENDAR_HEADER.size:
+        print(f'⚠️ Unsupported holiday calendar: {path}')
+        return None
+    calendar = np.memmap(path, dtype=np.uint8, mode='r')
+    magic, version, _, first_day, days = CALENDAR_HEADER.unpack_from(calendar)
+    if magic != CALENDAR_MAGIC or version != CALENDAR_VERSION:
+        print(f'⚠️ Unsupported holiday calendar: {path}')
+        return None
+    codes = calendar[CALENDAR_HEADER.size : CALENDAR_HEADER.size + days]
+
+    index = (dates.cast(pl.Date).cast(pl.Int32) - first_day).fill_null(-1).to_numpy()
+    inside = (index >= 0) & (index < days)
+    flags = np.zeros(len(index), dtype=np.int64)
+    flags[inside] = codes[index[inside]] > 0
+    return pl.Series('is_holiday_int', flags)
+
+
+def scan_lake():
+    """Lazily scan the enriched trips in the local Parquet lake."""
+    return pl.scan_parquet(LAKE_TRIPS_GLOB, hive_partitioning=True)
+
+
+def _pickup_window(start=None, end=None):
+    """[start, end) as datetimes; either bound may be None or an ISO date string."""
+    return tuple(
+        datetime.datetime.fromisoformat(bound) if isinstance(bound, str) else bound
+        for bound in (start, end)
+    )
+
+
+def _lake_trips(start=None, end=None):
+    """The training columns of the lake trips picked up in [start, end)."""
+    start, end = _pickup_window(start, end)
+    trips = scan_lake()
+    if start is not None:
+        trips = trips.filter(pl.col('pickup_datetime') >= start)
+    if end is not None:
+        trips = trips.filter(pl.col('pickup_datetime') < end)
+    return trips.filter(
+        (pl.col('total_amount') > 0)
+        & (pl.col('total_amount') < 200)
+        & (pl.col('trip_distance') > 0)
+    ).select(
+        'pickup_location_id',
+        'dropoff_location_id',
+        'pickup_datetime',
+        'trip_distance',
+        'total_amount',
+        pl.col('precip_mm').fill_null(0),
+        pl.col('temp_c').fill_null(15),
+        pl.col('is_holiday').cast(pl.Int64).alias('is_holiday_int'),
+    )
+
+
+def recent_start(source='postgres', end=None, months=DATA_DEFAULT_MONTHS):
+    """
+    First day of the `months`-month window ending with the month of the
+    latest pickup before `end`, or None if there are no trips.
+    """
+    _, end = _pickup_window(None, end)
+    if source == 'lake':
+        trips = _lake_trips(None, end)
+        latest = trips.select(pl.col('pickup_datetime').max()).collect().item()
+    else:
+        before = f"WHERE pickup_datetime < '{end}'" if end is not None else ''
+        latest = pl.read_database_uri(
+            query=f'SELECT max(pickup_datetime) FROM dbt_dev.fct_trips {before}',
+            uri=DB_URI,
+            engine='connectorx',
+        ).item()
+    if latest is None:
+        return None
+    month = latest.year * 12 + latest.month - months
+    return datetime.datetime(month // 12, month % 12 + 1, 1)
+
+
+def _trips_query(start=None, end=None):
+    """DATA_QUERY for the trips picked up in [start, end)."""
+    start, end = _pickup_window(start, end)
+    pickup_filter = ''
+    if start is not None:
+        pickup_filter += f"AND pickup_datetime >= '{start}' "
+    if end is not None:
+        pickup_filter += f"AND pickup_datetime < '{end}'"
+    return DATA_QUERY.format(pickup_filter=pickup_filter)
 
 
-def load_data():
-    """Load and preprocess data from database."""
-    print('Loading data from Postgres via Polars...')
-    df = pl.read_database_uri(query=DATA_QUERY, uri=DB_URI, engine='connectorx')
+def add_features(df):
+    """Feature engineering on raw training rows (see DATA_QUERY)."""
+    # Otherwise is_holiday_int stays as the query returned it
+    if os.path.exists(HOLIDAY_CALENDAR_PATH):
+        flags = holiday_flags(df['pickup_datetime'])
+        if flags is not None:
+            df = df.with_columns(flags)
 
-    # Feature Engineering
-    df = df.with_columns(
+    return df.with_columns(
         [
             pl.col('pickup_datetime').dt.hour().cast(pl.Float32).alias('pickup_hour'),
             pl.col('pickup_datetime').dt.weekday().cast(pl.Int64).alias('pickup_day'),
@@ -30,30 +159,137 @@ def load_data():
         ]
     ).drop_nulls()
 
-    return df
 
+def load_data(source='postgres', start=None, end=None, cache=True):
+    """
+    Load and preprocess the trips picked up in [start, end) from the
+    database (or the local Parquet lake). Without `start`, only the last
+    DATA_DEFAULT_MONTHS months of data are loaded (see recent_start).
+
+    Postgres is read in DATA_PARTITIONS parallel queries, split on
+    DATA_PARTITION_COLUMN. Everything is held in memory; use iter_batches
+    for windows that do not fit.
+
+    With `cache`, the result is kept in the feature cache and reused (memory-
+    mapped, without querying the trips) until the source data changes.
+    """
+    if start is None:
+        start = recent_start(source, end)
+        print(f'No start date: loading pickups from {start} on.')
+
+    if cache:
+        key = cache_key(
+            dataset='price',
+            source=source,
+            query=_trips_query(start, end) if source != 'lake' else None,
+            window=_pickup_window(start, end),
+            features=[*FEATURE_COLUMNS, TARGET_COLUMN],
+            watermark=source_watermark(source),
+        )
+        return cached_frame(key, lambda: load_data(source, start, end, cache=False))
+
+    if source == 'lake':
+        print('Loading data from the Parquet lake via Polars...')
+        df = _lake_trips(start, end).collect()
+    else:
+        print(
+            f'Loading data from Postgres via connectorx ({DATA_PARTITIONS} partitions)...'
+        )
+        df = pl.read_database_uri(
+            query=_trips_query(start, end),
+            uri=DB_URI,
+            engine='connectorx',
+            partition_on=DATA_PARTITION_COLUMN,
+            partition_range=DATA_PARTITION_RANGE,
+            partition_num=DATA_PARTITIONS,
+        )
+
+    return add_features(df)
+
+
+def iter_batches(source='postgres', start=None, end=None, batch_rows=DATA_BATCH_ROWS):
+    """
+    Like load_data, but yields the trips in batches of at most `batch_rows`
+    rows as they arrive (an Arrow record batch stream from Postgres, a
+    streaming scan of the lake), so memory stays bounded by the batch size.
+    """
+    if source == 'lake':
+        print('Streaming data from the Parquet lake via Polars...')
+        batches = _lake_trips(start, end).collect_batches(chunk_size=batch_rows)
+    else:
+        print('Streaming data from Postgres via connectorx...')
+        reader = cx.read_sql(
+            DB_URI,
+            _trips_query(start, end),
+            return_type='arrow_stream',
+            batch_size=batch_rows,
+        )
+        batches = (pl.from_arrow(batch) for batch in reader)
+
+    for batch in batches:
+        if batch.height:
+            yield add_features(batch)
+
+
+def spill_batches(batches, directory, test_size=0.2, random_state=42):
+    """
+    Writes each batch to `directory` as an Arrow IPC file, holding out a
+    random `test_size` share of its rows in a separate file. Returns the
+    train and test paths.
+
+    The source is read once; training re-reads the files, memory-mapped,
+    as many times as it needs.
+    """
+    rng = np.random.default_rng(random_state)
+    train_paths, test_paths = [], []
+    for number, batch in enumerate(batches):
+        held_out = pl.Series(rng.random(batch.height) < test_size)
+        for part, paths, name in (
+            (batch.filter(~held_out), train_paths, 'train'),
+            (batch.filter(held_out), test_paths, 'test'),
+        ):
+            if part.height:
+                path = os.path.join(directory, f'{name}_{number:05d}.arrow')
+                part.write_ipc(path)
+                paths.append(path)
+    return train_paths, test_paths
+
+
+def load_anomaly_data(source='postgres', cache=True):
+    """Load data for anomaly detection (through the feature cache, see load_data)."""
+    if cache:
+        key = cache_key(
+            dataset='anomaly',
+            source=source,
+            query=ANOMALY_DATA_QUERY if source != 'lake' else None,
+            features=ANOMALY_NUMERICAL_FEATURES,
+            watermark=source_watermark(source),
+        )
+        return cached_frame(key, lambda: load_anomaly_data(source, cache=False))
 
-def load_anomaly_data():
-    """Load data for anomaly detection."""
     print('Loading recent data for Anomaly Baseline...')
+    if source == 'lake':
+        return (
+            scan_lake()
+            .filter((pl.col('total_amount') > 0) & (pl.col('trip_distance') > 0))
+            .select(
+                'trip_distance',
+                'total_amount',
+                (pl.col('dropoff_datetime') - pl.col('pickup_datetime'))
+                .dt.total_seconds()
+                .cast(pl.Float64)
+                .alias('duration_seconds'),
+            )
+            .head(ANOMALY_ROW_LIMIT)
+            .collect()
+        )
     df = pl.read_database_uri(query=ANOMALY_DATA_QUERY, uri=DB_URI, engine='connectorx')
     return df
 
 
 def prepare_features(df):
     """Split features and target, then train/test split."""
-    feature_cols = [
-        'pickup_location_id',
-        'dropoff_location_id',
-        'pickup_hour',
-        'pickup_day',
-        'trip_distance',
-        'precip_mm',
-        'temp_c',
-        'is_holiday_int',
-    ]
-
-    X = df.select(feature_cols).to_pandas()
+    X = df.select(FEATURE_COLUMNS).to_pandas()
     y = df.select(TARGET_COLUMN).to_pandas()[TARGET_COLUMN]
 
     return train_test_split(X, y, test_size=0.2, random_state=42)
@@ -0,0 +1,72 @@
+import numpy as np
+import polars as pl
+import xgboost as xgb
+from scipy import sparse
+
+from .config import TARGET_COLUMN
+from .data_loader import FEATURE_COLUMNS
+
+
+def read_spilled(path, preprocessor):
+    """Features (preprocessed, float32) and target of one spilled batch."""
+    df = pl.read_ipc(path, memory_map=True)
+    X = preprocessor.transform(df.select(FEATURE_COLUMNS).to_pandas())
+    X = X.astype(np.float32) if sparse.issparse(X) else np.asarray(X, np.float32)
+    return X, df[TARGET_COLUMN].to_numpy()
+
+
+class SpilledBatches(xgb.DataIter):
+    """
+    Feeds spilled batches (see spill_batches) to XGBoost one at a time, so
+    only one preprocessed batch is ever in memory; XGBoost keeps its own
+    quantized pages under `cache_prefix`.
+    """
+
+    def __init__(self, paths, preprocessor, cache_prefix, feature_types=None):
+        self._paths = paths
+        self._preprocessor = preprocessor
+        self._feature_types = feature_types
+        self._position = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data):
+        if self._position == len(self._paths):
+            return False
+        X, y = read_spilled(self._paths[self._position], self._preprocessor)
+        input_data(data=X, label=y, feature_types=self._feature_types)
+        self._position += 1
+        return True
+
+    def reset(self):
+        self._position = 0
+
+
+def fit_external_memory(regressor, paths, preprocessor, cache_prefix):
+    """
+    Trains an (unfitted) XGBRegressor, with its own parameters, on spilled
+    batches through an external-memory DMatrix. Returns it fitted, so it
+    drops into the usual preprocessor + regressor pipeline.
+    """
+    batches = SpilledBatches(
+        paths, preprocessor, cache_prefix, feature_types=regressor.feature_types
+    )
+    dtrain = xgb.ExtMemQuantileDMatrix(
+        batches,
+        max_bin=regressor.max_bin,
+        enable_categorical=regressor.enable_categorical,
+    )
+    regressor._Booster = xgb.train(
+        regressor.get_xgb_params(), dtrain, num_boost_round=regressor.n_estimators
+    )
+    return regressor
+
+
+def batched_mae(pipeline, paths):
+    """Mean absolute error of `pipeline` over spilled batches."""
+    errors, rows = 0.0, 0
+    for path in paths:
+        df = pl.read_ipc(path, memory_map=True)
+        preds = pipeline.predict(df.select(FEATURE_COLUMNS).to_pandas())
+        errors += float(np.abs(df[TARGET_COLUMN].to_numpy() - preds).sum())
+        rows += df.height
+    return errors / rows
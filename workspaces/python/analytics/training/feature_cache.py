@@ -0,0 +1,110 @@
+import glob
+import hashlib
+import json
+import os
+import time
+
+import polars as pl
+
+from .config import (
+    DB_URI,
+    FEATURE_CACHE_DIR,
+    FEATURE_CACHE_MAX_BYTES,
+    HOLIDAY_CALENDAR_PATH,
+    LAKE_TRIPS_GLOB,
+)
+
+# Part of every key: bump it when feature engineering changes, so frames
+# built by the old code are never served again
+CACHE_VERSION = 1
+
+# Cheap to answer (statistics views and one index lookup). The relation
+# changes whenever dbt rebuilds fct_trips; the write counters catch rows
+# changed in place (and a statistics reset just costs one rebuild)
+WATERMARK_QUERY = """
+SELECT
+    s.relid::bigint AS relation,
+    s.n_tup_ins + s.n_tup_upd + s.n_tup_del AS writes,
+    (SELECT max(pickup_datetime) FROM dbt_dev.fct_trips) AS latest_pickup
+FROM pg_stat_user_tables s
+WHERE s.relid = 'dbt_dev.fct_trips'::regclass
+"""
+
+
+def _file_stamps(paths):
+    """(path, size, mtime) of each existing file: changes when any is rewritten."""
+    stamps = []
+    for path in sorted(paths):
+        if os.path.exists(path):
+            stat = os.stat(path)
+            stamps.append((path, stat.st_size, stat.st_mtime_ns))
+    return stamps
+
+
+def source_watermark(source):
+    """
+    Identifies the current state of the training source without reading it:
+    the fct_trips relation for Postgres, file stats for the lake. Also
+    covers the holiday calendar, which feature engineering reads.
+    """
+    if source == 'lake':
+        data = _file_stamps(glob.glob(LAKE_TRIPS_GLOB, recursive=True))
+    else:
+        data = pl.read_database_uri(
+            query=WATERMARK_QUERY, uri=DB_URI, engine='connectorx'
+        ).to_dicts()
+    return {'data': data, 'holidays': _file_stamps([HOLIDAY_CALENDAR_PATH])}
+
+
+def cache_key(**parts):
+    """Hash of everything a cached frame depends on (query, features, watermark)."""
+    document = json.dumps(
+        {'version': CACHE_VERSION, **parts}, sort_keys=True, default=str
+    )
+    return hashlib.sha256(document.encode()).hexdigest()[:32]
+
+
+def cached_frame(key, build, cache_dir=FEATURE_CACHE_DIR):
+    """
+    The frame stored under `key`, memory-mapped from its Arrow IPC file;
+    on a miss, `build()` it and store it first. The cache is then trimmed
+    to FEATURE_CACHE_MAX_BYTES.
+    """
+    path = os.path.join(cache_dir, f'{key}.arrow')
+    if os.path.exists(path):
+        print(f'Feature cache hit: {path}')
+        os.utime(path)  # Most recently used
+        return pl.read_ipc(path, memory_map=True)
+
+    df = build()
+    os.makedirs(cache_dir, exist_ok=True)
+    # Written under a temporary name, so readers never see a partial file
+    partial = f'{path}.{os.getpid()}.partial'
+    df.write_ipc(partial)  # Uncompressed, so it can be memory-mapped
+    os.replace(partial, path)
+    print(f'Feature cache stored: {path}')
+    evict(cache_dir, keep=path)
+    return df
+
+
+def evict(cache_dir=FEATURE_CACHE_DIR, max_bytes=FEATURE_CACHE_MAX_BYTES, keep=None):
+    """Deletes least recently used entries until the cache fits `max_bytes`."""
+    entries = []
+    for path in glob.glob(os.path.join(cache_dir, '*.arrow')):
+        stat = os.stat(path)
+        entries.append((stat.st_mtime, stat.st_size, path))
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        os.remove(path)
+        total -= size
+        print(f'Feature cache evicted: {path}')
+
+    # Leftovers of runs that died while writing
+    for partial in glob.glob(os.path.join(cache_dir, '*.partial')):
+        if os.stat(partial).st_mtime < time.time() - 24 * 3600:
+            os.remove(partial)
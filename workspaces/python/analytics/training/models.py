@@ -4,26 +4,69 @@ from sklearn.compose import ColumnTransformer
 from sklearn.ensemble import IsolationForest, RandomForestRegressor
 from sklearn.linear_model import LinearRegression
 from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler
 
 from .config import (
     ANOMALY_NUMERICAL_FEATURES,
     CATEGORICAL_FEATURES,
+    CATEGORY_LEVELS,
+    ENCODINGS,
     NUMERICAL_FEATURES,
 )
 
+# XGBoost feature types of the native encoding's output: codes, then numbers
+NATIVE_FEATURE_TYPES = ['c'] * len(CATEGORICAL_FEATURES) + ['q'] * len(
+    NUMERICAL_FEATURES
+)
+# One-vs-rest splits on every categorical: partition splits over ~265 zones
+# overfit and store a category set per node (see benchmarks/training.py)
+NATIVE_MAX_CAT_TO_ONEHOT = max(len(levels) for levels in CATEGORY_LEVELS.values()) + 1
+
+
+def create_preprocessor(encoding='onehot'):
+    """Create preprocessing pipeline for the given categorical encoding."""
+    if encoding not in ENCODINGS:
+        raise ValueError(f'Unsupported encoding: {encoding}')
+    levels = [CATEGORY_LEVELS[col] for col in CATEGORICAL_FEATURES]
+
+    if encoding == 'native':
+        # Level index as a float code; unknown levels become missing values
+        return ColumnTransformer(
+            transformers=[
+                (
+                    'cat',
+                    OrdinalEncoder(
+                        categories=levels,
+                        handle_unknown='use_encoded_value',
+                        unknown_value=np.nan,
+                    ),
+                    CATEGORICAL_FEATURES,
+                ),
+                ('num', 'passthrough', NUMERICAL_FEATURES),
+            ],
+            verbose_feature_names_out=False,
+        )
 
-def create_preprocessor():
-    """Create preprocessing pipeline."""
     return ColumnTransformer(
         transformers=[
             (
                 'cat',
-                OneHotEncoder(handle_unknown='ignore', sparse_output=False),
+                OneHotEncoder(
+                    categories=levels,
+                    handle_unknown='ignore',
+                    sparse_output=encoding == 'sparse',
+                ),
                 CATEGORICAL_FEATURES,
             ),
-            ('num', StandardScaler(), NUMERICAL_FEATURES),
+            # Centering would densify a sparse matrix
+            (
+                'num',
+                StandardScaler(with_mean=encoding != 'sparse'),
+                NUMERICAL_FEATURES,
+            ),
         ],
+        # Keep the sparse encoding sparse however dense the batch
+        sparse_threshold=1.0 if encoding == 'sparse' else 0.0,
         verbose_feature_names_out=False,
     )
 
@@ -38,9 +81,19 @@ def create_anomaly_preprocessor():
     )
 
 
-def create_model(model_type, y_train=None, **params):
+def create_model(model_type, y_train=None, encoding='onehot', **params):
     """Create model based on type and parameters."""
+    if encoding == 'native' and model_type != 'xgboost':
+        raise ValueError(f'The native encoding needs xgboost, not {model_type}')
+
     if model_type == 'xgboost':
+        if encoding == 'native':
+            params = {
+                'enable_categorical': True,
+                'feature_types': NATIVE_FEATURE_TYPES,
+                'max_cat_to_onehot': NATIVE_MAX_CAT_TO_ONEHOT,
+                **params,
+            }
         return xgb.XGBRegressor(
             n_jobs=1, verbosity=0, base_score=float(np.mean(y_train)), **params
         )
@@ -54,14 +107,14 @@ def create_model(model_type, y_train=None, **params):
         raise ValueError(f'Unsupported model type: {model_type}')
 
 
-def create_pipeline(model_type, y_train=None, **model_params):
+def create_pipeline(model_type, y_train=None, encoding='onehot', **model_params):
     """Create complete ML pipeline."""
     if model_type == 'isolation_forest':
         preprocessor = create_anomaly_preprocessor()
         model = create_model(model_type, **model_params)
         return Pipeline([('scaler', preprocessor), ('model', model)])
 
-    preprocessor = create_preprocessor()
-    model = create_model(model_type, y_train, **model_params)
+    preprocessor = create_preprocessor(encoding)
+    model = create_model(model_type, y_train, encoding, **model_params)
 
     return Pipeline([('preprocessor', preprocessor), ('regressor', model)])
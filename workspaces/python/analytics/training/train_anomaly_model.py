@@ -27,6 +27,20 @@ def main():
         help='Contamination rate (expected proportion of outliers)',
     )
 
+    # Data source
+    parser.add_argument(
+        '--data_source',
+        type=str,
+        default='postgres',
+        choices=['postgres', 'lake'],
+        help='Read trips from Postgres or the local Parquet lake',
+    )
+    parser.add_argument(
+        '--no_cache',
+        action='store_true',
+        help='Reload from the source instead of the feature cache',
+    )
+
     args = parser.parse_args()
 
     # Train model
@@ -34,7 +48,9 @@ def main():
     model_params = get_model_params(args)
 
     print(f'Starting Anomaly Detection Training with params: {model_params}')
-    trainer.train_anomaly(**model_params)
+    trainer.train_anomaly(
+        data_source=args.data_source, use_cache=not args.no_cache, **model_params
+    )
     print('Training completed.')
 
 
@@ -1,5 +1,6 @@
 import argparse
 
+from .config import ENCODINGS
 from .trainer import ModelTrainer
 
 
@@ -37,6 +38,14 @@ def main():
         help='Type of regression model to train',
     )
 
+    parser.add_argument(
+        '--encoding',
+        type=str,
+        default='onehot',
+        choices=ENCODINGS,
+        help='Categorical encoding: dense one-hot, sparse one-hot, or native (XGBoost)',
+    )
+
     # Model hyperparameters
     parser.add_argument(
         '--n_estimators', type=int, default=100, help='Number of estimators'
@@ -46,13 +55,47 @@ def main():
     )
     parser.add_argument('--max_depth', type=int, default=10, help='Maximum tree depth')
 
+    # Data source
+    parser.add_argument(
+        '--data_source',
+        type=str,
+        default='postgres',
+        choices=['postgres', 'lake'],
+        help='Read trips from Postgres or the local Parquet lake',
+    )
+    parser.add_argument(
+        '--start_date', type=str, default=None, help='First pickup date (YYYY-MM-DD)'
+    )
+    parser.add_argument(
+        '--end_date', type=str, default=None, help='Pickup date to stop before'
+    )
+    parser.add_argument(
+        '--no_cache',
+        action='store_true',
+        help='Reload from the source instead of the feature cache',
+    )
+    parser.add_argument(
+        '--streaming',
+        action='store_true',
+        help='Stream batches into an external-memory DMatrix (XGBoost only)',
+    )
+
     args = parser.parse_args()
 
     # Train model
     trainer = ModelTrainer()
     model_params = get_model_params(args)
 
-    pipeline, mae = trainer.train(args.model_type, **model_params)
+    pipeline, mae = trainer.train(
+        args.model_type,
+        data_source=args.data_source,
+        streaming=args.streaming,
+        start=args.start_date,
+        end=args.end_date,
+        encoding=args.encoding,
+        use_cache=not args.no_cache,
+        **model_params,
+    )
     print(f'Training completed. Final MAE: ${mae:.2f}')
 
 
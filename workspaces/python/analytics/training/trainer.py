@@ -1,23 +1,33 @@
 import os
 import pickle
+import tempfile
 
 import mlflow
+import polars as pl
 from sklearn.metrics import mean_absolute_error
+from sklearn.pipeline import Pipeline
 
 from .config import (
     ANOMALY_EXPERIMENT_NAME,
     ANOMALY_MODEL_PATH,
+    DATA_SPILL_DIR,
     EXPERIMENT_NAME,
     MLFLOW_TRACKING_URI,
     PROD_MODEL_PATH,
+    TARGET_COLUMN,
 )
 from .data_loader import (
+    FEATURE_COLUMNS,
+    iter_batches,
     load_anomaly_data,
     load_data,
     prepare_anomaly_features,
     prepare_features,
+    recent_start,
+    spill_batches,
 )
-from .models import create_pipeline
+from .external_memory import batched_mae, fit_external_memory
+from .models import create_model, create_pipeline, create_preprocessor
 
 
 class ModelTrainer:
@@ -25,40 +35,117 @@ class ModelTrainer:
         mlflow.set_tracking_uri(MLFLOW_TRACKING_URI)
         mlflow.set_experiment(EXPERIMENT_NAME)
 
-    def train(self, model_type='xgboost', **model_params):
-        """Train model with given parameters."""
-        with mlflow.start_run():
-            # Load and prepare data
-            df = load_data()
-            X_train, X_test, y_train, y_test = prepare_features(df)
+    def train(
+        self,
+        model_type='xgboost',
+        data_source='postgres',
+        streaming=False,
+        start=None,
+        end=None,
+        encoding='onehot',
+        use_cache=True,
+        **model_params,
+    ):
+        """
+        Train model with given parameters on the trips picked up in
+        [start, end), with categorical features encoded as `encoding` (see
+        ENCODINGS). With `streaming`, the data is never loaded whole (see
+        _train_streaming) and `start` defaults to all history. Otherwise it
+        defaults to the last DATA_DEFAULT_MONTHS months of data, and the
+        loaded data comes from the feature cache when the source is
+        unchanged, unless `use_cache` is off.
+        """
+        if not streaming and start is None:
+            start = recent_start(data_source, end)
 
-            # Create and train pipeline
-            pipeline = create_pipeline(model_type, y_train, **model_params)
-            print(f'Training {model_type} model...')
-            pipeline.fit(X_train, y_train)
-
-            # Evaluate
-            preds = pipeline.predict(X_test)
-            mae = mean_absolute_error(y_test, preds)
+        with mlflow.start_run():
+            if streaming:
+                pipeline, mae = self._train_streaming(
+                    model_type, data_source, start, end, encoding, **model_params
+                )
+            else:
+                # Load and prepare data
+                df = load_data(data_source, start, end, cache=use_cache)
+                X_train, X_test, y_train, y_test = prepare_features(df)
+
+                # Create and train pipeline
+                pipeline = create_pipeline(
+                    model_type, y_train, encoding, **model_params
+                )
+                print(f'Training {model_type} model...')
+                pipeline.fit(X_train, y_train)
+
+                # Evaluate
+                preds = pipeline.predict(X_test)
+                mae = mean_absolute_error(y_test, preds)
 
             # Log results
             print(f'✅ MAE: ${mae:.2f}')
             mlflow.log_metric('mae', mae)
             mlflow.log_params(model_params)
             mlflow.log_param('model_type', model_type)
+            mlflow.log_param('data_source', data_source)
+            mlflow.log_param('encoding', encoding)
+            mlflow.log_param('streaming', streaming)
+            mlflow.log_param('start', start)
+            mlflow.log_param('end', end)
 
             # Save production model
             self._save_production_model(pipeline)
 
             return pipeline, mae
 
-    def train_anomaly(self, **model_params):
+    def _train_streaming(
+        self, model_type, data_source, start, end, encoding, **model_params
+    ):
+        """
+        Out-of-core XGBoost training. The trips are streamed from the source
+        in Arrow batches and spilled to disk (with a 20% holdout), then fed
+        to an external-memory DMatrix batch by batch, so memory is bounded
+        by the batch size rather than by the size of the window.
+        """
+        if model_type != 'xgboost':
+            raise ValueError(f'Streaming training needs xgboost, not {model_type}')
+
+        with tempfile.TemporaryDirectory(dir=DATA_SPILL_DIR) as spill_dir:
+            train_paths, test_paths = spill_batches(
+                iter_batches(data_source, start, end), spill_dir
+            )
+            if not train_paths or not test_paths:
+                raise ValueError('No training data in the requested window')
+
+            # Scaling and the target mean come from the first batch; the
+            # one-hot levels are fixed, so no batch can add columns
+            first = pl.read_ipc(train_paths[0], memory_map=True)
+            preprocessor = create_preprocessor(encoding).fit(
+                first.select(FEATURE_COLUMNS).to_pandas()
+            )
+            regressor = create_model(
+                model_type, first[TARGET_COLUMN].to_numpy(), encoding, **model_params
+            )
+            del first
+
+            print(
+                f'Training {model_type} model on {len(train_paths)} batches '
+                '(external memory)...'
+            )
+            fit_external_memory(
+                regressor, train_paths, preprocessor, os.path.join(spill_dir, 'xgb')
+            )
+            pipeline = Pipeline(
+                [('preprocessor', preprocessor), ('regressor', regressor)]
+            )
+            mae = batched_mae(pipeline, test_paths)
+
+        return pipeline, mae
+
+    def train_anomaly(self, data_source='postgres', use_cache=True, **model_params):
         """Train anomaly detection model."""
         mlflow.set_experiment(ANOMALY_EXPERIMENT_NAME)
 
         with mlflow.start_run():
             # Load and prepare data
-            df = load_anomaly_data()
+            df = load_anomaly_data(data_source, cache=use_cache)
             X = prepare_anomaly_features(df)
 
             # Create and train pipeline
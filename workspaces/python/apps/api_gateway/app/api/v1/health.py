@@ -3,11 +3,16 @@
 from fastapi import APIRouter
 
 from app.models import model_manager
+from app.services.holiday_calendar import holiday_calendar
 
 router = APIRouter()
 
 
 @router.get('/health')
 def health_check():
-    """Check API health and model status."""
-    return {'status': 'ok', 'model_loaded': model_manager.is_loaded('price_model')}
+    """Check API health, model and holiday calendar status."""
+    return {
+        'status': 'ok',
+        'model_loaded': model_manager.is_loaded('price_model'),
+        'holiday_calendar_loaded': holiday_calendar.is_loaded(),
+    }
@@ -7,6 +7,7 @@ class Settings(BaseSettings):
     app_name: str = 'Metrofleet API'
     version: str = 'v1'
     model_path: str = '/app/data/models/price_model_prod.pkl'
+    holiday_calendar_path: str = '/app/data/reference/holiday_calendar.bin'
     min_fare: float = 2.50
     api_key: str = 'dev-secret-key'
     
@@ -9,14 +9,17 @@ from fastapi.security import APIKeyHeader
 from app.api.v1 import api_router
 from app.core import settings
 from app.models import model_manager
+from app.services.holiday_calendar import holiday_calendar
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manage application lifecycle."""
     model_manager.load_model('price_model', settings.model_path)
+    holiday_calendar.load(settings.holiday_calendar_path)
     yield
     model_manager.clear()
+    holiday_calendar.close()
 
 
 app = FastAPI(
@@ -1,12 +1,9 @@
 """Feature engineering for model inference."""
 
-import holidays
 import pandas as pd
 
 from app.schemas import TripRequest
-
-# We use New York holidays since this is a specific NYC model
-ny_holidays = holidays.US(subdiv='NY')
+from app.services.holiday_calendar import holiday_calendar
 
 
 def prepare_features(trip: TripRequest) -> pd.DataFrame:
@@ -17,9 +14,9 @@ def prepare_features(trip: TripRequest) -> pd.DataFrame:
     pickup_hour = float(trip.pickup_datetime.hour)
     pickup_day = int(trip.pickup_datetime.weekday())  # 0=Mon, 6=Sun
 
-    # 2. Holiday Logic (Real-time calculation)
-    # Check if the date is in the NY Holiday registry
-    is_holiday = trip.pickup_datetime.date() in ny_holidays
+    # 2. Holiday Logic (Precomputed calendar, shared with training)
+    # Check if the date is in the NY Holiday calendar
+    is_holiday = holiday_calendar.is_holiday(trip.pickup_datetime.date())
     is_holiday_int = 1 if is_holiday else 0
 
     # 3. Construct DataFrame
@@ -0,0 +1,65 @@
+"""Holiday lookups against the precomputed calendar file."""
+
+import datetime
+import mmap
+import struct
+
+import holidays
+
+# Written by the pipelines' raw_holidays_data asset. The format is owned by
+# pipelines/orchestrator/utils/holiday_calendar.py; these constants are copies
+# of its own, kept in step by pipelines/tests/test_holiday_calendar.py:
+#   magic b'MFHC' | version u16 | name count u16 | first day i32 | day count u32
+# followed by one byte per day (0 = no holiday) and the holiday names.
+CALENDAR_MAGIC = b'MFHC'
+CALENDAR_VERSION = 1
+CALENDAR_HEADER = struct.Struct('<4sHHiI')
+
+EPOCH = datetime.date(1970, 1, 1)
+
+
+class HolidayCalendar:
+    def __init__(self):
+        self._map: mmap.mmap | None = None
+        self._first_day = 0
+        self._days = 0
+        # Dates outside the file's range (or no file at all)
+        self._fallback = holidays.US(subdiv='NY')
+
+    def load(self, path: str) -> None:
+        """Memory-map the calendar file."""
+        try:
+            with open(path, 'rb') as f:
+                calendar_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            print(f'⚠️ Holiday calendar not found: {path}')
+            return
+
+        magic, version, _, first_day, days = CALENDAR_HEADER.unpack_from(calendar_map)
+        if magic != CALENDAR_MAGIC or version != CALENDAR_VERSION:
+            calendar_map.close()
+            print(f'⚠️ Unsupported holiday calendar: {path}')
+            return
+
+        self.close()
+        self._map, self._first_day, self._days = calendar_map, first_day, days
+        print(f'✅ Holiday calendar loaded ({days} days).')
+
+    def is_holiday(self, date: datetime.date) -> bool:
+        """O(1) lookup in the calendar; the holidays library outside its range."""
+        index = (date - EPOCH).days - self._first_day
+        if self._map is not None and 0 <= index < self._days:
+            return self._map[CALENDAR_HEADER.size + index] != 0
+        return date in self._fallback
+
+    def is_loaded(self) -> bool:
+        """False while lookups fall back to the holidays library."""
+        return self._map is not None
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+
+holiday_calendar = HolidayCalendar()
@@ -0,0 +1,101 @@
+"""Shared plumbing for benchmark suites: environment capture and result files."""
+
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+# Relative drop (vs. a baseline run) reported as a regression
+REGRESSION_THRESHOLD = 0.10
+
+
+def environment_info() -> dict:
+    """Describes where a benchmark ran, so results are comparable across releases."""
+    try:
+        git_sha = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        git_sha = None
+
+    return {
+        'created_at': datetime.datetime.now(datetime.UTC).isoformat(),
+        'git_sha': git_sha,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def in_fresh_process(fn, *args):
+    """Runs `fn(*args)` in a spawned process, so its peak RSS is its own."""
+    spawn = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as pool:
+        return pool.submit(fn, *args).result()
+
+
+def default_output(suite: str) -> str:
+    stamp = datetime.datetime.now().strftime('%Y%m%dT%H%M%S')
+    return os.path.join(
+        os.getenv('DATA_ROOT', 'data'), 'benchmarks', f'{suite}-{stamp}.json'
+    )
+
+
+def write_results(suite: str, params: dict, results: list[dict], output: str) -> None:
+    """Writes one benchmark run as a single JSON document."""
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    document = {
+        'suite': suite,
+        **environment_info(),
+        'params': params,
+        'results': results,
+    }
+    with open(output, 'w') as f:
+        json.dump(document, f, indent=2, default=str)
+    print(f'Results written to {output}')
+
+
+def _format(value: float) -> str:
+    return f'{value:,.0f}' if abs(value) >= 1000 else f'{value:.4g}'
+
+
+def compare_to_baseline(
+    results: list[dict],
+    baseline_path: str,
+    keys: tuple[str, ...],
+    metric: str,
+    higher_is_better: bool = True,
+) -> list[str]:
+    """
+    Compares `metric` against a previous results file.
+
+    Rows are matched on `keys`. Prints one line per match and returns
+    descriptions of the ones that regressed by more than
+    REGRESSION_THRESHOLD.
+    """
+    with open(baseline_path) as f:
+        baseline = {
+            tuple(row[key] for key in keys): row for row in json.load(f)['results']
+        }
+
+    regressions = []
+    for row in results:
+        previous = baseline.get(tuple(row[key] for key in keys))
+        if not previous or not previous.get(metric):
+            continue
+        change = row[metric] / previous[metric] - 1
+        label = '/'.join(str(row[key]) for key in keys)
+        line = (
+            f'{label}: {metric} {_format(previous[metric])} -> '
+            f'{_format(row[metric])} ({change:+.1%})'
+        )
+        print(line)
+        if (change if higher_is_better else -change) < -REGRESSION_THRESHOLD:
+            regressions.append(line)
+    return regressions
@@ -0,0 +1,385 @@
+"""
+Demand forecasting backtest.
+
+Replays the forecasting engines over rolling origins: at each origin every
+engine sees only the hours before it and forecasts the next week, which is
+then scored against what actually happened. History grows from one origin to
+the next, so the results also show how fit time scales with it.
+
+Engines:
+    prophet         one Prophet model per borough (borough_demand_forecast)
+    ridge           all zones in one ridge regression (zone_demand_forecast),
+                    zone forecasts summed per borough
+    seasonal-naive  each hour repeats the same hour a week earlier
+
+Every engine runs in a fresh process, so peak RSS is per engine (Prophet's
+Stan sampler runs in a subprocess of its own and is not counted). Each
+result row is one (engine, origin, borough) with fit and predict seconds,
+MAE and MAPE against the borough's hourly trips. The ridge engine's batched
+fit time is split over boroughs by their share of zones. The whole run is
+saved as one JSON file.
+
+Demand is synthetic by default, or hourly trips from the Parquet lake.
+
+Usage (from workspaces/python/pipelines):
+
+    python -m benchmarks.forecasting --days 180 --origins 6 --baseline previous.json
+    python -m benchmarks.forecasting --source lake --engines ridge seasonal-naive
+"""
+
+import argparse
+import datetime
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import polars as pl
+
+from .common import (
+    compare_to_baseline,
+    default_output,
+    in_fresh_process,
+    write_results,
+)
+from .synthetic import generate_hourly_demand
+
+ENGINES = ['prophet', 'ridge', 'seasonal-naive']
+
+# Borough of each TLC zone, from the dbt seed
+ZONE_LOOKUP_PATH = os.path.join(
+    os.path.dirname(__file__), '..', 'transformations', 'seeds', 'taxi_zone_lookup.csv'
+)
+
+# Hours forecast past each origin, and between origins by default (7 days)
+HORIZON_HOURS = 24 * 7
+
+
+def _zone_boroughs() -> pl.DataFrame:
+    return pl.read_csv(ZONE_LOOKUP_PATH).select(
+        pl.col('LocationID').cast(pl.Int16).alias('pickup_location_id'),
+        pl.col('Borough').alias('pickup_borough'),
+    )
+
+
+def _lake_demand(days: int) -> pl.DataFrame:
+    """Hourly trips per zone over the last `days` days of the lake."""
+    from orchestrator.utils.lake import scan_trips
+
+    trips = scan_trips(columns=['pickup_datetime', 'pickup_location_id'])
+    end = trips.select(pl.col('pickup_datetime').max()).collect().item()
+    return (
+        trips.filter(pl.col('pickup_datetime') >= end - datetime.timedelta(days=days))
+        .group_by(
+            pl.col('pickup_datetime').dt.truncate('1h').alias('demand_hour'),
+            pl.col('pickup_location_id').cast(pl.Int16),
+        )
+        .agg(pl.len().cast(pl.Int64).alias('trip_count'))
+        .collect()
+    )
+
+
+def _borough_hours(zone_demand: pl.DataFrame) -> pl.DataFrame:
+    """Hourly trips per borough, with hours without trips filled in as zero."""
+    demand = zone_demand.group_by('demand_hour', 'pickup_borough').agg(
+        pl.col('trip_count').sum()
+    )
+    grid = (
+        pl.datetime_range(
+            demand['demand_hour'].min(),
+            demand['demand_hour'].max(),
+            '1h',
+            time_unit='us',
+            eager=True,
+        )
+        .alias('demand_hour')
+        .to_frame()
+        .join(demand.select('pickup_borough').unique(), how='cross')
+    )
+    return (
+        grid.join(demand, on=['demand_hour', 'pickup_borough'], how='left')
+        .with_columns(pl.col('trip_count').fill_null(0))
+        .sort('pickup_borough', 'demand_hour')
+    )
+
+
+def _prophet(zone_demand, origin, horizon, args) -> tuple[pl.DataFrame, dict]:
+    from orchestrator.utils.forecasting import new_model, predict
+
+    # cmdstanpy logs every chain at INFO unless a handler is already set up
+    stan_logger = logging.getLogger('cmdstanpy')
+    stan_logger.addHandler(logging.NullHandler())
+    stan_logger.setLevel(logging.WARNING)
+    history = _borough_hours(zone_demand.filter(pl.col('demand_hour') < origin))
+    forecasts, seconds = [], {}
+    for (borough,), df_b in history.group_by('pickup_borough', maintain_order=True):
+        df_b = df_b.select(
+            pl.col('demand_hour').alias('ds'), pl.col('trip_count').alias('y')
+        ).to_pandas()
+
+        started = time.perf_counter()
+        m = new_model()
+        m.fit(df_b)
+        fitted = time.perf_counter()
+        forecast = predict(m, df_b['ds'].max(), horizon)
+        seconds[borough] = (fitted - started, time.perf_counter() - fitted)
+
+        forecasts.append(
+            pl.from_pandas(forecast[['ds', 'yhat']]).select(
+                pl.col('ds').cast(pl.Datetime('us')).alias('demand_hour'),
+                pl.lit(borough).alias('pickup_borough'),
+                pl.col('yhat').clip(lower_bound=0),
+            )
+        )
+    return pl.concat(forecasts).filter(pl.col('demand_hour') >= origin), seconds
+
+
+def _ridge(zone_demand, origin, horizon, args) -> tuple[pl.DataFrame, dict]:
+    from orchestrator.utils.holiday_calendar import HolidayCalendar
+    from orchestrator.utils.zone_forecasting import fit_zones, predict_zones
+
+    calendar = HolidayCalendar.from_holidays(origin.year - 2, origin.year + 1)
+    since = origin - datetime.timedelta(days=args.ridge_history_days)
+    history = zone_demand.filter(
+        pl.col('demand_hour').is_between(since, origin, 'left')
+    )
+
+    started = time.perf_counter()
+    model = fit_zones(history, calendar, args.ridge_alpha)
+    fitted = time.perf_counter()
+    forecast = predict_zones(model, calendar, horizon)
+    predicted = time.perf_counter()
+
+    zones = history.select('pickup_location_id', 'pickup_borough').unique()
+    share = (
+        zones.group_by('pickup_borough')
+        .len()
+        .with_columns(pl.col('len') / zones.height)
+    )
+    seconds = {
+        borough: (weight * (fitted - started), weight * (predicted - fitted))
+        for borough, weight in share.iter_rows()
+    }
+    forecast = (
+        forecast.join(zones, on='pickup_location_id')
+        .group_by(pl.col('forecast_timestamp').alias('demand_hour'), 'pickup_borough')
+        .agg(pl.col('predicted_demand').sum().alias('yhat'))
+    )
+    return forecast, seconds
+
+
+def _seasonal_naive(zone_demand, origin, horizon, args) -> tuple[pl.DataFrame, dict]:
+    started = time.perf_counter()
+    week = datetime.timedelta(hours=24 * 7)
+    last_week = _borough_hours(
+        zone_demand.filter(
+            pl.col('demand_hour').is_between(origin - week, origin, 'left')
+        )
+    )
+    # Hour h of the horizon repeats hour h % 168 of the last week
+    forecast = pl.concat(
+        [
+            last_week.with_columns(pl.col('demand_hour') + week * (k + 1))
+            for k in range(-(-horizon // (24 * 7)))
+        ]
+    ).filter(pl.col('demand_hour') < origin + datetime.timedelta(hours=horizon))
+    seconds = time.perf_counter() - started
+    boroughs = forecast['pickup_borough'].unique().to_list()
+    return (
+        forecast.select(
+            'demand_hour',
+            'pickup_borough',
+            pl.col('trip_count').cast(pl.Float64).alias('yhat'),
+        ),
+        {borough: (seconds / len(boroughs), 0.0) for borough in boroughs},
+    )
+
+
+RUNNERS = {'prophet': _prophet, 'ridge': _ridge, 'seasonal-naive': _seasonal_naive}
+
+
+def _run_engine(
+    engine: str, demand_path: str, origins: list, args: argparse.Namespace
+) -> list[dict]:
+    """Backtests one engine over every origin (in a worker process)."""
+    from orchestrator.utils.profiling import peak_rss_mb
+
+    zone_demand = pl.read_parquet(demand_path)
+    actual = _borough_hours(zone_demand)
+
+    rows = []
+    for origin in origins:
+        forecast, seconds = RUNNERS[engine](zone_demand, origin, args.horizon, args)
+        end = origin + datetime.timedelta(hours=args.horizon)
+        scored = actual.filter(
+            pl.col('demand_hour').is_between(origin, end, 'left')
+        ).join(forecast, on=['demand_hour', 'pickup_borough'], how='left')
+        history_hours = (origin - actual['demand_hour'].min()) // datetime.timedelta(
+            hours=1
+        )
+        for (borough,), df_b in scored.group_by('pickup_borough', maintain_order=True):
+            y = df_b['trip_count'].to_numpy().astype(np.float64)
+            yhat = df_b['yhat'].fill_null(0).to_numpy()
+            error = np.abs(y - yhat)
+            fit_seconds, predict_seconds = seconds.get(borough, (0.0, 0.0))
+            rows.append(
+                {
+                    'engine': engine,
+                    'origin': origin.isoformat(),
+                    'borough': borough,
+                    'history_hours': history_hours,
+                    'fit_seconds': round(fit_seconds, 4),
+                    'predict_seconds': round(predict_seconds, 4),
+                    'mae': round(float(error.mean()), 3),
+                    # Hours without trips have no percentage error
+                    'mape': round(float((error[y > 0] / y[y > 0]).mean() * 100), 2)
+                    if (y > 0).any()
+                    else None,
+                }
+            )
+
+    peak = round(peak_rss_mb(), 1)
+    for row in rows:
+        row['peak_rss_mb'] = peak
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backtest the forecasting engines')
+    parser.add_argument(
+        '--source',
+        choices=['synthetic', 'lake'],
+        default='synthetic',
+        help='Synthetic demand, or hourly trips from LAKE_PATH',
+    )
+    parser.add_argument('--days', type=int, default=120, help='Days of demand')
+    parser.add_argument(
+        '--trips_per_day', type=int, default=100_000, help='Synthetic daily volume'
+    )
+    parser.add_argument(
+        '--start', type=str, default='2024-01-01', help='Synthetic first day'
+    )
+    parser.add_argument('--origins', type=int, default=4, help='Backtest origins')
+    parser.add_argument(
+        '--step_hours',
+        type=int,
+        default=HORIZON_HOURS,
+        help='Hours between consecutive origins',
+    )
+    parser.add_argument(
+        '--horizon', type=int, default=HORIZON_HOURS, help='Hours forecast per origin'
+    )
+    parser.add_argument(
+        '--engines', nargs='+', default=ENGINES, choices=ENGINES, help='Engines to run'
+    )
+    parser.add_argument(
+        '--ridge_history_days',
+        type=int,
+        default=8 * 7,
+        help='History window of the ridge engine (ZoneForecastConfig.history_days)',
+    )
+    parser.add_argument(
+        '--ridge_alpha', type=float, default=1.0, help='Ridge L2 penalty'
+    )
+    parser.add_argument('--seed', type=int, default=0, help='Synthetic data seed')
+    parser.add_argument('--output', type=str, default=None, help='Results JSON path')
+    parser.add_argument(
+        '--baseline',
+        type=str,
+        default=None,
+        help='Previous results JSON to compare against',
+    )
+    args = parser.parse_args()
+
+    # 1. Hourly demand per zone, with its borough
+    if args.source == 'lake':
+        print(f'Reading the last {args.days} days of hourly demand from the lake...')
+        zone_demand = _lake_demand(args.days)
+    else:
+        print(f'Generating {args.days} days of synthetic hourly demand...')
+        zone_demand = pl.from_arrow(
+            generate_hourly_demand(
+                datetime.date.fromisoformat(args.start),
+                args.days,
+                args.trips_per_day,
+                np.random.default_rng(args.seed),
+            )
+        )
+    zone_demand = (
+        zone_demand.with_columns(pl.col('demand_hour').cast(pl.Datetime('us')))
+        .join(_zone_boroughs(), on='pickup_location_id')
+        .filter(pl.col('pickup_borough') != 'Unknown')
+    )
+
+    # 2. Origins, latest last, each followed by a full horizon of actuals
+    end = zone_demand['demand_hour'].max() + datetime.timedelta(hours=1)
+    last = end - datetime.timedelta(hours=args.horizon)
+    origins = [
+        last - datetime.timedelta(hours=args.step_hours * i)
+        for i in reversed(range(args.origins))
+    ]
+    first = zone_demand['demand_hour'].min() + datetime.timedelta(days=14)
+    origins = [origin for origin in origins if origin >= first]
+    if not origins:
+        parser.error('Not enough days for two weeks of history before an origin')
+
+    # 3. One fresh process per engine
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        demand_path = os.path.join(tmp, 'demand.parquet')
+        zone_demand.write_parquet(demand_path)
+        for engine in args.engines:
+            print(f'{engine}: {len(origins)} origin(s)...')
+            results.extend(
+                in_fresh_process(_run_engine, engine, demand_path, origins, args)
+            )
+
+    summary = (
+        pl.DataFrame(results)
+        .group_by('engine', maintain_order=True)
+        .agg(
+            pl.col('fit_seconds').sum(),
+            pl.col('predict_seconds').sum(),
+            pl.col('mae').mean(),
+            pl.col('mape').mean(),
+            pl.col('peak_rss_mb').first(),
+        )
+    )
+    for row in summary.iter_rows(named=True):
+        print(
+            f'{row["engine"]:<16} fit {row["fit_seconds"]:>8.2f}s '
+            f'predict {row["predict_seconds"]:>7.2f}s MAE {row["mae"]:>9.2f} '
+            f'MAPE {row["mape"] or 0:>6.1f}% {row["peak_rss_mb"]:>8.1f} MiB'
+        )
+
+    params = {
+        'source': args.source,
+        'days': args.days,
+        'trips_per_day': args.trips_per_day if args.source == 'synthetic' else None,
+        'seed': args.seed if args.source == 'synthetic' else None,
+        'origins': [origin.isoformat() for origin in origins],
+        'horizon': args.horizon,
+        'ridge_history_days': args.ridge_history_days,
+        'ridge_alpha': args.ridge_alpha,
+        'zone_hours': zone_demand.height,
+    }
+    write_results(
+        'forecasting', params, results, args.output or default_output('forecasting')
+    )
+
+    if args.baseline:
+        keys = ('engine', 'origin', 'borough')
+        regressions = compare_to_baseline(
+            results, args.baseline, keys, 'fit_seconds', higher_is_better=False
+        ) + compare_to_baseline(
+            results, args.baseline, keys, 'mae', higher_is_better=False
+        )
+        if regressions:
+            print(f'{len(regressions)} regression(s) beyond threshold.')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,484 @@
+"""
+Ingestion throughput benchmark.
+
+Generates a synthetic month of TLC yellow trips, then materializes
+`raw_yellow_trips` once per loading strategy and `raw_weather_data` (as one
+multi-month backfill over every station of the grid) against a local stand-in
+for the Open-Meteo API, cold per-month, cold coalesced and warm from the
+response cache. The remote strategies fetch the month from a local stand-in
+for the TLC CDN (with Range support and optional bandwidth cap), either
+downloading first or with the fused pipeline. Each run records wall time,
+rows/sec, peak RSS and bytes written, and the whole run is saved as one JSON
+file.
+
+Every materialization runs in a fresh process so peak RSS is per strategy.
+
+Usage (from workspaces/python/pipelines, with POSTGRES_* pointing at a
+scratch database):
+
+    python -m benchmarks.ingestion --rows 3000000 --baseline previous.json
+    python -m benchmarks.ingestion --strategies download-then-load fused --bandwidth_mbps 20
+"""
+
+import argparse
+import datetime
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+import numpy as np
+
+from .common import (
+    compare_to_baseline,
+    default_output,
+    in_fresh_process,
+    write_results,
+)
+from .synthetic import generate_hourly_weather, write_trips_parquet
+
+# IngestionConfig overrides for each raw_yellow_trips loading strategy
+STRATEGIES = {
+    'stream-50k': {'batch_size': 50_000},
+    'stream-250k': {'batch_size': 250_000},
+    'parallel-2': {'batch_size': 250_000, 'parallelism': 2},
+    'parallel-4': {'batch_size': 250_000, 'parallelism': 4},
+}
+
+# Strategies that start from the stand-in CDN instead of a file on disk
+REMOTE_STRATEGIES = {
+    'download-then-load': {'batch_size': 250_000},
+    'fused': {'batch_size': 250_000, 'fused': True},
+}
+
+# Bytes per write (and per throttling step) of the stand-in CDN
+STANDIN_CHUNK_SIZE = 64 * 1024
+
+# OpenMeteoResource overrides for each raw_weather_data strategy. 'cached'
+# re-runs the backfill against the cache 'coalesced' just filled.
+WEATHER_STRATEGIES = {
+    'per-month': {'months_per_request': 1},
+    'coalesced': {'months_per_request': 12},
+    'cached': {'months_per_request': 12},
+}
+
+
+def _database():
+    from orchestrator.resources.database import PostgresResource
+
+    return PostgresResource(
+        host=os.getenv('POSTGRES_HOST', 'localhost'),
+        port=int(os.getenv('POSTGRES_PORT', '5432')),
+        user=os.getenv('POSTGRES_USER', 'admin'),
+        password=os.getenv('POSTGRES_PASSWORD', 'password'),
+        database=os.getenv('POSTGRES_DB', 'metrofleet'),
+    )
+
+
+def _relation_size(database, relation: str) -> int:
+    conn = database.get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT pg_total_relation_size(%s::regclass)', (relation,))
+            return cursor.fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _run_trips(raw_dir: str, partition_key: str, overrides: dict) -> dict:
+    """Materializes one raw_yellow_trips partition (in a worker process)."""
+    os.environ['RAW_DATA_PATH'] = raw_dir
+
+    from dagster import build_asset_context
+    from orchestrator.assets.ingestion import IngestionConfig, raw_trips_table
+
+    database = _database()
+    config = IngestionConfig(**overrides, force_reload=True)
+
+    started = time.perf_counter()
+    result = raw_trips_table(
+        build_asset_context(partition_key=partition_key), config, database
+    )
+    wall = time.perf_counter() - started
+
+    metadata = {
+        key: getattr(value, 'value', value) for key, value in result.metadata.items()
+    }
+    return {
+        'wall_seconds': round(wall, 3),
+        'rows': metadata['rows_loaded'],
+        'rows_per_second': round(metadata['rows_loaded'] / wall),
+        'peak_rss_mb': metadata['peak_rss_mb'],
+        'copy_bytes': metadata['copy_bytes'],
+        'bytes_written': _relation_size(database, metadata['partition_table']),
+    }
+
+
+def _run_remote(base_url: str, partition_key: str, overrides: dict) -> dict:
+    """
+    Materializes one raw_yellow_trips partition starting from the stand-in CDN
+    (in a worker process). Without `fused`, the file is downloaded in full
+    first, as tlc-cli would, and the download counts towards wall time.
+    """
+    os.environ['TLC_BASE_URL'] = base_url
+
+    with tempfile.TemporaryDirectory() as raw_dir:
+        started = time.perf_counter()
+        download_seconds = None
+        if not overrides.get('fused'):
+            filename = f'yellow_tripdata_{partition_key[:7]}.parquet'
+            with (
+                httpx.stream('GET', f'{base_url}/{filename}') as response,
+                open(os.path.join(raw_dir, filename), 'wb') as f,
+            ):
+                response.raise_for_status()
+                for chunk in response.iter_bytes(1 << 20):
+                    f.write(chunk)
+            download_seconds = round(time.perf_counter() - started, 3)
+
+        measured = _run_trips(raw_dir, partition_key, overrides)
+        wall = time.perf_counter() - started
+
+    return {
+        **measured,
+        'wall_seconds': round(wall, 3),
+        'rows_per_second': round(measured['rows'] / wall),
+        'download_seconds': download_seconds,
+    }
+
+
+def _run_weather(
+    archive_url: str, first_key: str, last_key: str, cache_dir: str, overrides: dict
+) -> dict:
+    """
+    Materializes raw_weather_data over a range of partitions in a single run,
+    as a backfill with BackfillPolicy.single_run would (in a worker process).
+    """
+    from dagster import materialize
+    from orchestrator.assets.ingestion import monthly_partitions
+    from orchestrator.assets.weather import raw_weather_data
+    from orchestrator.resources.open_meteo import OpenMeteoResource
+    from orchestrator.utils.profiling import peak_rss_mb
+
+    database = _database()
+    open_meteo = OpenMeteoResource(
+        archive_url=archive_url, cache_dir=cache_dir, backoff_seconds=0.1, **overrides
+    )
+    start = monthly_partitions.time_window_for_partition_key(first_key).start
+    end = monthly_partitions.time_window_for_partition_key(last_key).end
+
+    started = time.perf_counter()
+    # Direct invocation can't carry a partition range; run it like a backfill
+    materialize(
+        [raw_weather_data],
+        resources={'database': database, 'open_meteo': open_meteo},
+        tags={
+            'dagster/asset_partition_range_start': first_key,
+            'dagster/asset_partition_range_end': last_key,
+        },
+    )
+    wall = time.perf_counter() - started
+
+    conn = database.get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                'SELECT count(*) FROM raw_weather WHERE timestamp >= %s AND timestamp < %s',
+                (start.replace(tzinfo=None), end.replace(tzinfo=None)),
+            )
+            rows = cursor.fetchone()[0]
+    finally:
+        conn.close()
+
+    return {
+        'wall_seconds': round(wall, 3),
+        'rows': rows,
+        'rows_per_second': round(rows / wall),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'bytes_written': _relation_size(database, 'raw_weather'),
+    }
+
+
+class _ArchiveStandIn(BaseHTTPRequestHandler):
+    """
+    Serves synthetic Open-Meteo archive responses for any date range after
+    `latency` seconds, answering every `fail_every`-th request with a 503.
+    """
+
+    latency = 0.0
+    fail_every = 0
+    requests = 0
+    _lock = threading.Lock()
+
+    def do_GET(self):
+        with self._lock:
+            type(self).requests += 1
+            failing = self.fail_every and self.requests % self.fail_every == 0
+        time.sleep(self.latency)
+        if failing:
+            self.send_error(503)
+            return
+
+        query = parse_qs(urlparse(self.path).query)
+        start = datetime.date.fromisoformat(query['start_date'][0])
+        end = datetime.date.fromisoformat(query['end_date'][0])
+        hourly = generate_hourly_weather(start, end, np.random.default_rng(0))
+        body = json.dumps({'hourly': hourly}).encode()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _TripFileStandIn(BaseHTTPRequestHandler):
+    """
+    Serves the files in `directory` like the TLC CDN: HEAD, ETag, single
+    byte ranges and If-Range, optionally capped at `bytes_per_second`.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    directory = ''
+    bytes_per_second = 0
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def _serve(self, send_body: bool):
+        path = os.path.join(self.directory, os.path.basename(urlparse(self.path).path))
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+
+        size = os.path.getsize(path)
+        etag = f'"{os.path.getmtime(path):.0f}-{size}"'
+        start, end = 0, size - 1
+        requested = self.headers.get('Range')
+        # A stale If-Range gets the whole (current) file
+        if self.headers.get('If-Range', etag) != etag:
+            requested = None
+        if requested:
+            first, last = requested.removeprefix('bytes=').split('-')
+            if first:
+                start, end = int(first), min(int(last or end), end)
+            else:
+                start = max(size - int(last), 0)
+
+        self.send_response(206 if requested else 200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', etag)
+        if requested:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        self.end_headers()
+        if not send_body:
+            return
+
+        with open(path, 'rb') as f:
+            f.seek(start)
+            remaining = end - start + 1
+            try:
+                while remaining > 0:
+                    chunk = f.read(min(STANDIN_CHUNK_SIZE, remaining))
+                    self.wfile.write(chunk)
+                    remaining -= len(chunk)
+                    if self.bytes_per_second:
+                        time.sleep(len(chunk) / self.bytes_per_second)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the ingestion assets')
+    parser.add_argument(
+        '--rows', type=int, default=1_000_000, help='Synthetic trips to generate'
+    )
+    parser.add_argument(
+        '--month', type=str, default='2024-01', help='Month to load (YYYY-MM)'
+    )
+    parser.add_argument(
+        '--row_group_size', type=int, default=250_000, help='Rows per Parquet row group'
+    )
+    parser.add_argument(
+        '--strategies',
+        nargs='+',
+        default=[*STRATEGIES, *REMOTE_STRATEGIES],
+        choices=[*STRATEGIES, *REMOTE_STRATEGIES],
+        help='raw_yellow_trips loading strategies to run',
+    )
+    parser.add_argument(
+        '--bandwidth_mbps',
+        type=float,
+        default=0,
+        help='Cap the stand-in CDN at this many MB/s (0 = unlimited)',
+    )
+    parser.add_argument(
+        '--weather_months',
+        type=int,
+        default=12,
+        help='Months in the raw_weather_data backfill (ending at --month)',
+    )
+    parser.add_argument(
+        '--weather_latency_ms',
+        type=float,
+        default=200,
+        help='Round-trip latency of the Open-Meteo stand-in',
+    )
+    parser.add_argument(
+        '--weather_fail_every',
+        type=int,
+        default=0,
+        help='Answer every Nth Open-Meteo request with a 503 (0 = never)',
+    )
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per strategy')
+    parser.add_argument('--output', type=str, default=None, help='Results JSON path')
+    parser.add_argument(
+        '--baseline',
+        type=str,
+        default=None,
+        help='Previous results JSON to compare against',
+    )
+    args = parser.parse_args()
+
+    year, month = (int(part) for part in args.month.split('-'))
+    partition_key = f'{args.month}-01'
+    results = []
+
+    with tempfile.TemporaryDirectory() as raw_dir:
+        # 1. Synthetic source file
+        parquet_path = os.path.join(raw_dir, f'yellow_tripdata_{args.month}.parquet')
+        print(f'Generating {args.rows:,} synthetic trips for {args.month}...')
+        write_trips_parquet(parquet_path, args.rows, year, month, args.row_group_size)
+        file_bytes = os.path.getsize(parquet_path)
+
+        # 2. raw_yellow_trips, once per strategy. Remote strategies fetch the
+        #    same file from a local stand-in for the TLC CDN.
+        handler = type(
+            '_Handler',
+            (_TripFileStandIn,),
+            {
+                'directory': raw_dir,
+                'bytes_per_second': args.bandwidth_mbps * 1_000_000,
+            },
+        )
+        cdn = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=cdn.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{cdn.server_port}/trip-data'
+
+        try:
+            for strategy in args.strategies:
+                for run in range(args.repeat):
+                    print(
+                        f'raw_yellow_trips [{strategy}] run {run + 1}/{args.repeat}...'
+                    )
+                    if strategy in REMOTE_STRATEGIES:
+                        measured = in_fresh_process(
+                            _run_remote,
+                            base_url,
+                            partition_key,
+                            REMOTE_STRATEGIES[strategy],
+                        )
+                    else:
+                        measured = in_fresh_process(
+                            _run_trips, raw_dir, partition_key, STRATEGIES[strategy]
+                        )
+                    results.append(
+                        {
+                            'asset': 'raw_yellow_trips',
+                            'strategy': strategy,
+                            'run': run,
+                            **measured,
+                        }
+                    )
+        finally:
+            cdn.shutdown()
+
+    # 3. raw_weather_data backfills against a local stand-in for Open-Meteo
+    _ArchiveStandIn.latency = args.weather_latency_ms / 1000
+    _ArchiveStandIn.fail_every = args.weather_fail_every
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _ArchiveStandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    archive_url = f'http://127.0.0.1:{server.server_port}/v1/archive'
+
+    first = year * 12 + month - args.weather_months
+    first_key = f'{first // 12}-{first % 12 + 1:02d}-01'
+    try:
+        for run in range(args.repeat):
+            with tempfile.TemporaryDirectory() as cache_root:
+                for strategy, overrides in WEATHER_STRATEGIES.items():
+                    print(
+                        f'raw_weather_data [{strategy}] {args.weather_months} months '
+                        f'run {run + 1}/{args.repeat}...'
+                    )
+                    # Every strategy but 'cached' starts from an empty cache
+                    cache_dir = os.path.join(
+                        cache_root, 'coalesced' if strategy == 'cached' else strategy
+                    )
+                    served_before = _ArchiveStandIn.requests
+                    measured = in_fresh_process(
+                        _run_weather,
+                        archive_url,
+                        first_key,
+                        partition_key,
+                        cache_dir,
+                        overrides,
+                    )
+                    results.append(
+                        {
+                            'asset': 'raw_weather_data',
+                            'strategy': strategy,
+                            'run': run,
+                            **measured,
+                            'http_requests': _ArchiveStandIn.requests - served_before,
+                        }
+                    )
+    finally:
+        server.shutdown()
+
+    for row in results:
+        print(
+            f'{row["asset"]:<18} {row["strategy"]:<18} {row["wall_seconds"]:>8.2f}s '
+            f'{row["rows_per_second"]:>10,} rows/s {row["peak_rss_mb"]:>8.1f} MiB'
+        )
+
+    params = {
+        'rows': args.rows,
+        'month': args.month,
+        'row_group_size': args.row_group_size,
+        'file_bytes': file_bytes,
+        'repeat': args.repeat,
+        'bandwidth_mbps': args.bandwidth_mbps,
+        'weather_months': args.weather_months,
+        'weather_latency_ms': args.weather_latency_ms,
+    }
+    write_results(
+        'ingestion', params, results, args.output or default_output('ingestion')
+    )
+
+    if args.baseline:
+        regressions = compare_to_baseline(
+            results, args.baseline, ('asset', 'strategy', 'run'), 'rows_per_second'
+        )
+        if regressions:
+            print(f'{len(regressions)} regression(s) beyond threshold.')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+"""Synthetic NYC TLC yellow-trip data with realistic schema and cardinalities."""
+
+import datetime
+
+import holidays
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Physical schema of the 2024 TLC yellow-trip files
+YELLOW_TRIPS_SCHEMA = pa.schema(
+    [
+        ('VendorID', pa.int32()),
+        ('tpep_pickup_datetime', pa.timestamp('us')),
+        ('tpep_dropoff_datetime', pa.timestamp('us')),
+        ('passenger_count', pa.int64()),
+        ('trip_distance', pa.float64()),
+        ('RatecodeID', pa.int64()),
+        ('store_and_fwd_flag', pa.large_string()),
+        ('PULocationID', pa.int32()),
+        ('DOLocationID', pa.int32()),
+        ('payment_type', pa.int64()),
+        ('fare_amount', pa.float64()),
+        ('extra', pa.float64()),
+        ('mta_tax', pa.float64()),
+        ('tip_amount', pa.float64()),
+        ('tolls_amount', pa.float64()),
+        ('improvement_surcharge', pa.float64()),
+        ('total_amount', pa.float64()),
+        ('congestion_surcharge', pa.float64()),
+        ('Airport_fee', pa.float64()),
+    ]
+)
+
+# Relative pickup volume by hour of day (quiet overnight, evening peak)
+HOURLY_PROFILE = np.array(
+    [
+        3,
+        2,
+        1.5,
+        1,
+        1,
+        1.5,
+        3,
+        5,
+        6,
+        6,
+        6,
+        6.5,
+        7,
+        7,
+        7.5,
+        8,
+        8,
+        8.5,
+        9,
+        8.5,
+        8,
+        7,
+        6,
+        4.5,
+    ]
+)
+
+# Relative daily volume, Monday first (busy end of week, quiet Sunday)
+WEEKDAY_PROFILE = np.array([0.9, 0.95, 1.0, 1.05, 1.1, 1.05, 0.85])
+
+# Daily volume on NY public holidays, relative to an ordinary day
+HOLIDAY_FACTOR = 0.7
+
+# Share of rows reported in the file but picked up outside its month
+LATE_REPORTING_RATE = 0.001
+
+
+def _zone_weights(rng: np.random.Generator) -> np.ndarray:
+    """Zipf-like weights over the 265 TLC zones (a few Manhattan zones dominate)."""
+    weights = 1 / np.arange(1, 266) ** 1.1
+    return rng.permutation(weights) / weights.sum()
+
+
+def generate_trips(
+    rows: int, year: int, month: int, rng: np.random.Generator
+) -> pa.Table:
+    """Builds `rows` synthetic trips picked up during the given month."""
+    start = datetime.datetime(year, month, 1)
+    end = datetime.datetime(year + month // 12, month % 12 + 1, 1)
+    hours = int((end - start).total_seconds() // 3600)
+
+    # Pickups follow the daily profile; a small share lands outside the month
+    hour_weights = np.resize(HOURLY_PROFILE, hours)
+    pickup_hour = rng.choice(hours, size=rows, p=hour_weights / hour_weights.sum())
+    pickup_offset = pickup_hour * 3600 + rng.integers(0, 3600, rows)
+    late = rng.random(rows) < LATE_REPORTING_RATE
+    pickup_offset[late] -= rng.integers(3600, 90 * 86400, late.sum())
+    pickup = np.datetime64(start, 's') + pickup_offset.astype('timedelta64[s]')
+
+    distance = np.round(rng.lognormal(0.6, 0.9, rows), 2)
+    duration = distance * rng.uniform(120, 400, rows) + rng.integers(60, 300, rows)
+    dropoff = pickup + duration.astype('timedelta64[s]')
+
+    zones = _zone_weights(rng)
+    payment_type = rng.choice(
+        [0, 1, 2, 3, 4], size=rows, p=[0.04, 0.78, 0.15, 0.01, 0.02]
+    )
+    fare = np.round(3.0 + distance * 3.5 + duration / 60 * 0.7, 2)
+    tip = np.where(
+        payment_type == 1, np.round(fare * rng.uniform(0.1, 0.3, rows), 2), 0.0
+    )
+    tolls = np.where(rng.random(rows) < 0.05, 6.94, 0.0)
+    congestion = np.where(rng.random(rows) < 0.9, 2.5, 0.0)
+    airport_fee = np.where(rng.random(rows) < 0.08, 1.75, 0.0)
+    total = np.round(fare + 1.0 + 0.5 + tip + tolls + 1.0 + congestion + airport_fee, 2)
+
+    passenger_count = rng.choice(
+        7, size=rows, p=[0.02, 0.72, 0.14, 0.04, 0.02, 0.04, 0.02]
+    )
+    passenger_missing = payment_type == 0  # TLC leaves these null on unknown payment
+
+    return pa.table(
+        {
+            'VendorID': pa.array(
+                rng.choice([1, 2, 6, 7], size=rows, p=[0.25, 0.74, 0.005, 0.005]),
+                pa.int32(),
+            ),
+            'tpep_pickup_datetime': pa.array(pickup, pa.timestamp('us')),
+            'tpep_dropoff_datetime': pa.array(dropoff, pa.timestamp('us')),
+            'passenger_count': pa.array(
+                passenger_count, pa.int64(), mask=passenger_missing
+            ),
+            'trip_distance': distance,
+            'RatecodeID': pa.array(
+                rng.choice(
+                    [1, 2, 3, 4, 5, 99],
+                    size=rows,
+                    p=[0.93, 0.04, 0.005, 0.005, 0.01, 0.01],
+                ),
+                pa.int64(),
+                mask=passenger_missing,
+            ),
+            'store_and_fwd_flag': pa.array(
+                np.where(rng.random(rows) < 0.005, 'Y', 'N'), pa.large_string()
+            ),
+            'PULocationID': pa.array(
+                rng.choice(np.arange(1, 266), size=rows, p=zones), pa.int32()
+            ),
+            'DOLocationID': pa.array(
+                rng.choice(np.arange(1, 266), size=rows, p=zones), pa.int32()
+            ),
+            'payment_type': payment_type,
+            'fare_amount': fare,
+            'extra': np.where(rng.random(rows) < 0.6, 1.0, 0.0),
+            'mta_tax': np.full(rows, 0.5),
+            'tip_amount': tip,
+            'tolls_amount': tolls,
+            'improvement_surcharge': np.full(rows, 1.0),
+            'total_amount': total,
+            'congestion_surcharge': congestion,
+            'Airport_fee': airport_fee,
+        },
+        schema=YELLOW_TRIPS_SCHEMA,
+    )
+
+
+def write_trips_parquet(
+    path: str,
+    rows: int,
+    year: int,
+    month: int,
+    row_group_size: int = 1_000_000,
+    seed: int = 42,
+) -> str:
+    """
+    Writes a synthetic month of yellow trips to `path`.
+
+    Rows are generated and written one row group at a time, so files much
+    larger than memory can be produced.
+    """
+    rng = np.random.default_rng(seed)
+    with pq.ParquetWriter(path, YELLOW_TRIPS_SCHEMA) as writer:
+        written = 0
+        while written < rows:
+            chunk = min(row_group_size, rows - written)
+            writer.write_table(generate_trips(chunk, year, month, rng))
+            written += chunk
+    return path
+
+
+def generate_hourly_weather(
+    start: datetime.date, end: datetime.date, rng: np.random.Generator
+) -> dict:
+    """
+    Builds an Open-Meteo archive style `hourly` payload for [start, end].
+
+    Both bounds are inclusive, matching the archive API's `start_date` and
+    `end_date` parameters.
+    """
+    hours = ((end - start).days + 1) * 24
+    stamps = [
+        datetime.datetime.combine(start, datetime.time()) + datetime.timedelta(hours=h)
+        for h in range(hours)
+    ]
+    day_of_year = np.array([stamp.timetuple().tm_yday for stamp in stamps])
+    temperature = (
+        12 - 12 * np.cos(day_of_year / 365 * 2 * np.pi) + rng.normal(0, 3, hours)
+    )
+    precipitation = np.where(rng.random(hours) < 0.1, rng.exponential(1.5, hours), 0.0)
+    snowfall = np.where(temperature < 0, precipitation * 0.7, 0.0)
+    return {
+        'time': [stamp.strftime('%Y-%m-%dT%H:%M') for stamp in stamps],
+        'temperature_2m': np.round(temperature, 1).tolist(),
+        'precipitation': np.round(precipitation, 1).tolist(),
+        'rain': np.round(np.where(temperature >= 0, precipitation, 0.0), 1).tolist(),
+        'snowfall': np.round(snowfall, 2).tolist(),
+        'windspeed_10m': np.round(rng.gamma(2, 6, hours), 1).tolist(),
+    }
+
+
+def generate_hourly_demand(
+    start: datetime.date, days: int, trips_per_day: int, rng: np.random.Generator
+) -> pa.Table:
+    """
+    Builds hourly pickups per zone (demand_hour, pickup_location_id,
+    trip_count) for `days` days from `start`, shaped like dm_hourly_zone_demand.
+
+    Volume follows the daily and weekday profiles, drops on NY holidays and
+    is overdispersed (gamma-Poisson) per zone-hour; zero cells are left out,
+    as in the mart.
+    """
+    day = np.datetime64(start, 'D') + np.arange(days)
+    ny_holidays = holidays.US(subdiv='NY', years=range(start.year, start.year + 2))
+    weekday = (day.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+    daily = trips_per_day * WEEKDAY_PROFILE[weekday] / WEEKDAY_PROFILE.mean()
+    daily *= np.where([d.item() in ny_holidays for d in day], HOLIDAY_FACTOR, 1.0)
+    hourly = (daily[:, None] * HOURLY_PROFILE / HOURLY_PROFILE.sum()).ravel()
+
+    expected = hourly[:, None] * _zone_weights(rng)
+    counts = rng.poisson(expected * rng.gamma(8.0, 1 / 8.0, expected.shape))
+    hour_index, zone_index = np.nonzero(counts)
+    hours = (np.datetime64(start, 'h') + np.arange(days * 24)).astype('datetime64[us]')
+    return pa.table(
+        {
+            'demand_hour': pa.array(hours[hour_index], pa.timestamp('us')),
+            'pickup_location_id': pa.array(zone_index + 1, pa.int16()),
+            'trip_count': pa.array(counts[hour_index, zone_index], pa.int64()),
+        }
+    )
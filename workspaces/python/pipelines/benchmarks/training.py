@@ -0,0 +1,252 @@
+"""
+Price model encoding benchmark.
+
+Trains the price model (analytics.training) once per categorical encoding on
+the same rows and the same train/test split:
+
+    onehot  dense one-hot zone and weekday columns (the original pipeline)
+    sparse  the same one-hot columns kept in a sparse matrix
+    native  one integer code per categorical, split on natively by XGBoost
+
+Each encoding runs in a fresh process, so peak RSS is its own. Each result
+row records fit seconds, the pickled pipeline's size, batch predict seconds
+over the test split, per-row predict latency (one-row DataFrames, as the API
+calls it; median and p95) and test MAE. The whole run is saved as one JSON
+file.
+
+Trips are synthetic by default (with synthetic weather and NY holidays), or
+read through the trainer's own load_data from Postgres or the Parquet lake.
+
+Usage (from workspaces/python/pipelines, with workspaces/python importable):
+
+    PYTHONPATH=.. python -m benchmarks.training --rows 500000 --baseline previous.json
+    PYTHONPATH=.. python -m benchmarks.training --source lake --encodings onehot native
+"""
+
+import argparse
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+import holidays
+import numpy as np
+import pandas as pd
+import polars as pl
+
+from analytics.training.config import ENCODINGS
+from analytics.training.data_loader import add_features, load_data, prepare_features
+from analytics.training.models import create_pipeline
+
+from .common import (
+    compare_to_baseline,
+    default_output,
+    in_fresh_process,
+    write_results,
+)
+from .synthetic import generate_hourly_weather, generate_trips
+
+
+def _synthetic_trips(rows: int, year: int, month: int, seed: int) -> pl.DataFrame:
+    """Raw training rows (the columns of DATA_QUERY) for one synthetic month."""
+    rng = np.random.default_rng(seed)
+    trips = pl.from_arrow(generate_trips(rows, year, month, rng))
+
+    first = trips['tpep_pickup_datetime'].min().date()
+    last = trips['tpep_pickup_datetime'].max().date()
+    weather = generate_hourly_weather(first, last, rng)
+    weather = pl.DataFrame(
+        {
+            'hour': pl.Series(weather['time']).str.to_datetime('%Y-%m-%dT%H:%M'),
+            'precip_mm': weather['precipitation'],
+            'temp_c': weather['temperature_2m'],
+        }
+    ).with_columns(pl.col('hour').cast(pl.Datetime('us')))
+    holiday_dates = list(
+        holidays.US(state='NY', years=range(first.year, last.year + 1))
+    )
+
+    return (
+        trips.filter(
+            (pl.col('total_amount') > 0)
+            & (pl.col('total_amount') < 200)
+            & (pl.col('trip_distance') > 0)
+        )
+        .select(
+            pl.col('PULocationID').alias('pickup_location_id'),
+            pl.col('DOLocationID').alias('dropoff_location_id'),
+            pl.col('tpep_pickup_datetime').alias('pickup_datetime'),
+            'trip_distance',
+            'total_amount',
+        )
+        .with_columns(pl.col('pickup_datetime').dt.truncate('1h').alias('hour'))
+        .join(weather, on='hour', how='left')
+        .drop('hour')
+        .with_columns(
+            pl.col('precip_mm').fill_null(0),
+            pl.col('temp_c').fill_null(15),
+            pl.col('pickup_datetime')
+            .dt.date()
+            .is_in(holiday_dates)
+            .cast(pl.Int64)
+            .alias('is_holiday_int'),
+        )
+    )
+
+
+def _latency_us(pipeline, rows: list[dict]) -> np.ndarray:
+    """Microseconds per one-row predict call, the way the API calls the model."""
+    seconds = []
+    for row in rows:
+        frame = pd.DataFrame([row])
+        started = time.perf_counter()
+        pipeline.predict(frame)
+        seconds.append(time.perf_counter() - started)
+    return np.array(seconds) * 1e6
+
+
+def _run_encoding(encoding: str, data_path: str, args: argparse.Namespace) -> dict:
+    """Fits and scores one encoding (in a worker process)."""
+    from orchestrator.utils.profiling import peak_rss_mb
+
+    X_train, X_test, y_train, y_test = prepare_features(pl.read_parquet(data_path))
+    pipeline = create_pipeline(
+        'xgboost',
+        y_train,
+        encoding,
+        n_estimators=args.n_estimators,
+        learning_rate=args.learning_rate,
+        max_depth=args.max_depth,
+    )
+
+    started = time.perf_counter()
+    pipeline.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    preds = pipeline.predict(X_test)
+    predict_seconds = time.perf_counter() - started
+
+    # Warm up once, then time single rows from the test split
+    sample = X_test.head(args.latency_rows).to_dict('records')
+    _latency_us(pipeline, sample[:1])
+    latency = _latency_us(pipeline, sample)
+
+    return {
+        'encoding': encoding,
+        'train_rows': len(X_train),
+        'fit_seconds': round(fit_seconds, 3),
+        'model_bytes': len(pickle.dumps(pipeline)),
+        'predict_seconds': round(predict_seconds, 4),
+        'predict_row_us_p50': round(float(np.median(latency)), 1),
+        'predict_row_us_p95': round(float(np.percentile(latency, 95)), 1),
+        'mae': round(float(np.abs(y_test.to_numpy() - preds).mean()), 4),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the price model categorical encodings'
+    )
+    parser.add_argument(
+        '--source',
+        choices=['synthetic', 'postgres', 'lake'],
+        default='synthetic',
+        help='Synthetic trips, or the training data of load_data',
+    )
+    parser.add_argument(
+        '--rows', type=int, default=500_000, help='Synthetic trips (before filters)'
+    )
+    parser.add_argument('--year', type=int, default=2024, help='Synthetic year')
+    parser.add_argument('--month', type=int, default=1, help='Synthetic month')
+    parser.add_argument(
+        '--start_date', type=str, default=None, help='First pickup date (load_data)'
+    )
+    parser.add_argument(
+        '--end_date', type=str, default=None, help='Pickup date to stop before'
+    )
+    parser.add_argument(
+        '--encodings',
+        nargs='+',
+        default=ENCODINGS,
+        choices=ENCODINGS,
+        help='Encodings to run',
+    )
+    parser.add_argument(
+        '--n_estimators', type=int, default=100, help='Number of estimators'
+    )
+    parser.add_argument(
+        '--learning_rate', type=float, default=0.05, help='Learning rate'
+    )
+    parser.add_argument('--max_depth', type=int, default=10, help='Maximum tree depth')
+    parser.add_argument(
+        '--latency_rows', type=int, default=500, help='Single-row predict calls'
+    )
+    parser.add_argument('--seed', type=int, default=0, help='Synthetic data seed')
+    parser.add_argument('--output', type=str, default=None, help='Results JSON path')
+    parser.add_argument(
+        '--baseline',
+        type=str,
+        default=None,
+        help='Previous results JSON to compare against',
+    )
+    args = parser.parse_args()
+
+    # 1. Training rows, engineered once for every encoding
+    if args.source == 'synthetic':
+        print(f'Generating {args.rows:,} synthetic trips...')
+        df = add_features(_synthetic_trips(args.rows, args.year, args.month, args.seed))
+    else:
+        df = load_data(args.source, args.start_date, args.end_date)
+    print(f'{df.height:,} training rows.')
+
+    # 2. One fresh process per encoding
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        data_path = os.path.join(tmp, 'trips.parquet')
+        df.write_parquet(data_path)
+        for encoding in args.encodings:
+            print(f'{encoding}...')
+            results.append(in_fresh_process(_run_encoding, encoding, data_path, args))
+
+    for row in results:
+        print(
+            f'{row["encoding"]:<8} fit {row["fit_seconds"]:>8.2f}s '
+            f'model {row["model_bytes"] / 1024:>8.0f} KiB '
+            f'row p50 {row["predict_row_us_p50"]:>7.0f}us '
+            f'p95 {row["predict_row_us_p95"]:>7.0f}us '
+            f'MAE {row["mae"]:>6.3f} {row["peak_rss_mb"]:>8.1f} MiB'
+        )
+
+    params = {
+        'source': args.source,
+        'rows': df.height,
+        'year': args.year if args.source == 'synthetic' else None,
+        'month': args.month if args.source == 'synthetic' else None,
+        'seed': args.seed if args.source == 'synthetic' else None,
+        'start_date': args.start_date,
+        'end_date': args.end_date,
+        'n_estimators': args.n_estimators,
+        'learning_rate': args.learning_rate,
+        'max_depth': args.max_depth,
+        'latency_rows': args.latency_rows,
+    }
+    write_results(
+        'training', params, results, args.output or default_output('training')
+    )
+
+    if args.baseline:
+        regressions = []
+        for metric in ('fit_seconds', 'predict_row_us_p50', 'mae'):
+            regressions += compare_to_baseline(
+                results, args.baseline, ('encoding',), metric, higher_is_better=False
+            )
+        if regressions:
+            print(f'{len(regressions)} regression(s) beyond threshold.')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
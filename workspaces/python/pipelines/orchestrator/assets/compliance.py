@@ -1,76 +1,509 @@
-import pickle
+import datetime
+import os
+import time
+from collections.abc import Iterator
 
+import numpy as np
 import polars as pl
-from dagster import AssetExecutionContext, AssetKey, asset
-from sqlalchemy import create_engine
+from dagster import AssetExecutionContext, AssetKey, Config, MaterializeResult, asset
+from pydantic import Field
 
 from ..resources.database import PostgresResource
+from ..utils.compliance_rules import RULE_IDS, flag_trips, select_rules
+from ..utils.lake import month_after, scan_trips, trip_partitions
+from ..utils.postgres import column_definitions, copy_frames, table_layout
+from ..utils.scoring import ANOMALY_FEATURES, load_model, score_chunks
+from ..utils.watermark import (
+    clear_watermark,
+    ensure_watermark_table,
+    get_watermark,
+    set_watermark,
+)
 
+ANOMALY_MODEL_PATH = '/app/data/models/anomaly_detector.pkl'
+# rule_id of the Isolation Forest's flags
+MODEL_RULE_ID = 'IsolationForest_v1'
 
-@asset(
-    group_name='analytics',
-    deps=[AssetKey('fct_trips')],  # Run after the mart is built
-    description='Scans for fraud/anomalies using Isolation Forest',
+# compliance_flags columns written per flag (the key and flagged_at are
+# filled in by Postgres)
+COMPLIANCE_FLAGS_SCHEMA = {
+    'vendor_id': pl.Int32,
+    'pickup_datetime': pl.Datetime,
+    'trip_distance': pl.Float64,
+    'total_amount': pl.Float64,
+    'duration_seconds': pl.Float64,
+    'score': pl.Int64,
+    'rule_id': pl.String,
+}
+
+# Deterministic trip identity (fct_trips has no key): the same trip hashes
+# the same in every run, whichever source it was read from
+TRIP_FINGERPRINT_SQL = (
+    'md5(ROW(vendor_id, extract(epoch FROM pickup_datetime), '
+    'trip_distance, total_amount, duration_seconds)::text)::uuid'
 )
-def fraud_detection_job(context: AssetExecutionContext, database: PostgresResource):
-    model_path = '/app/data/models/anomaly_detector.pkl'
 
-    # 1. Load Model
-    try:
-        with open(model_path, 'rb') as f:
-            pipeline = pickle.load(f)
-    except FileNotFoundError:
-        context.log.info('No anomaly model found. Skipping check.')
-        return 'Skipped'
+# Review queries: recent flags, by rule, by vendor
+COMPLIANCE_FLAGS_INDEXES = {
+    'compliance_flags_pickup_idx': '(pickup_datetime)',
+    'compliance_flags_rule_idx': '(rule_id, pickup_datetime)',
+    'compliance_flags_vendor_idx': '(vendor_id, pickup_datetime)',
+}
 
-    # 2. Load Recent Data (e.g., Last 24 hours)
-    # In a real system, you'd use the partition key here.
-    conn_str = database.get_connection_string()
-    query = """
-    SELECT 
+
+class ComplianceConfig(Config):
+    data_source: str = Field(
+        default='postgres',
+        description="Where to read trips from: 'postgres' (fct_trips) or 'lake'",
+    )
+    batch_size: int = Field(
+        default=50_000,
+        description='Trips scored per batch (each batch is committed on its own)',
+    )
+    max_batches: int = Field(
+        default=0, description='Stop after this many batches (0 = scan everything)'
+    )
+    disabled_rules: list[str] = Field(
+        default=[],
+        description=f'Deterministic rules to skip, out of {", ".join(RULE_IDS)}',
+    )
+    reset_watermark: bool = Field(
+        default=False,
+        description='Forget the high-water mark and rescan all trips from the start',
+    )
+    sweep_month: str = Field(
+        default='',
+        description=(
+            'YYYY-MM: re-score that whole month with the model (e.g. after a '
+            'retrain) instead of scanning new trips; the watermark is left alone'
+        ),
+    )
+    sweep_chunk_rows: int = Field(
+        default=250_000, description='Trips per scoring task in a month sweep'
+    )
+    max_workers: int = Field(
+        default=0,
+        description='Processes scoring a month sweep (0 = one per CPU, 1 = serial)',
+    )
+
+
+def _batch_end(
+    config: ComplianceConfig, cursor, after: datetime.datetime | None
+) -> datetime.datetime | None:
+    """
+    Pickup time of the `batch_size`-th trip in fct_trips after `after`, or
+    None if fewer trips than that are left. Walks the pickup_datetime index,
+    no sort.
+    """
+    cursor.execute(
+        """
+        SELECT pickup_datetime FROM dbt_dev.fct_trips
+        WHERE pickup_datetime > coalesce(%s, '-infinity'::timestamp)
+        ORDER BY pickup_datetime
+        OFFSET %s LIMIT 1
+        """,
+        (after, config.batch_size - 1),
+    )
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _scan_columns(trips: pl.LazyFrame) -> pl.LazyFrame:
+    """What the model and the rules read, from lake trips."""
+    return trips.select(
+        'vendor_id',
+        'pickup_datetime',
+        'dropoff_datetime',
+        'pickup_location_id',
+        'dropoff_location_id',
+        'trip_distance',
+        'fare_amount',
+        'total_amount',
+        (pl.col('dropoff_datetime') - pl.col('pickup_datetime'))
+        .dt.total_seconds()
+        .cast(pl.Float64)
+        .alias('duration_seconds'),
+    )
+
+
+def _postgres_batches(
+    config: ComplianceConfig, conn, conn_str: str, after: datetime.datetime | None
+) -> Iterator[tuple[pl.DataFrame, datetime.datetime]]:
+    """
+    fct_trips picked up after `after`, oldest first, in batches of about
+    `batch_size` that never split a pickup second; each with the mark it
+    advances the watermark to.
+    """
+    while True:
+        with conn.cursor() as cursor:
+            end = _batch_end(config, cursor, after)
+        df = _read_trips(config, conn_str, after=after, end=end)
+        if df.is_empty():
+            return
+        after = end or df['pickup_datetime'].max()
+        yield df, after
+        if end is None:
+            return
+
+
+def _lake_batches(
+    config: ComplianceConfig, after: datetime.datetime | None
+) -> Iterator[tuple[pl.DataFrame, datetime.datetime]]:
+    """
+    Lake trips after the mark `after`, in batches of about `batch_size`,
+    each with the mark it advances the watermark to.
+
+    Files are monthly but not sorted, so each month's file is read and
+    sorted once and the batches are cut from it. Trips are ordered by pickup
+    time clamped to their file's month: late-reported trips sort at its
+    start and stray future pickups at its end, so every trip is visited
+    exactly once and a mark always falls inside the month it came from.
+    """
+    for month_start, path in trip_partitions():
+        month_end = month_after(month_start)
+        if after is not None and after >= month_end:
+            continue
+        mark = pl.col('pickup_datetime').clip(
+            month_start, month_end - datetime.timedelta(microseconds=1)
+        )
+        trips = _scan_columns(pl.scan_parquet(path)).with_columns(mark.alias('mark'))
+        if after is not None:
+            trips = trips.filter(pl.col('mark') > after)
+        trips = trips.sort('mark').collect()
+
+        marks = trips['mark']
+        position = 0
+        while position < trips.height:
+            end = marks[min(position + config.batch_size, trips.height) - 1]
+            stop = marks.search_sorted(end, side='right')
+            yield trips.slice(position, stop - position).drop('mark'), end
+            position = stop
+
+
+def _read_trips(
+    config: ComplianceConfig,
+    conn_str: str,
+    after: datetime.datetime | None = None,
+    end: datetime.datetime | None = None,
+    since: datetime.datetime | None = None,
+    until: datetime.datetime | None = None,
+) -> pl.DataFrame:
+    """
+    Trips picked up after `after` and up to `end` (a batch), or from `since`
+    until before `until` (a month), with what the model and the rules read.
+    """
+    bounds = [
+        (operator, value)
+        for operator, value in (('>', after), ('<=', end), ('>=', since), ('<', until))
+        if value is not None
+    ]
+    if config.data_source == 'lake':
+        compare = {
+            '>': pl.Expr.gt,
+            '<=': pl.Expr.le,
+            '>=': pl.Expr.ge,
+            '<': pl.Expr.lt,
+        }
+        trips = scan_trips(start=after or since, end=until)
+        for operator, value in bounds:
+            trips = trips.filter(compare[operator](pl.col('pickup_datetime'), value))
+        return _scan_columns(trips).collect()
+
+    # Range scan on the pickup_datetime index
+    filters = ''.join(
+        f" AND pickup_datetime {operator} '{value}'" for operator, value in bounds
+    )
+    query = f"""
+    SELECT
         vendor_id,
         pickup_datetime,
+        dropoff_datetime,
+        pickup_location_id,
+        dropoff_location_id,
         trip_distance,
+        fare_amount,
         total_amount,
         EXTRACT(EPOCH FROM (dropoff_datetime - pickup_datetime)) as duration_seconds
     FROM dbt_dev.fct_trips
-    ORDER BY pickup_datetime DESC
-    LIMIT 10000 -- Scan the latest batch
+    WHERE TRUE{filters}
     """
+    return pl.read_database_uri(query, conn_str, engine='connectorx')
 
-    df = pl.read_database_uri(query, conn_str, engine='connectorx')
 
-    # 3. Predict Anomalies
-    X = df.select(['trip_distance', 'total_amount', 'duration_seconds']).to_pandas()
+def _ensure_flags_table(cursor) -> None:
+    """
+    Creates compliance_flags keyed on (trip_fingerprint, rule_id), or
+    upgrades an append-only table from earlier versions in place:
+    fingerprints its rows, drops the duplicate flags and adds the key.
+    """
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS compliance_flags (
+            trip_fingerprint UUID NOT NULL,
+            {column_definitions(COMPLIANCE_FLAGS_SCHEMA)},
+            flagged_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            PRIMARY KEY (trip_fingerprint, rule_id)
+        )
+        """
+    )
+    if 'trip_fingerprint' not in table_layout(cursor, 'compliance_flags'):
+        cursor.execute(
+            'ALTER TABLE compliance_flags ADD COLUMN trip_fingerprint UUID, '
+            'ADD COLUMN flagged_at TIMESTAMPTZ NOT NULL DEFAULT now()'
+        )
+        cursor.execute(
+            f'UPDATE compliance_flags SET trip_fingerprint = {TRIP_FINGERPRINT_SQL}'
+        )
+        cursor.execute(
+            """
+            DELETE FROM compliance_flags a
+            USING compliance_flags b
+            WHERE a.trip_fingerprint = b.trip_fingerprint
+              AND a.rule_id IS NOT DISTINCT FROM b.rule_id
+              AND a.ctid > b.ctid
+            """
+        )
+        cursor.execute(
+            'ALTER TABLE compliance_flags '
+            'ALTER COLUMN trip_fingerprint SET NOT NULL, '
+            'ADD PRIMARY KEY (trip_fingerprint, rule_id)'
+        )
+    for name, columns in COMPLIANCE_FLAGS_INDEXES.items():
+        cursor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON compliance_flags {columns}'
+        )
 
-    # Isolation Forest returns: -1 (Anomaly), 1 (Normal)
-    scores = pipeline.predict(X)
 
-    # Attach scores to dataframe
-    df_scored = df.with_columns(pl.Series(name='score', values=scores))
+def _merge_flags(conn, flags: pl.DataFrame) -> int:
+    """
+    COPYs `flags` into a temp stage and inserts the ones not recorded yet.
+    Runs in the caller's transaction; returns the number of new flags.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(
+            'CREATE TEMP TABLE compliance_flags_stage '
+            f'({column_definitions(COMPLIANCE_FLAGS_SCHEMA)}) ON COMMIT DROP'
+        )
+    copy_frames(conn, 'compliance_flags_stage', list(COMPLIANCE_FLAGS_SCHEMA), [flags])
+    columns = ', '.join(COMPLIANCE_FLAGS_SCHEMA)
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO compliance_flags (trip_fingerprint, {columns})
+            SELECT {TRIP_FINGERPRINT_SQL}, {columns} FROM compliance_flags_stage
+            ON CONFLICT (trip_fingerprint, rule_id) DO NOTHING
+            """
+        )
+        return cursor.rowcount
 
-    # Filter for Anomalies (-1)
-    anomalies = df_scored.filter(pl.col('score') == -1)
 
-    context.log.info(f'Scanned {len(df)} trips. Found {len(anomalies)} anomalies.')
+@asset(
+    group_name='analytics',
+    deps=[AssetKey('fct_trips')],  # Run after the mart is built
+    description='Scans new trips for fraud/anomalies with rules and Isolation Forest',
+)
+def fraud_detection_job(
+    context: AssetExecutionContext, config: ComplianceConfig, database: PostgresResource
+) -> MaterializeResult:
+    """
+    Checks every trip picked up after the asset's high-water mark against
+    the deterministic rules (utils/compliance_rules.py, all evaluated in one
+    Polars query per batch) and scores it with the Isolation Forest, oldest
+    first, in batches of about `batch_size` trips (a batch never splits a
+    pickup second). Each batch's flags and the advanced mark are committed
+    together, so a failed run resumes after the last committed batch.
+    Flags are keyed on a fingerprint of the trip plus the rule_id, so a
+    rescan never records the same flag twice.
 
-    # 4. Write to Compliance Table
-    if len(anomalies) > 0:
-        engine = create_engine(conn_str)
+    Trips loaded late with a pickup time before the mark are not picked up;
+    run with `reset_watermark` after backfilling older months. From the lake,
+    each month's file is read once per run (see `_lake_batches`).
 
-        # Prepare for export (Add a 'flagged_at' timestamp)
-        export_df = anomalies.with_columns(
-            pl.lit('IsolationForest_v1').alias('rule_id')
-        )
+    With `sweep_month` set, re-scores that month with the model instead; see
+    `_sweep_month`.
+    """
+    rules = select_rules(config.disabled_rules)
+    if config.sweep_month:
+        return _sweep_month(context, config, database)
 
-        # Write
-        export_df.write_database(
-            table_name='compliance_flags',
-            connection=conn_str,
-            if_table_exists='append',  # Keep a log history
-            engine='sqlalchemy',
-        )
+    # 1. Load Model
+    try:
+        pipeline = load_model(ANOMALY_MODEL_PATH)
+    except FileNotFoundError:
+        pipeline = None
+        if not rules:
+            context.log.info('No anomaly model found. Skipping check.')
+            return MaterializeResult(metadata={'skipped': True})
+        context.log.info('No anomaly model found. Checking rules only.')
+
+    conn_str = database.get_connection_string()
+    conn = database.get_connection()
+    try:
+        with conn.cursor() as cursor:
+            ensure_watermark_table(cursor)
+            _ensure_flags_table(cursor)
+            if config.reset_watermark:
+                clear_watermark(cursor, context.asset_key.to_user_string())
+            watermark = get_watermark(cursor, context.asset_key.to_user_string())
+        conn.commit()
+        context.log.info(f'Scanning trips picked up after {watermark or "the start"}.')
+
+        scanned = batches = inserted = 0
+        flags_by_rule: dict[str, int] = {}
+        started = time.perf_counter()
+        if config.data_source == 'lake':
+            batches_left = _lake_batches(config, watermark)
+        else:
+            batches_left = _postgres_batches(config, conn, conn_str, watermark)
+        while not config.max_batches or batches < config.max_batches:
+            # 2. Load the next batch after the watermark
+            df, mark = next(batches_left, (None, None))
+            if df is None:
+                break
+
+            # 3. Rule hits, one row per (trip, rule), all rules in one pass
+            hits = [
+                flag_trips(df.lazy(), rules)
+                .with_columns(pl.lit(-1).alias('score'))
+                .collect()
+            ]
+
+            # 4. Predict Anomalies
+            if pipeline is not None:
+                X = df.select(ANOMALY_FEATURES).to_pandas()
+
+                # Isolation Forest returns: -1 (Anomaly), 1 (Normal)
+                scores = pipeline.predict(X)
+
+                # Attach scores, keep the anomalies (-1)
+                hits.append(
+                    df.with_columns(
+                        pl.Series(name='score', values=scores),
+                        pl.lit(MODEL_RULE_ID).alias('rule_id'),
+                    ).filter(pl.col('score') == -1)
+                )
+            anomalies = pl.concat(
+                [
+                    frame.select(list(COMPLIANCE_FLAGS_SCHEMA)).cast(
+                        COMPLIANCE_FLAGS_SCHEMA
+                    )
+                    for frame in hits
+                ]
+            )
+
+            # 5. Write flags and advance the watermark in one transaction
+            watermark = mark
+            new_flags = _merge_flags(conn, anomalies)
+            with conn.cursor() as cursor:
+                set_watermark(cursor, context.asset_key.to_user_string(), watermark)
+            conn.commit()
+
+            scanned += df.height
+            inserted += new_flags
+            for rule_id, count in anomalies['rule_id'].value_counts().iter_rows():
+                flags_by_rule[rule_id] = flags_by_rule.get(rule_id, 0) + count
+            batches += 1
+            context.log.info(
+                f'Batch {batches}: {df.height} trips up to {watermark}, '
+                f'{anomalies.height} flagged ({new_flags} new).'
+            )
+        elapsed = time.perf_counter() - started
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    flagged = sum(flags_by_rule.values())
+    context.log.info(f'Scanned {scanned} trips. Found {flagged} anomalies.')
+
+    return MaterializeResult(
+        metadata={
+            'trips_scanned': scanned,
+            'anomalies': flagged,
+            'flags_by_rule': flags_by_rule,
+            # Flags already recorded by an earlier run are not written again
+            'flags_inserted': inserted,
+            'batches': batches,
+            'seconds': round(elapsed, 2),
+            'trips_per_second': round(scanned / elapsed) if scanned else 0,
+            'watermark': watermark.isoformat() if watermark else '',
+        }
+    )
+
+
+def _sweep_month(
+    context: AssetExecutionContext, config: ComplianceConfig, database: PostgresResource
+) -> MaterializeResult:
+    """
+    Re-scores every trip picked up in `sweep_month` with the anomaly model,
+    on a process pool (utils/scoring.py): the month's features are shared
+    with the workers once, each worker loads the model once, and the flags
+    of each finished chunk are merged and committed while later chunks are
+    still being scored. Rules are not re-run and the watermark is left as is.
+    """
+    year, month = (int(part) for part in config.sweep_month.split('-'))
+    start = datetime.datetime(year, month, 1)
+    end = datetime.datetime(year + month // 12, month % 12 + 1, 1)
+    if not os.path.exists(ANOMALY_MODEL_PATH):
+        raise FileNotFoundError(f'No anomaly model at {ANOMALY_MODEL_PATH}')
+
+    # 1. Load the month
+    started = time.perf_counter()
+    df = _read_trips(config, database.get_connection_string(), since=start, until=end)
+    features = df.select(ANOMALY_FEATURES).to_numpy(order='c').astype(np.float64)
+    read_seconds = time.perf_counter() - started
+    context.log.info(f'Read {df.height} trips for {config.sweep_month}.')
+
+    # 2. Score chunks in parallel, merging each chunk's flags as it finishes
+    max_workers = config.max_workers or os.cpu_count() or 1
+    flagged = inserted = chunks = 0
+    started = time.perf_counter()
+    conn = database.get_connection()
+    try:
+        with conn.cursor() as cursor:
+            _ensure_flags_table(cursor)
+        conn.commit()
+
+        for first, stop, scores in score_chunks(
+            ANOMALY_MODEL_PATH, features, config.sweep_chunk_rows, max_workers
+        ):
+            anomalies = (
+                df.slice(first, stop - first)
+                .with_columns(
+                    pl.Series(name='score', values=scores),
+                    pl.lit(MODEL_RULE_ID).alias('rule_id'),
+                )
+                .filter(pl.col('score') == -1)
+                .select(list(COMPLIANCE_FLAGS_SCHEMA))
+                .cast(COMPLIANCE_FLAGS_SCHEMA)
+            )
+            inserted += _merge_flags(conn, anomalies)
+            conn.commit()
+            flagged += anomalies.height
+            chunks += 1
+        elapsed = time.perf_counter() - started
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
 
-        return f'Flagged {len(anomalies)} suspicious trips.'
+    context.log.info(
+        f'Re-scored {df.height} trips in {elapsed:.1f}s on {max_workers} '
+        f'process(es): {flagged} anomalies, {inserted} new.'
+    )
 
-    return 'No anomalies detected.'
+    return MaterializeResult(
+        metadata={
+            'sweep_month': config.sweep_month,
+            'trips_scanned': df.height,
+            'anomalies': flagged,
+            'flags_inserted': inserted,
+            'chunks': chunks,
+            'max_workers': max_workers,
+            'read_seconds': round(read_seconds, 2),
+            'seconds': round(elapsed, 2),
+            'trips_per_second': round(df.height / elapsed) if df.height else 0,
+        }
+    )
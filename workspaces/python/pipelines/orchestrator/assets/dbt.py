@@ -49,6 +49,11 @@ class MetrofleetDbtTranslator(DagsterDbtTranslator):
             if name == 'raw_holidays':
                 return AssetKey('raw_holidays_data')
 
+            # The manifest rows the marts read are written by raw_yellow_trips,
+            # in the same transaction as the trips themselves
+            if name == 'raw_load_manifest':
+                return AssetKey(['public', 'raw_yellow_trips'])
+
             # --- 2. Existing Taxi Logic (Keep as fallback) ---
             # Matches 'raw_yellow_trips' -> AssetKey(['public', 'raw_yellow_trips'])
             return AssetKey(['public', name])
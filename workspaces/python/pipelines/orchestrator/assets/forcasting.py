@@ -1,69 +1,212 @@
+import datetime
+import os
+import time
+
 import pandas as pd
 import polars as pl
-from dagster import AssetExecutionContext, AssetKey, asset
-from prophet import Prophet
-from sqlalchemy import create_engine
+from dagster import AssetExecutionContext, AssetKey, Config, MaterializeResult, asset
+from pydantic import Field
 
 from ..resources.database import PostgresResource
+from ..utils.forecasting import (
+    FORECAST_HORIZON_HOURS,
+    MIN_HISTORY_HOURS,
+    ForecastJob,
+    fitted_history,
+    forecast_boroughs,
+    read_cached_models,
+    write_cached_model,
+)
+from ..utils.holiday_calendar import HolidayCalendar
+from ..utils.lake import scan_trips
+from ..utils.postgres import publish_version
+from ..utils.zone_forecasting import forecast_zones
+from .holidays import raw_holidays_data
+
+# demand_forecasts / zone_demand_forecasts columns
+FORECAST_SCHEMA = {
+    'forecast_timestamp': pl.Datetime,
+    'predicted_demand': pl.Float64,
+    'conf_lower': pl.Float64,
+    'conf_upper': pl.Float64,
+    'pickup_borough': pl.String,
+}
+ZONE_FORECAST_SCHEMA = {
+    'forecast_timestamp': pl.Datetime,
+    'pickup_location_id': pl.Int16,
+    'predicted_demand': pl.Float64,
+    'conf_lower': pl.Float64,
+    'conf_upper': pl.Float64,
+}
+
+
+class ForecastConfig(Config):
+    data_source: str = Field(
+        default='postgres',
+        description=(
+            "Where to read demand from: 'postgres' (dm_hourly_borough_demand) or 'lake'"
+        ),
+    )
+    max_workers: int = Field(
+        default=0,
+        description='Processes fitting boroughs at once (0 = one per CPU, 1 = serial)',
+    )
+    refit_after_hours: int = Field(
+        default=24 * 7,
+        description='Refit a borough once this many hours arrived since its last fit',
+    )
+    force_refit: bool = Field(
+        default=False,
+        description='Ignore cached models: re-read all history and fit from scratch',
+    )
+    keep_versions: int = Field(
+        default=5, description='Published demand_forecasts versions to keep'
+    )
+
+
+def _hourly_demand(
+    config: ForecastConfig, conn_str: str, since: datetime.datetime | None
+) -> pl.DataFrame:
+    """Trips per (hour, borough), from `since` on if given."""
+    if config.data_source == 'lake':
+        # Same aggregate, computed locally from the Parquet lake
+        return (
+            scan_trips(start=since, columns=['pickup_datetime', 'pickup_borough'])
+            .filter(
+                pl.col('pickup_borough').is_not_null()
+                & (pl.col('pickup_borough') != 'Unknown')
+            )
+            .group_by(
+                pl.col('pickup_datetime').dt.truncate('1h').alias('ds'),
+                'pickup_borough',
+            )
+            .agg(pl.len().cast(pl.Int64).alias('y'))
+            .collect()
+        )
+
+    # Pre-aggregated by dbt (dm_hourly_borough_demand), indexed on the hour
+    since_filter = f"AND demand_hour >= '{since}'" if since is not None else ''
+    query = f"""
+    SELECT 
+        demand_hour as ds,
+        pickup_borough,
+        trip_count as y
+    FROM dbt_dev.dm_hourly_borough_demand
+    WHERE pickup_borough IS NOT NULL 
+      AND pickup_borough != 'Unknown'
+      {since_filter}
+    """
+    return pl.read_database_uri(query, conn_str, engine='connectorx')
 
 
 @asset(
     group_name='analytics',
-    deps=[AssetKey('dm_daily_revenue')],  # Wait for data to be ready
+    deps=[AssetKey('dm_hourly_borough_demand')],  # Wait for data to be ready
     compute_kind='python',
     description='Generates 7-day hourly demand forecasts per Borough',
 )
-def borough_demand_forecast(context: AssetExecutionContext, database: PostgresResource):
-    # 1. Fetch Data
-    conn_str = database.get_connection_string()
+def borough_demand_forecast(
+    context: AssetExecutionContext, config: ForecastConfig, database: PostgresResource
+) -> MaterializeResult:
+    """
+    Fits one Prophet model per borough and publishes history fit + 7-day
+    forecast as a new version behind the demand_forecasts view.
 
-    query = """
-    SELECT 
-        date_trunc('hour', pickup_datetime) as ds,
-        pickup_borough,
-        count(*) as y
-    FROM dbt_dev.fct_trips
-    WHERE pickup_borough IS NOT NULL 
-      AND pickup_borough != 'Unknown'
-    GROUP BY 1, 2
+    Fitted models are cached under FORECAST_MODEL_PATH together with their
+    history, so a run only reads trips since the last fit. A borough is
+    refitted (warm-started from its cached parameters) once
+    `refit_after_hours` of new data have arrived; until then its cached
+    model is reused to extend the predictions.
+
+    Boroughs run in parallel on a process pool. A borough that fails is
+    logged and left out; the run only fails if every borough does.
     """
+    # 1. Fetch Data (only what arrived since the cached fits)
+    conn_str = database.get_connection_string()
 
-    df_pl = pl.read_database_uri(query, conn_str, engine='connectorx')
-    boroughs = df_pl['pickup_borough'].unique().to_list()
+    cached = {} if config.force_refit else read_cached_models()
+    fitted = {borough: fitted_history(model) for borough, model in cached.items()}
+    since = min((h['ds'].max().to_pydatetime() for h in fitted.values()), default=None)
 
-    all_forecasts = []
+    df_pl = _hourly_demand(config, conn_str, since)
+    boroughs = sorted(set(df_pl['pickup_borough'].unique()) | set(cached))
+    if since is not None and set(boroughs) - set(cached):
+        # A borough without a cached model needs its whole history
+        context.log.info('Uncached borough(s) found, reading all history.')
+        since = None
+        df_pl = _hourly_demand(config, conn_str, since)
+    context.log.info(f'Read {df_pl.height} borough-hours since {since or "the start"}.')
 
-    # 2. Loop & Train
+    # 2. Prep one job per borough: cached history + what arrived since
+    jobs = {}
+    new_hours: dict[str, int] = {}
     for borough in boroughs:
-        context.log.info(f'Forecasting for {borough}...')
-
-        # Prep Data
         df_b = df_pl.filter(pl.col('pickup_borough') == borough).to_pandas()
-        if len(df_b) < 48:  # Skip if not enough data
-            continue
-
         df_b['ds'] = df_b['ds'].dt.tz_localize(None)
+        df_b = df_b[['ds', 'y']]
 
-        # Train
-        m = Prophet(
-            yearly_seasonality=False, weekly_seasonality=True, daily_seasonality=True
+        if borough in fitted:
+            history = fitted[borough]
+            new_hours[borough] = int((df_b['ds'] > history['ds'].max()).sum())
+            # Hours from `since` on were re-read; they replace the cached ones
+            df_b = pd.concat([history[history['ds'] < since], df_b], ignore_index=True)
+        else:
+            new_hours[borough] = len(df_b)
+
+        if len(df_b) < MIN_HISTORY_HOURS:  # Skip if not enough data
+            context.log.info(f'Skipping {borough}: {len(df_b)} hour(s) of history.')
+            continue
+
+        jobs[borough] = ForecastJob(
+            history=df_b.sort_values('ds', ignore_index=True),
+            cached_model=cached.get(borough),
+            refit=borough not in cached
+            or new_hours[borough] >= config.refit_after_hours,
         )
-        m.add_country_holidays(country_name='US')
-        m.fit(df_b)
 
-        # Predict (Next 7 days)
-        future = m.make_future_dataframe(periods=24 * 7, freq='H')
-        forecast = m.predict(future)
+    # 3. Train & Predict (Next 7 days), one borough per worker process
+    max_workers = min(config.max_workers or os.cpu_count() or 1, len(jobs) or 1)
+    context.log.info(
+        f'Forecasting {len(jobs)} borough(s) on {max_workers} process(es), '
+        f'refitting {sum(job.refit for job in jobs.values())}...'
+    )
+
+    all_forecasts = []
+    fit_seconds: dict[str, float] = {}
+    actions: dict[str, str] = {}
+    failures: dict[str, str] = {}
+    started = time.perf_counter()
+    for borough, outcome in forecast_boroughs(jobs, max_workers):
+        if isinstance(outcome, Exception):
+            context.log.warning(f'Forecast for {borough} failed: {outcome!r}')
+            failures[borough] = repr(outcome)
+            continue
+
+        context.log.info(
+            f'Forecast {borough} ({outcome.action}) in {outcome.seconds:.1f}s.'
+        )
+        fit_seconds[borough] = round(outcome.seconds, 2)
+        actions[borough] = outcome.action
+        if outcome.model is not None:
+            write_cached_model(borough, outcome.model)
 
         # Cleanup Result
-        result = forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']].copy()
+        result = outcome.forecast.copy()
         result['pickup_borough'] = borough
 
         # We only care about future data or recent data (e.g., last 30 days + future)
         # For this table, let's store everything so we can see historical fit
         all_forecasts.append(result)
+    wall = time.perf_counter() - started
 
-    # 3. Combine
+    if not all_forecasts:
+        raise Exception(f'No borough could be forecast: {failures}')
+
+    # Serial fit time over wall time (which includes worker start-up)
+    speedup = sum(fit_seconds.values()) / wall
+    context.log.info(f'Fitted in {wall:.1f}s, {speedup:.1f}x the serial time.')
+
+    # 4. Combine
     final_df = pd.concat(all_forecasts)
 
     # Rename for DB
@@ -77,12 +220,141 @@ def borough_demand_forecast(context: AssetExecutionContext, database: PostgresRe
         inplace=True,
     )
 
-    # 4. Save to Postgres
-    engine = create_engine(conn_str)
+    # 5. Save to Postgres
+    # New version loaded with COPY, then the demand_forecasts view repointed
+    conn = database.get_connection()
+    try:
+        version = publish_version(
+            conn,
+            'demand_forecasts',
+            FORECAST_SCHEMA,
+            [pl.from_pandas(final_df[list(FORECAST_SCHEMA)])],
+            config.keep_versions,
+        )
+    finally:
+        conn.close()
+    context.log.info(f'Published {version} ({len(final_df)} rows).')
+
+    return MaterializeResult(
+        metadata={
+            'boroughs': len(fit_seconds),
+            'failed_boroughs': failures,
+            'fit_seconds': fit_seconds,
+            'actions': actions,
+            'new_hours': new_hours,
+            'wall_seconds': round(wall, 2),
+            'max_workers': max_workers,
+            'speedup': round(speedup, 2),
+            'version': version,
+        }
+    )
+
 
-    # We use Replace to overwrite the forecast table daily
-    final_df.to_sql(
-        'demand_forecasts', engine, if_exists='replace', index=False, chunksize=1000
+class ZoneForecastConfig(Config):
+    data_source: str = Field(
+        default='postgres',
+        description=(
+            "Where to read demand from: 'postgres' (dm_hourly_zone_demand) or 'lake'"
+        ),
+    )
+    history_days: int = Field(
+        default=8 * 7, description='Days of history the zone models are fitted on'
+    )
+    ridge_alpha: float = Field(
+        default=1.0, description='L2 penalty of the ridge regression'
+    )
+    keep_versions: int = Field(
+        default=5, description='Published zone_demand_forecasts versions to keep'
     )
 
-    return f'Generated forecasts for {len(boroughs)} boroughs.'
+
+def _hourly_zone_demand(config: ZoneForecastConfig, conn_str: str) -> pl.DataFrame:
+    """Trips per (hour, zone) over the last `history_days` of data."""
+    if config.data_source == 'lake':
+        trips = scan_trips(columns=['pickup_datetime', 'pickup_location_id'])
+        since = trips.select(pl.col('pickup_datetime').max()).collect().item()
+        since -= datetime.timedelta(days=config.history_days)
+        return (
+            trips.filter(pl.col('pickup_datetime') >= since)
+            .group_by(
+                pl.col('pickup_datetime').dt.truncate('1h').alias('demand_hour'),
+                'pickup_location_id',
+            )
+            .agg(pl.len().cast(pl.Int64).alias('trip_count'))
+            .collect()
+        )
+
+    # Pre-aggregated by dbt (dm_hourly_zone_demand), indexed on the hour
+    query = f"""
+    SELECT
+        demand_hour,
+        pickup_location_id,
+        trip_count
+    FROM dbt_dev.dm_hourly_zone_demand
+    WHERE demand_hour >= (
+        SELECT max(demand_hour) FROM dbt_dev.dm_hourly_zone_demand
+    ) - interval '{config.history_days} days'
+    """
+    return pl.read_database_uri(query, conn_str, engine='connectorx')
+
+
+@asset(
+    group_name='analytics',
+    deps=[AssetKey('dm_hourly_zone_demand'), raw_holidays_data],
+    compute_kind='python',
+    description='Generates 7-day hourly demand forecasts per TLC zone',
+)
+def zone_demand_forecast(
+    context: AssetExecutionContext,
+    config: ZoneForecastConfig,
+    database: PostgresResource,
+) -> MaterializeResult:
+    """
+    Forecasts every zone in one batched ridge regression and publishes the
+    7-day forecast behind the zone_demand_forecasts view.
+
+    All zones share one design matrix (trend, daily and weekly Fourier
+    terms, holiday flag from the shared calendar), so fitting them is a
+    single small linear solve rather than one model per zone; see
+    utils/zone_forecasting.py. Weather is left out: its future values are
+    not known at forecast time.
+    """
+    # 1. Fetch Data
+    conn_str = database.get_connection_string()
+    demand = _hourly_zone_demand(config, conn_str).with_columns(
+        pl.col('demand_hour').dt.replace_time_zone(None)
+    )
+    context.log.info(f'Read {demand.height} zone-hours.')
+
+    # 2. Fit all zones at once & Predict (Next 7 days)
+    started = time.perf_counter()
+    forecast = forecast_zones(
+        demand, HolidayCalendar.read(), FORECAST_HORIZON_HOURS, config.ridge_alpha
+    ).cast(ZONE_FORECAST_SCHEMA)
+    fit_seconds = time.perf_counter() - started
+    zones = demand['pickup_location_id'].n_unique()
+    context.log.info(f'Forecast {zones} zone(s) in {fit_seconds:.2f}s.')
+
+    # 3. Publish as a new version behind the zone_demand_forecasts view
+    conn = database.get_connection()
+    try:
+        version = publish_version(
+            conn,
+            'zone_demand_forecasts',
+            ZONE_FORECAST_SCHEMA,
+            [forecast],
+            config.keep_versions,
+        )
+    finally:
+        conn.close()
+    context.log.info(f'Published {version}.')
+
+    return MaterializeResult(
+        metadata={
+            'zones': zones,
+            'history_hours': demand['demand_hour'].n_unique(),
+            'rows': forecast.height,
+            'fit_seconds': round(fit_seconds, 3),
+            'version': version,
+        }
+    )
@@ -1,44 +1,106 @@
-import holidays
 import polars as pl
-from dagster import AssetExecutionContext, asset
+from dagster import AssetExecutionContext, Config, MaterializeResult, asset
+from pydantic import Field
 
 from ..resources.database import PostgresResource
+from ..utils.holiday_calendar import HOLIDAY_CALENDAR_PATH, HolidayCalendar
+from ..utils.postgres import copy_frames
+
+# raw_holidays columns, primary key first
+HOLIDAY_COLUMNS = ['date', 'holiday_name', 'is_workday']
+
+
+class HolidayConfig(Config):
+    first_year: int = Field(default=2020, description='First year of the calendar')
+    last_year: int = Field(default=2027, description='Last year of the calendar')
 
 
 @asset(
     group_name='ingestion',
     compute_kind='python',
-    description='Loads NY Holidays for 2020-2027 (Full Refresh)',
+    description='Builds the NY holiday calendar file and syncs raw_holidays with it',
 )
-def raw_holidays_data(context: AssetExecutionContext, database: PostgresResource):
+def raw_holidays_data(
+    context: AssetExecutionContext, config: HolidayConfig, database: PostgresResource
+) -> MaterializeResult:
+    """
+    Publishes the NY holiday calendar for the configured years to
+    HOLIDAY_CALENDAR_PATH (memory-mapped by the API, read by training and
+    trips_lake) and mirrors it into raw_holidays for dbt.
+
+    Only rows that changed are written: unchanged holidays are left alone,
+    so re-runs leave no dead tuples and don't touch dependent views.
+    """
     # 1. Generate Data
-    years = [year for year in range(2020, 2028)]
-    ny_holidays = holidays.US(subdiv='NY', years=years)
+    calendar = HolidayCalendar.from_holidays(config.first_year, config.last_year)
+    df = calendar.frame().with_columns(pl.lit(False).alias('is_workday'))
 
-    data = [
-        {'date': date, 'holiday_name': name, 'is_workday': False}
-        for date, name in ny_holidays.items()
-    ]
+    # 2. Publish the calendar file (replaced only if its content changed)
+    written = calendar.write()
+    context.log.info(
+        f'{"Wrote" if written else "Unchanged:"} {HOLIDAY_CALENDAR_PATH} '
+        f'({len(calendar.codes)} days, {df.height} holidays)'
+    )
 
-    df = pl.DataFrame(data)
+    # 3. Sync the table with the calendar in one transaction
+    conn = database.get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS raw_holidays (
+                    date DATE PRIMARY KEY,
+                    holiday_name TEXT,
+                    is_workday BOOLEAN
+                )
+                """
+            )
+            cursor.execute(
+                'CREATE TEMP TABLE raw_holidays_stage '
+                '(LIKE raw_holidays INCLUDING DEFAULTS) ON COMMIT DROP'
+            )
 
-    # 2. Write to DB (Truncate + Append)
-    # We use Truncate + Append instead of Replace to preserve downstream dependencies (views)
-    from sqlalchemy import create_engine, inspect, text
+        copy_frames(conn, 'raw_holidays_stage', HOLIDAY_COLUMNS, [df])
 
-    conn_str = database.get_connection_string()
-    engine = create_engine(conn_str)
+        with conn.cursor() as cursor:
+            # Drop rows that are gone from the calendar or differ from it...
+            cursor.execute(
+                """
+                DELETE FROM raw_holidays h
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM raw_holidays_stage s
+                    WHERE s.date = h.date
+                      AND s.holiday_name IS NOT DISTINCT FROM h.holiday_name
+                      AND s.is_workday IS NOT DISTINCT FROM h.is_workday
+                )
+                """
+            )
+            rows_deleted = cursor.rowcount
+            # ...and insert whatever the table is now missing
+            columns = ', '.join(HOLIDAY_COLUMNS)
+            cursor.execute(
+                f"""
+                INSERT INTO raw_holidays ({columns})
+                SELECT {columns} FROM raw_holidays_stage s
+                WHERE NOT EXISTS (SELECT 1 FROM raw_holidays h WHERE h.date = s.date)
+                """
+            )
+            rows_inserted = cursor.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
 
-    if inspect(engine).has_table('raw_holidays'):
-        with engine.connect() as conn:
-            with conn.begin():
-                conn.execute(text('TRUNCATE TABLE raw_holidays'))
+    context.log.info(f'raw_holidays: {rows_inserted} inserted, {rows_deleted} removed.')
 
-    df.write_database(
-        table_name='raw_holidays',
-        connection=conn_str,
-        if_table_exists='append',
-        engine='sqlalchemy',
+    return MaterializeResult(
+        metadata={
+            'calendar_path': HOLIDAY_CALENDAR_PATH,
+            'calendar_written': written,
+            'holidays': df.height,
+            'rows_inserted': rows_inserted,
+            'rows_deleted': rows_deleted,
+        }
     )
-
-    return 'Holidays Refreshed'
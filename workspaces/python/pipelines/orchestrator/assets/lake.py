@@ -0,0 +1,179 @@
+import os
+from pathlib import Path
+
+import polars as pl
+from dagster import AssetExecutionContext, MaterializeResult, asset
+
+from ..resources.database import PostgresResource
+from ..utils.holiday_calendar import HolidayCalendar
+from ..utils.lake import write_trips_partition
+from ..utils.parquet import PICKUP_COLUMN, conform_frame, resolve_columns
+from .holidays import raw_holidays_data
+from .ingestion import (
+    RAW_DATA_PATH,
+    RAW_TRIPS_SCHEMA,
+    monthly_partitions,
+    raw_trips_table,
+)
+from .weather import DEFAULT_STATION_ID, load_stations, raw_weather_data
+
+# The same zone lookup dbt seeds into the warehouse
+ZONE_LOOKUP_PATH = (
+    Path(__file__).parents[2] / 'transformations' / 'seeds' / 'taxi_zone_lookup.csv'
+)
+
+# Mirrors the payment_type CASE in stg_yellow_tripdata
+PAYMENT_TYPES = {
+    1: 'Credit Card',
+    2: 'Cash',
+    3: 'No Charge',
+    4: 'Dispute',
+    5: 'Unknown',
+    6: 'Voided trip',
+}
+
+
+@asset(
+    group_name='ingestion',
+    partitions_def=monthly_partitions,
+    deps=[raw_trips_table, raw_weather_data, raw_holidays_data],
+    compute_kind='polars',
+    description='Cleaned, enriched trips as a hive-partitioned Parquet dataset',
+)
+def trips_lake(
+    context: AssetExecutionContext, database: PostgresResource
+) -> MaterializeResult:
+    """
+    3. LAKE: Writes the month's trips to LAKE_PATH/trips/year=YYYY/month=MM.
+
+    Rows and columns match fct_trips (zones, weather and holidays joined, same
+    outlier filters), but are built from the raw Parquet file already on disk
+    and streamed to Parquet, so large analytical reads can use
+    `utils.lake.scan_trips` instead of pulling rows out of Postgres.
+    """
+    yyyy_mm = context.partition_key[:7]
+    parquet_path = f'{RAW_DATA_PATH}/yellow_tripdata_{yyyy_mm}.parquet'
+
+    time_window = context.partition_time_window
+    start_dt = time_window.start.replace(tzinfo=None)
+    end_dt = time_window.end.replace(tzinfo=None)
+
+    # 1. The month's raw trips, conformed exactly as raw_yellow_trips loads them
+    columns = resolve_columns(parquet_path, RAW_TRIPS_SCHEMA)
+    trips = conform_frame(
+        pl.scan_parquet(parquet_path), RAW_TRIPS_SCHEMA, columns
+    ).filter(pl.col(PICKUP_COLUMN).is_between(start_dt, end_dt, closed='left'))
+
+    # 2. Enrichment tables (small: a month of hours per station, a few dozen
+    # holidays)
+    conn_str = database.get_connection_string()
+    weather = pl.read_database_uri(
+        f"""
+        SELECT station_id, timestamp, temp_c, precip_mm, snow_cm
+        FROM raw_weather
+        WHERE timestamp >= '{start_dt}' AND timestamp < '{end_dt}'
+        """,
+        conn_str,
+        engine='connectorx',
+    ).select(
+        pl.col('station_id').cast(pl.Int16),
+        pl.col('timestamp').alias('weather_timestamp'),
+        'temp_c',
+        'precip_mm',
+        ((pl.col('precip_mm') > 0.5) | (pl.col('snow_cm') > 0.5)).alias(
+            'is_bad_weather'
+        ),
+    )
+    # From the calendar file raw_holidays_data publishes (same rows as raw_holidays)
+    holidays = HolidayCalendar.read().frame().rename({'date': 'holiday_date'})
+    zones = pl.read_csv(ZONE_LOOKUP_PATH, columns=['LocationID', 'Borough', 'Zone'])
+
+    # Mirrors zone_weather_stations: the station of the pickup zone's borough
+    zone_stations = (
+        zones.join(
+            load_stations().select('borough', 'station_id'),
+            left_on='Borough',
+            right_on='borough',
+            how='left',
+        )
+        .select(
+            pl.col('LocationID').cast(pl.Int16).alias('pickup_location_id'),
+            pl.col('station_id').fill_null(DEFAULT_STATION_ID),
+        )
+        .lazy()
+    )
+
+    def zone(prefix: str) -> pl.LazyFrame:
+        return zones.lazy().select(
+            pl.col('LocationID').cast(pl.Int16).alias(f'{prefix}_location_id'),
+            pl.col('Borough').alias(f'{prefix}_borough'),
+            pl.col('Zone').alias(f'{prefix}_zone'),
+        )
+
+    # 3. Same shape and filters as fct_trips
+    enriched = (
+        trips.select(
+            pl.col('VendorID').alias('vendor_id'),
+            pl.lit('Yellow').alias('service_type'),
+            pl.col('PULocationID').alias('pickup_location_id'),
+            pl.col('DOLocationID').alias('dropoff_location_id'),
+            pl.col('tpep_pickup_datetime').alias('pickup_datetime'),
+            pl.col('tpep_dropoff_datetime').alias('dropoff_datetime'),
+            'trip_distance',
+            'fare_amount',
+            'tip_amount',
+            'total_amount',
+            pl.col('payment_type')
+            .replace_strict(PAYMENT_TYPES, default='Empty', return_dtype=pl.String)
+            .alias('payment_type_description'),
+        )
+        .filter(
+            (pl.col('trip_distance') > 0)
+            & (pl.col('fare_amount') > 0)
+            & (pl.col('total_amount') < 5000)
+        )
+        .join(zone('pickup'), on='pickup_location_id')
+        .join(zone('dropoff'), on='dropoff_location_id')
+        .with_columns(
+            pl.col('pickup_datetime').dt.truncate('1h').alias('weather_timestamp'),
+            pl.col('pickup_datetime').dt.date().alias('holiday_date'),
+        )
+        .join(zone_stations, on='pickup_location_id')
+        .join(weather.lazy(), on=['station_id', 'weather_timestamp'], how='left')
+        .join(holidays.lazy(), on='holiday_date', how='left')
+        .select(
+            'vendor_id',
+            'service_type',
+            'pickup_location_id',
+            'pickup_borough',
+            'pickup_zone',
+            'dropoff_location_id',
+            'dropoff_borough',
+            'dropoff_zone',
+            'pickup_datetime',
+            'dropoff_datetime',
+            'trip_distance',
+            'fare_amount',
+            'tip_amount',
+            'total_amount',
+            'payment_type_description',
+            'temp_c',
+            'precip_mm',
+            'is_bad_weather',
+            pl.col('holiday_name').fill_null('Non-Holiday'),
+            pl.col('holiday_name').is_not_null().alias('is_holiday'),
+        )
+    )
+
+    # 4. Stream to the lake, replacing the month atomically
+    path = write_trips_partition(enriched, start_dt.year, start_dt.month)
+    rows = pl.scan_parquet(path).select(pl.len()).collect().item()
+    context.log.info(f'Wrote {rows} trips to {path}')
+
+    return MaterializeResult(
+        metadata={
+            'path': path,
+            'rows': rows,
+            'file_size': os.path.getsize(path),
+        }
+    )
@@ -6,9 +6,17 @@ from dagster import AssetExecutionContext, AssetKey, Config, asset
 
 class TrainingConfig(Config):
     model_type: str = 'xgboost'
+    encoding: str = 'onehot'  # 'onehot', 'sparse' or 'native' (xgboost only)
     n_estimators: int = 100
     learning_rate: float = 0.05
     max_depth: int = 10
+    data_source: str = 'postgres'  # 'postgres' (fct_trips) or 'lake'
+    # First pickup date (YYYY-MM-DD). Empty: the last DATA_DEFAULT_MONTHS
+    # (3) months of data, or all history with streaming
+    start_date: str = ''
+    end_date: str = ''  # Pickup date to stop before; empty = up to now
+    feature_cache: bool = True  # Reuse features until fct_trips changes
+    streaming: bool = False  # Out-of-core XGBoost, for windows beyond memory
 
 
 @asset(
@@ -29,13 +37,25 @@ def price_model_training(context: AssetExecutionContext, config: TrainingConfig)
         'analytics.training.train_model',
         '--model_type',
         config.model_type,
+        '--encoding',
+        config.encoding,
         '--n_estimators',
         str(config.n_estimators),
         '--learning_rate',
         str(config.learning_rate),
         '--max_depth',
         str(config.max_depth),
+        '--data_source',
+        config.data_source,
     ]
+    if config.start_date:
+        cmd += ['--start_date', config.start_date]
+    if config.end_date:
+        cmd += ['--end_date', config.end_date]
+    if not config.feature_cache:
+        cmd.append('--no_cache')
+    if config.streaming:
+        cmd.append('--streaming')
 
     # Run script
     # We pass the current environment variables so it inherits DB credentials
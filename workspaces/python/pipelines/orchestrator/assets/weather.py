@@ -1,71 +1,110 @@
-import httpx
+import time
+from pathlib import Path
+
 import polars as pl
-from dagster import AssetExecutionContext, asset
-from sqlalchemy import create_engine, text
+from dagster import (
+    AssetExecutionContext,
+    BackfillPolicy,
+    Config,
+    MaterializeResult,
+    asset,
+)
+from pydantic import Field
 
 from ..resources.database import PostgresResource
+from ..resources.open_meteo import OpenMeteoResource
+from ..utils.postgres import copy_frames, table_layout
 from .ingestion import monthly_partitions
 
-# NYC Central Park Coordinates
-LAT = 40.7831
-LON = -73.9712
+# The station grid dbt seeds into the warehouse (one station per borough);
+# zone_weather_stations maps every taxi zone to one of them
+STATIONS_PATH = (
+    Path(__file__).parents[2] / 'transformations' / 'seeds' / 'weather_stations.csv'
+)
+# Central Park: zones outside the grid, and rows loaded before it existed
+DEFAULT_STATION_ID = 1
+
+# raw_weather columns, primary key first
+WEATHER_KEY = ['station_id', 'timestamp']
+WEATHER_COLUMNS = [*WEATHER_KEY, 'temp_c', 'precip_mm', 'snow_cm', 'wind_kmh']
 
 
-@asset(group_name='ingestion', partitions_def=monthly_partitions, compute_kind='python')
-def raw_weather_data(context: AssetExecutionContext, database: PostgresResource):
+class WeatherConfig(Config):
+    station_ids: list[int] = Field(
+        default=[],
+        description='Stations to fetch from weather_stations.csv (empty = all)',
+    )
+
+
+def load_stations(path: Path = STATIONS_PATH) -> pl.DataFrame:
+    """The weather station grid: station_id, station_name, borough, lat/lon."""
+    return pl.read_csv(path, schema_overrides={'station_id': pl.Int16})
+
+
+@asset(
+    group_name='ingestion',
+    partitions_def=monthly_partitions,
+    compute_kind='python',
+    # A backfill runs once over the whole range, so months can be coalesced
+    # into a few large (and concurrent) requests
+    backfill_policy=BackfillPolicy.single_run(),
+)
+def raw_weather_data(
+    context: AssetExecutionContext,
+    config: WeatherConfig,
+    database: PostgresResource,
+    open_meteo: OpenMeteoResource,
+) -> MaterializeResult:
     """
-    Ingests hourly weather data for the specific partition month.
-    Uses 'Delete-Write' pattern for idempotency.
+    Ingests hourly weather data for the partition month(s) at every station
+    of the grid.
+    Upserts on the (station_id, timestamp) primary key (COPY into a temp
+    table, then one INSERT ... ON CONFLICT) in a single transaction, so
+    re-runs are idempotent and readers never see the window half-loaded.
+
+    Stations are fetched concurrently; months already in the Open-Meteo
+    response cache are not re-fetched.
     """
-    # 1. Get Partition Window (Start/End of the month)
+    # 1. Get Partition Window (Start/End of the month, or of the backfill range)
     # Dagster provides these as datetime objects
     time_window = context.partition_time_window
     start_dt = time_window.start
     end_dt = time_window.end
-
-    # Open-Meteo requires YYYY-MM-DD.
-    # Note: end_dt in Dagster is exclusive (2024-02-01), but API usually wants inclusive range.
-    # Open-Meteo handles ranges well, but let's be precise.
-    # We subtract 1 second to get the last day of the previous month
     api_start = start_dt.strftime('%Y-%m-%d')
-    api_end = (end_dt).strftime(
-        '%Y-%m-%d'
-    )  # Open-Meteo is inclusive, fetching overlap is fine as we dedup/delete
-
-    context.log.info(f'Fetching weather for: {api_start} to {api_end}')
-
-    # 2. Fetch Data (Using httpx)
-    url = 'https://archive-api.open-meteo.com/v1/archive'
-    params = {
-        'latitude': LAT,
-        'longitude': LON,
-        'start_date': api_start,
-        'end_date': api_end,
-        'hourly': 'temperature_2m,precipitation,rain,snowfall,windspeed_10m',
-        'timezone': 'America/New_York',
-    }
-
-    # Synchronous httpx request (Async not strictly needed inside a sync asset)
-    with httpx.Client() as client:
-        response = client.get(url, params=params)
-        response.raise_for_status()
-        data = response.json()
 
-    # 3. Parse to Polars
-    hourly = data['hourly']
-    df = pl.DataFrame(
+    stations = load_stations()
+    if config.station_ids:
+        stations = stations.filter(pl.col('station_id').is_in(config.station_ids))
+    station_ids = stations['station_id'].to_list()
+
+    context.log.info(
+        f'Fetching weather for: {api_start} to {end_dt:%Y-%m-%d} '
+        f'at {len(station_ids)} station(s)'
+    )
+
+    # 2. Fetch Data (cached, coalesced and concurrent across stations)
+    hourly, stats = open_meteo.fetch_hourly(
         {
-            'time': hourly['time'],
-            'temp_c': hourly['temperature_2m'],
-            'precip_mm': hourly['precipitation'],
-            'snow_cm': hourly['snowfall'],
-            'wind_kmh': hourly['windspeed_10m'],
-        }
+            str(row['station_id']): (row['latitude'], row['longitude'])
+            for row in stations.iter_rows(named=True)
+        },
+        start_dt.date(),
+        end_dt.date(),
+    )
+    context.log.info(
+        f'{stats["cache_hits"]} month(s) from cache, '
+        f'{stats["cache_misses"]} fetched in {stats["requests"]} request(s).'
     )
 
-    # Convert string ISO time to Timestamp
-    df = df.with_columns(pl.col('time').str.to_datetime().alias('timestamp'))
-    df = df.drop('time')
+    # 3. Parse to Polars
+    df = hourly.select(
+        pl.col('location').cast(pl.Int16).alias('station_id'),
+        'timestamp',
+        pl.col('temperature_2m').alias('temp_c'),
+        pl.col('precipitation').alias('precip_mm'),
+        pl.col('snowfall').alias('snow_cm'),
+        pl.col('windspeed_10m').alias('wind_kmh'),
+    )
 
     # Filter to strictly match the partition window (to clean up API overlap)
     # Fix: Convert Dagster's aware datetimes to naive to match Polars (which is naive from API)
@@ -77,38 +116,102 @@ def raw_weather_data(context: AssetExecutionContext, database: PostgresResource)
 
     context.log.info(f'Retrieved {df.height} hourly weather records.')
 
-    # 4. Database Load (Idempotent Delete-Write)
-    connection_string = database.get_connection_string()
-    engine = create_engine(connection_string)
-
-    with engine.connect() as conn:
-        # Create table if not exists (One-time setup, or manage via dbt)
-        conn.execute(
-            text("""
-            CREATE TABLE IF NOT EXISTS raw_weather (
-                timestamp TIMESTAMP PRIMARY KEY,
-                temp_c FLOAT,
-                precip_mm FLOAT,
-                snow_cm FLOAT,
-                wind_kmh FLOAT
-            )
-        """)
-        )
+    # The API repeats a local hour when clocks fall back; keep one per key
+    df = df.unique(subset=WEATHER_KEY, keep='last', maintain_order=True)
 
-        # DELETE existing data for this month
-        delete_query = text(
-            'DELETE FROM raw_weather WHERE timestamp >= :start AND timestamp < :end'
+    # Nothing to load (no stations selected, or an empty response); loading
+    # it would delete every stored hour of the window
+    if df.is_empty():
+        context.log.warning('No weather rows for this window; nothing loaded.')
+        return MaterializeResult(
+            metadata={'rows_loaded': 0, 'stations': len(station_ids), **stats}
         )
-        conn.execute(delete_query, {'start': start_dt_naive, 'end': end_dt_naive})
-        conn.commit()
 
-    # INSERT new data
-    # We use 'append' because we just manually cleared the conflict range
-    df.write_database(
-        table_name='raw_weather',
-        connection=connection_string,
-        if_table_exists='append',
-        engine='sqlalchemy',
-    )
+    # 4. Database Load (Idempotent upsert in one transaction)
+    started = time.perf_counter()
+    conn = database.get_connection()
+    try:
+        with conn.cursor() as cursor:
+            # Create table if not exists (One-time setup, or manage via dbt)
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS raw_weather (
+                    station_id SMALLINT NOT NULL,
+                    timestamp TIMESTAMP NOT NULL,
+                    temp_c FLOAT,
+                    precip_mm FLOAT,
+                    snow_cm FLOAT,
+                    wind_kmh FLOAT,
+                    PRIMARY KEY (station_id, timestamp)
+                )
+                """
+            )
+            # A table from before the station grid holds Central Park only
+            if 'station_id' not in table_layout(cursor, 'raw_weather'):
+                context.log.info('Adding station_id to raw_weather.')
+                cursor.execute(
+                    f"""
+                    ALTER TABLE raw_weather
+                        ADD COLUMN station_id SMALLINT NOT NULL
+                            DEFAULT {DEFAULT_STATION_ID},
+                        DROP CONSTRAINT raw_weather_pkey,
+                        ADD PRIMARY KEY (station_id, timestamp)
+                    """
+                )
+                cursor.execute(
+                    'ALTER TABLE raw_weather ALTER COLUMN station_id DROP DEFAULT'
+                )
+            cursor.execute(
+                'CREATE TEMP TABLE raw_weather_stage '
+                '(LIKE raw_weather INCLUDING DEFAULTS) ON COMMIT DROP'
+            )
 
-    return f'Loaded weather for {api_start}'
+        # COPY the window into the temp table...
+        copy_frames(conn, 'raw_weather_stage', WEATHER_COLUMNS, [df])
+
+        with conn.cursor() as cursor:
+            # ...drop hours the API no longer returns for this window...
+            cursor.execute(
+                """
+                DELETE FROM raw_weather w
+                WHERE w.station_id = ANY(%s)
+                  AND w.timestamp >= %s AND w.timestamp < %s
+                  AND NOT EXISTS (
+                      SELECT 1 FROM raw_weather_stage s
+                      WHERE s.station_id = w.station_id
+                        AND s.timestamp = w.timestamp
+                  )
+                """,
+                (station_ids, start_dt_naive, end_dt_naive),
+            )
+            # ...and merge the rest on the primary key
+            columns = ', '.join(WEATHER_COLUMNS)
+            updates = ', '.join(
+                f'{column} = EXCLUDED.{column}'
+                for column in WEATHER_COLUMNS[len(WEATHER_KEY) :]
+            )
+            cursor.execute(
+                f'INSERT INTO raw_weather ({columns}) '
+                f'SELECT {columns} FROM raw_weather_stage '
+                f'ON CONFLICT ({", ".join(WEATHER_KEY)}) DO UPDATE SET {updates}'
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    elapsed = time.perf_counter() - started
+    context.log.info(f'Upserted {df.height} rows in {elapsed * 1000:.0f} ms.')
+
+    # No output value: a single-run backfill spans many partitions, which the
+    # default IO manager can't persist
+    return MaterializeResult(
+        metadata={
+            'rows_loaded': df.height,
+            'stations': len(station_ids),
+            'load_seconds': round(elapsed, 3),
+            **stats,
+        }
+    )
@@ -3,8 +3,18 @@ import os
 from dagster import Definitions, EnvVar, load_assets_from_modules
 from dagster_dbt import DbtCliResource
 
-from .assets import compliance, dbt, forcasting, holidays, ingestion, training, weather
+from .assets import (
+    compliance,
+    dbt,
+    forcasting,
+    holidays,
+    ingestion,
+    lake,
+    training,
+    weather,
+)
 from .resources.database import PostgresResource
+from .resources.open_meteo import OpenMeteoResource
 
 # Load assets
 ingestion_assets = load_assets_from_modules([ingestion])
@@ -14,6 +24,7 @@ holidays_assets = load_assets_from_modules([holidays])
 weather_assets = load_assets_from_modules([weather])
 forcasting_assets = load_assets_from_modules([forcasting])
 compliance_assets = load_assets_from_modules([compliance])
+lake_assets = load_assets_from_modules([lake])
 
 # Define the connection using Environment Variables
 # EnvVar("VAR_NAME") tells Dagster to look for this in the system environment
@@ -35,9 +46,11 @@ defs = Definitions(
         *weather_assets,
         *forcasting_assets,
         *compliance_assets,
+        *lake_assets,
     ],
     resources={
         'database': database_resource,
+        'open_meteo': OpenMeteoResource(),
         'dbt': DbtCliResource(
             project_dir=os.getenv(
                 'DBT_PROJECT_DIR',
@@ -0,0 +1,262 @@
+import asyncio
+import calendar
+import datetime
+import email.utils
+import hashlib
+import json
+import os
+
+import httpx
+import polars as pl
+from dagster import ConfigurableResource
+from pydantic import Field
+
+# Hourly variables requested for every location
+HOURLY_VARIABLES = (
+    'temperature_2m',
+    'precipitation',
+    'rain',
+    'snowfall',
+    'windspeed_10m',
+)
+
+# The archive publishes with a few days' delay and revises the most recent
+# days; months ending closer to today than this are never cached
+ARCHIVE_LAG_DAYS = 7
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# fetch_hourly's frame when there is nothing to return
+HOURLY_SCHEMA = {
+    'location': pl.String,
+    'timestamp': pl.Datetime('us'),
+    **{variable: pl.Float64 for variable in HOURLY_VARIABLES},
+}
+
+
+class OpenMeteoResource(ConfigurableResource):
+    """
+    Client for the Open-Meteo archive API, shared by the weather assets.
+
+    Responses are cached on disk one (location, month) at a time, and only
+    for months old enough that the archive won't revise them, so re-running a
+    backfill is served from disk. Uncached months are coalesced into requests
+    spanning up to `months_per_request` contiguous months, which are fetched
+    concurrently over one HTTP client with retry and exponential backoff.
+    """
+
+    archive_url: str = Field(
+        default=os.getenv(
+            'OPEN_METEO_ARCHIVE_URL', 'https://archive-api.open-meteo.com/v1/archive'
+        ),
+        description='Archive API endpoint (overridable for local stand-ins)',
+    )
+    cache_dir: str = Field(
+        default=os.getenv(
+            'OPEN_METEO_CACHE_DIR', '/opt/dagster/app/data/cache/open_meteo'
+        ),
+        description='Directory for cached monthly responses ("" disables the cache)',
+    )
+    timezone: str = Field(default='America/New_York', description='Local time zone')
+    months_per_request: int = Field(
+        default=12, description='Contiguous uncached months coalesced per request'
+    )
+    max_concurrency: int = Field(default=4, description='Requests in flight at once')
+    max_retries: int = Field(
+        default=4, description='Retries on 429/5xx and transport errors'
+    )
+    backoff_seconds: float = Field(
+        default=1.0, description='First retry delay; doubles on every retry'
+    )
+
+    def fetch_hourly(
+        self,
+        locations: dict[str, tuple[float, float]],
+        start: datetime.date,
+        end: datetime.date,
+    ) -> tuple[pl.DataFrame, dict[str, int]]:
+        """
+        Returns hourly weather for every month in [start, end) at each of
+        `locations` (id -> (latitude, longitude)).
+
+        The frame has a `location` column, a naive local `timestamp` and one
+        column per HOURLY_VARIABLES (HOURLY_SCHEMA, even when empty). Also
+        returns request/cache counters.
+        """
+        months = _months(start, end)
+        stats = {'cache_hits': 0, 'cache_misses': 0, 'requests': 0}
+
+        hourly: dict[tuple[str, tuple[int, int]], dict] = {}
+        misses: dict[str, list[tuple[int, int]]] = {}
+        for location, point in locations.items():
+            for month in months:
+                cached = self._read_cache(point, month)
+                if cached is None:
+                    misses.setdefault(location, []).append(month)
+                else:
+                    hourly[location, month] = cached
+        stats['cache_hits'] = len(hourly)
+        stats['cache_misses'] = sum(len(missing) for missing in misses.values())
+
+        jobs = [
+            (location, locations[location], chunk)
+            for location, missing in misses.items()
+            for chunk in _coalesce(missing, self.months_per_request)
+        ]
+        stats['requests'] = len(jobs)
+        for (location, point, chunk), fetched in zip(
+            jobs, asyncio.run(self._fetch_all(jobs))
+        ):
+            for month in chunk:
+                hourly[location, month] = fetched[month]
+                self._write_cache(point, month, fetched[month])
+
+        frames = [
+            pl.DataFrame(data).select(
+                pl.lit(location).alias('location'),
+                pl.col('time').str.to_datetime().alias('timestamp'),
+                *HOURLY_VARIABLES,
+            )
+            for (location, _), data in sorted(hourly.items())
+            if data['time']
+        ]
+        if not frames:
+            return pl.DataFrame(schema=HOURLY_SCHEMA), stats
+        return pl.concat(frames, how='vertical_relaxed'), stats
+
+    async def _fetch_all(self, jobs: list) -> list[dict[tuple[int, int], dict]]:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with httpx.AsyncClient(timeout=60) as client:
+            return await asyncio.gather(
+                *(
+                    self._fetch_chunk(client, semaphore, point, chunk)
+                    for _, point, chunk in jobs
+                )
+            )
+
+    async def _fetch_chunk(
+        self,
+        client: httpx.AsyncClient,
+        semaphore: asyncio.Semaphore,
+        point: tuple[float, float],
+        chunk: list[tuple[int, int]],
+    ) -> dict[tuple[int, int], dict]:
+        """Fetches contiguous months in one request and splits them back apart."""
+        first, last = chunk[0], chunk[-1]
+        params = {
+            'latitude': point[0],
+            'longitude': point[1],
+            'start_date': datetime.date(*first, 1).isoformat(),
+            'end_date': datetime.date(*last, calendar.monthrange(*last)[1]).isoformat(),
+            'hourly': ','.join(HOURLY_VARIABLES),
+            'timezone': self.timezone,
+        }
+
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    response = await client.get(self.archive_url, params=params)
+                    if (
+                        response.status_code not in RETRY_STATUS_CODES
+                        or attempt == self.max_retries
+                    ):
+                        response.raise_for_status()
+                        break
+                    delay = _retry_after(response.headers.get('retry-after'))
+                    if delay is None:
+                        delay = self.backoff_seconds * 2**attempt
+                except httpx.TransportError:
+                    if attempt == self.max_retries:
+                        raise
+                    delay = self.backoff_seconds * 2**attempt
+                await asyncio.sleep(delay)
+
+        hourly = response.json()['hourly']
+        by_month = {month: {key: [] for key in hourly} for month in chunk}
+        for i, time in enumerate(hourly['time']):
+            month = (int(time[:4]), int(time[5:7]))
+            if month in by_month:
+                for key, values in hourly.items():
+                    by_month[month][key].append(values[i])
+        return by_month
+
+    def _cache_path(self, point: tuple[float, float], month: tuple[int, int]) -> str:
+        variant = hashlib.sha256(
+            json.dumps([self.archive_url, self.timezone, HOURLY_VARIABLES]).encode()
+        ).hexdigest()[:12]
+        return os.path.join(
+            self.cache_dir,
+            f'{point[0]:.4f}_{point[1]:.4f}',
+            f'{month[0]}-{month[1]:02d}_{variant}.json',
+        )
+
+    def _read_cache(
+        self, point: tuple[float, float], month: tuple[int, int]
+    ) -> dict | None:
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._cache_path(point, month)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_cache(
+        self, point: tuple[float, float], month: tuple[int, int], hourly: dict
+    ) -> None:
+        month_end = datetime.date(*month, calendar.monthrange(*month)[1])
+        settled = datetime.date.today() - datetime.timedelta(days=ARCHIVE_LAG_DAYS)
+        if not self.cache_dir or month_end >= settled:
+            return
+        path = self._cache_path(point, month)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(hourly, f)
+        os.replace(f'{path}.tmp', path)
+
+
+def _retry_after(value: str | None) -> float | None:
+    """
+    Seconds to wait from a Retry-After header, in either of its forms
+    (delay-seconds or an HTTP-date); None if absent or unparseable.
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:  # '-0000' parses naive; HTTP-dates are GMT
+        retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return max((retry_at - now).total_seconds(), 0.0)
+
+
+def _months(start: datetime.date, end: datetime.date) -> list[tuple[int, int]]:
+    """(year, month) of every month overlapping [start, end)."""
+    months = []
+    year, month = start.year, start.month
+    while datetime.date(year, month, 1) < end:
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def _coalesce(months: list[tuple[int, int]], size: int) -> list[list[tuple[int, int]]]:
+    """Groups sorted months into runs of contiguous months, at most `size` long."""
+    chunks: list[list[tuple[int, int]]] = []
+    for year, month in months:
+        previous = chunks[-1][-1] if chunks else None
+        contiguous = (
+            previous is not None
+            and (year * 12 + month) - (previous[0] * 12 + previous[1]) == 1
+        )
+        if contiguous and len(chunks[-1]) < size:
+            chunks[-1].append((year, month))
+        else:
+            chunks.append([(year, month)])
+    return chunks
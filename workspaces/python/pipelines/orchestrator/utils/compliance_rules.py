@@ -0,0 +1,105 @@
+from dataclasses import dataclass
+
+import polars as pl
+
+# Faster than this (door to door, including traffic) is a recording error
+MAX_SPEED_MPH = 90
+# Fare per mile above this multiple of the zone pair's median is an outlier...
+FARE_PER_MILE_RATIO = 5
+# ...on trips of at least this length, between pairs with this many trips
+# in the batch (short hops and rare pairs have no meaningful median)
+FARE_PER_MILE_MIN_MILES = 0.5
+FARE_PER_MILE_MIN_TRIPS = 20
+
+# Trips are duplicates when all of these are equal
+DUPLICATE_KEY = [
+    'vendor_id',
+    'pickup_datetime',
+    'dropoff_datetime',
+    'pickup_location_id',
+    'dropoff_location_id',
+    'total_amount',
+]
+
+_hours = pl.col('duration_seconds') / 3600
+_fare_per_mile = pl.col('fare_amount') / pl.col('trip_distance')
+_zone_pair = ['pickup_location_id', 'dropoff_location_id']
+
+
+@dataclass(frozen=True)
+class Rule:
+    """A deterministic compliance check: trips where `condition` holds are flagged."""
+
+    rule_id: str  # Written to compliance_flags.rule_id
+    description: str
+    condition: pl.Expr
+
+
+# Every rule must only need the columns read by fraud_detection_job. Window
+# expressions see one batch at a time; batches never split a pickup second.
+RULES = [
+    Rule(
+        'ImpossibleSpeed_v1',
+        f'Average speed above {MAX_SPEED_MPH} mph',
+        (pl.col('duration_seconds') > 0)
+        & (pl.col('trip_distance') / _hours > MAX_SPEED_MPH),
+    ),
+    Rule(
+        'ZeroDurationPaid_v1',
+        'Charged trip with a dropoff at or before its pickup',
+        (pl.col('duration_seconds') <= 0) & (pl.col('total_amount') > 0),
+    ),
+    Rule(
+        'FarePerMileOutlier_v1',
+        f'Fare per mile over {FARE_PER_MILE_RATIO}x the median for its zone pair',
+        (pl.col('trip_distance') >= FARE_PER_MILE_MIN_MILES)
+        & (pl.len().over(_zone_pair) >= FARE_PER_MILE_MIN_TRIPS)
+        & (
+            _fare_per_mile
+            > FARE_PER_MILE_RATIO
+            * _fare_per_mile.filter(pl.col('trip_distance') >= FARE_PER_MILE_MIN_MILES)
+            .median()
+            .over(_zone_pair)
+        ),
+    ),
+    Rule(
+        'DuplicateTrip_v1',
+        'Same vendor, times, zones and amount as another trip',
+        pl.len().over(DUPLICATE_KEY) > 1,
+    ),
+]
+
+RULE_IDS = [rule.rule_id for rule in RULES]
+
+
+def select_rules(disabled: list[str]) -> list[Rule]:
+    """The registered rules minus `disabled` (which must all be registered)."""
+    unknown = set(disabled) - set(RULE_IDS)
+    if unknown:
+        raise ValueError(f'Unknown compliance rules: {sorted(unknown)}')
+    return [rule for rule in RULES if rule.rule_id not in disabled]
+
+
+def flag_trips(trips: pl.LazyFrame, rules: list[Rule]) -> pl.LazyFrame:
+    """
+    Evaluates every rule in one pass over `trips`: one row per (trip, rule)
+    hit, with the rule's id in `rule_id`.
+
+    All conditions are computed side by side as boolean columns of a single
+    query, so Polars plans them together (shared windows run once) and
+    nothing loops per rule or per trip; only trips that break a rule are
+    then unpivoted into one row per hit.
+    """
+    if not rules:
+        return trips.with_columns(pl.lit(None, pl.String).alias('rule_id')).clear()
+    columns = trips.collect_schema().names()
+    rule_ids = [rule.rule_id for rule in rules]
+    return (
+        trips.with_columns(
+            rule.condition.fill_null(False).alias(rule.rule_id) for rule in rules
+        )
+        .filter(pl.any_horizontal(rule_ids))
+        .unpivot(on=rule_ids, index=columns, variable_name='rule_id', value_name='hit')
+        .filter(pl.col('hit'))
+        .drop('hit')
+    )
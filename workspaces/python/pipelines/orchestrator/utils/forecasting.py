@@ -0,0 +1,169 @@
+import glob
+import json
+import multiprocessing
+import os
+import re
+import time
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import pandas as pd
+from prophet import Prophet
+from prophet.serialize import model_from_json, model_to_json
+
+# Hours predicted past the end of each borough's history (7 days)
+FORECAST_HORIZON_HOURS = 24 * 7
+# Boroughs with fewer hourly observations than this are not forecast
+MIN_HISTORY_HOURS = 48
+
+# Fitted models, one JSON file per borough; shares the volume with the
+# price model
+FORECAST_MODEL_PATH = os.getenv(
+    'FORECAST_MODEL_PATH', '/opt/dagster/app/data/models/forecasting'
+)
+
+
+@dataclass
+class ForecastJob:
+    """One borough's work in a forecasting run."""
+
+    history: pd.DataFrame  # Hourly ds/y up to the latest data
+    cached_model: str | None = None  # Prophet JSON of the previous fit
+    refit: bool = True  # False: extend the cached model's predictions
+
+
+@dataclass
+class ForecastOutcome:
+    forecast: pd.DataFrame  # ds, yhat, yhat_lower, yhat_upper
+    seconds: float
+    action: str  # 'cold' fit, 'warm' fit, or 'cached' model reused
+    model: str | None = None  # Prophet JSON of a new fit, to be cached
+
+
+def new_model() -> Prophet:
+    m = Prophet(
+        yearly_seasonality=False, weekly_seasonality=True, daily_seasonality=True
+    )
+    m.add_country_holidays(country_name='US')
+    return m
+
+
+def warm_start_params(m: Prophet) -> dict:
+    """A fitted model's parameters, as `init` for the next fit."""
+    return {
+        'k': m.params['k'][0][0],
+        'm': m.params['m'][0][0],
+        'sigma_obs': m.params['sigma_obs'][0][0],
+        'delta': m.params['delta'][0],
+        'beta': m.params['beta'][0],
+    }
+
+
+def predict(
+    m: Prophet, until: pd.Timestamp, horizon_hours: int = FORECAST_HORIZON_HOURS
+) -> pd.DataFrame:
+    """
+    Predicts over `m`'s history and on through `horizon_hours` past `until`
+    (which may be later than the data `m` was fitted on).
+    """
+    periods = (until - m.history['ds'].max()) // pd.Timedelta(hours=1)
+    future = m.make_future_dataframe(periods=periods + horizon_hours, freq='h')
+    forecast = m.predict(future)
+    return forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']]
+
+
+def run_job(
+    job: ForecastJob, horizon_hours: int = FORECAST_HORIZON_HOURS
+) -> ForecastOutcome:
+    """
+    Process pool entry point: refits (warm-started from the cached model when
+    there is one) or reuses the cached model, then predicts.
+
+    Lives outside the asset module so spawned workers only import pandas and
+    Prophet, not Dagster and the rest of the code location.
+    """
+    started = time.perf_counter()
+    until = job.history['ds'].max()
+    previous = model_from_json(job.cached_model) if job.cached_model else None
+
+    if previous is not None and not job.refit:
+        forecast = predict(previous, until, horizon_hours)
+        return ForecastOutcome(forecast, time.perf_counter() - started, 'cached')
+
+    m, action = new_model(), 'cold'
+    if previous is not None:
+        try:
+            m.fit(job.history, init=warm_start_params(previous))
+            action = 'warm'
+        except Exception:
+            # New holidays in the history change the parameter shapes
+            m = new_model()
+    if action == 'cold':
+        m.fit(job.history)
+
+    forecast = predict(m, until, horizon_hours)
+    return ForecastOutcome(
+        forecast, time.perf_counter() - started, action, model_to_json(m)
+    )
+
+
+def forecast_boroughs(
+    jobs: dict[str, ForecastJob],
+    max_workers: int,
+    horizon_hours: int = FORECAST_HORIZON_HOURS,
+) -> Iterator[tuple[str, ForecastOutcome | Exception]]:
+    """
+    Runs `run_job` for every borough, on a process pool if `max_workers` > 1
+    and in-process otherwise.
+
+    Yields (borough, outcome) in input order, or (borough, exception) for a
+    borough whose job failed, so one bad borough doesn't take the others
+    down with it.
+    """
+    if max_workers <= 1:
+        for borough, job in jobs.items():
+            try:
+                yield borough, run_job(job, horizon_hours)
+            except Exception as e:
+                yield borough, e
+        return
+
+    # Spawned, not forked: the Dagster run process has threads of its own
+    with ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')
+    ) as pool:
+        futures = {
+            borough: pool.submit(run_job, job, horizon_hours)
+            for borough, job in jobs.items()
+        }
+        for borough, future in futures.items():
+            try:
+                yield borough, future.result()
+            except Exception as e:
+                yield borough, e
+
+
+def read_cached_models(root: str | None = None) -> dict[str, str]:
+    """Borough -> Prophet JSON of every model cached under `root`."""
+    models = {}
+    for path in glob.glob(os.path.join(root or FORECAST_MODEL_PATH, '*.json')):
+        with open(path) as f:
+            cached = json.load(f)
+        models[cached['borough']] = cached['model']
+    return models
+
+
+def write_cached_model(borough: str, model: str, root: str | None = None) -> None:
+    """Atomically replaces the borough's cached model."""
+    slug = re.sub(r'[^a-z0-9]+', '_', borough.lower()).strip('_')
+    path = os.path.join(root or FORECAST_MODEL_PATH, f'{slug}.json')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump({'borough': borough, 'model': model}, f)
+    os.replace(f'{path}.tmp', path)
+
+
+def fitted_history(model: str) -> pd.DataFrame:
+    """The ds/y history a cached model was fitted on."""
+    return model_from_json(model).history[['ds', 'y']]
@@ -0,0 +1,118 @@
+import datetime
+import os
+import struct
+
+import holidays
+import numpy as np
+import polars as pl
+
+# Shared data volume; the API and training read the same file
+HOLIDAY_CALENDAR_PATH = os.getenv(
+    'HOLIDAY_CALENDAR_PATH', '/opt/dagster/app/data/reference/holiday_calendar.bin'
+)
+
+# Layout: header, one byte per day, then the names.
+#   magic b'MFHC' | version u16 | name count u16 | first day i32 | day count u32
+# The first day is counted in days since 1970-01-01 (the physical value of a
+# Polars/Arrow Date). Day byte 0 means no holiday, n > 0 means names[n - 1].
+# Names are UTF-8, separated by newlines, and run to the end of the file.
+CALENDAR_MAGIC = b'MFHC'
+CALENDAR_VERSION = 1
+CALENDAR_HEADER = struct.Struct('<4sHHiI')
+
+EPOCH = datetime.date(1970, 1, 1)
+
+
+class HolidayCalendar:
+    """
+    NY public holidays over a range of years as a date-indexed byte array,
+    with the holiday names on the side.
+
+    The serialized form (`to_bytes`) is what the API memory-maps and training
+    reads, so "is this date a holiday" has one answer everywhere.
+    """
+
+    def __init__(self, first_day: int, codes: np.ndarray, names: list[str]):
+        self.first_day = first_day
+        self.codes = codes
+        self.names = names
+
+    @classmethod
+    def from_holidays(cls, first_year: int, last_year: int) -> 'HolidayCalendar':
+        """Builds the calendar for [first_year, last_year] from `holidays`."""
+        ny_holidays = holidays.US(subdiv='NY', years=range(first_year, last_year + 1))
+        first_day = (datetime.date(first_year, 1, 1) - EPOCH).days
+        last_day = (datetime.date(last_year, 12, 31) - EPOCH).days
+
+        names = sorted(set(ny_holidays.values()))
+        if len(names) > 255:
+            raise ValueError(f'{len(names)} holiday names do not fit in one byte')
+        code_of = {name: code for code, name in enumerate(names, start=1)}
+
+        codes = np.zeros(last_day - first_day + 1, dtype=np.uint8)
+        for date, name in ny_holidays.items():
+            codes[(date - EPOCH).days - first_day] = code_of[name]
+        return cls(first_day, codes, names)
+
+    @classmethod
+    def read(cls, path: str = HOLIDAY_CALENDAR_PATH) -> 'HolidayCalendar':
+        """Loads a calendar written by `write`."""
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version, _, first_day, days = CALENDAR_HEADER.unpack_from(data)
+        if magic != CALENDAR_MAGIC or version != CALENDAR_VERSION:
+            raise ValueError(f'{path} is not a version {CALENDAR_VERSION} calendar')
+        body_end = CALENDAR_HEADER.size + days
+        codes = np.frombuffer(
+            data, dtype=np.uint8, count=days, offset=CALENDAR_HEADER.size
+        )
+        names = data[body_end:].decode().split('\n') if len(data) > body_end else []
+        return cls(first_day, codes, names)
+
+    def to_bytes(self) -> bytes:
+        header = CALENDAR_HEADER.pack(
+            CALENDAR_MAGIC,
+            CALENDAR_VERSION,
+            len(self.names),
+            self.first_day,
+            len(self.codes),
+        )
+        return header + self.codes.tobytes() + '\n'.join(self.names).encode()
+
+    def write(self, path: str = HOLIDAY_CALENDAR_PATH) -> bool:
+        """
+        Atomically replaces the file at `path` if its content differs.
+        Returns whether it was written.
+        """
+        data = self.to_bytes()
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                if f.read() == data:
+                    return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f'{path}.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(f'{path}.tmp', path)
+        return True
+
+    def is_holiday(self, days: np.ndarray) -> np.ndarray:
+        """
+        Vectorized lookup for an array of datetime64 dates (any unit coarser
+        is truncated to the day). Dates outside the calendar are not holidays.
+        """
+        index = days.astype('datetime64[D]').astype(np.int64) - self.first_day
+        inside = (index >= 0) & (index < len(self.codes))
+        flags = np.zeros(index.shape, dtype=bool)
+        flags[inside] = self.codes[index[inside]] != 0
+        return flags
+
+    def frame(self) -> pl.DataFrame:
+        """One row per holiday: date and holiday_name."""
+        (days,) = np.nonzero(self.codes)
+        return pl.DataFrame(
+            {
+                'date': pl.Series(days + self.first_day, dtype=pl.Int32).cast(pl.Date),
+                'holiday_name': [self.names[code - 1] for code in self.codes[days]],
+            },
+            schema={'date': pl.Date, 'holiday_name': pl.String},
+        )
@@ -0,0 +1,89 @@
+import datetime
+import glob
+import os
+
+import polars as pl
+
+# Root of the local Parquet lake; shares the data volume with RAW_DATA_PATH
+LAKE_PATH = os.getenv('LAKE_PATH', '/opt/dagster/app/data/lake')
+TRIPS_DATASET = 'trips'
+
+
+def partition_path(year: int, month: int, root: str | None = None) -> str:
+    """Directory holding one month of the trips dataset (hive layout)."""
+    return os.path.join(
+        root or LAKE_PATH, TRIPS_DATASET, f'year={year}', f'month={month:02d}'
+    )
+
+
+def write_trips_partition(
+    frame: pl.LazyFrame, year: int, month: int, root: str | None = None
+) -> str:
+    """
+    Streams `frame` into the month's partition, replacing it atomically.
+
+    The file is sunk next to its final name and renamed into place, so
+    concurrent readers see either the old month or the new one.
+    """
+    directory = partition_path(year, month, root)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, 'part-0.parquet')
+    frame.sink_parquet(f'{path}.tmp', compression='zstd')
+    os.replace(f'{path}.tmp', path)
+    return path
+
+
+def trip_partitions(root: str | None = None) -> list[tuple[datetime.datetime, str]]:
+    """(first day of the month, file) of every trips partition, oldest first."""
+    pattern = os.path.join(
+        root or LAKE_PATH, TRIPS_DATASET, 'year=*', 'month=*', '*.parquet'
+    )
+    partitions = []
+    for path in glob.glob(pattern):
+        month_dir = os.path.dirname(path)
+        year = int(os.path.basename(os.path.dirname(month_dir)).split('=')[1])
+        month = int(os.path.basename(month_dir).split('=')[1])
+        partitions.append((datetime.datetime(year, month, 1), path))
+    return sorted(partitions)
+
+
+def month_after(month_start: datetime.datetime) -> datetime.datetime:
+    """First day of the month following `month_start`'s."""
+    year, month = month_start.year, month_start.month
+    return datetime.datetime(year + month // 12, month % 12 + 1, 1)
+
+
+def scan_trips(
+    start: datetime.datetime | None = None,
+    end: datetime.datetime | None = None,
+    columns: list[str] | None = None,
+    root: str | None = None,
+) -> pl.LazyFrame:
+    """
+    Lazily scans the enriched trips (same columns as fct_trips) in the lake.
+
+    Months outside [start, end) are pruned by directory before anything is
+    opened, and rows are filtered on pickup_datetime; `year` and `month` come
+    back as columns from the hive layout. Raises FileNotFoundError if no
+    month in the range has been written.
+    """
+    files = [
+        path
+        for month_start, path in trip_partitions(root)
+        if (start is None or month_after(month_start) > start)
+        and (end is None or month_start < end)
+    ]
+    if not files:
+        directory = os.path.join(root or LAKE_PATH, TRIPS_DATASET)
+        raise FileNotFoundError(
+            f'No trip partitions in {directory} for [{start}, {end})'
+        )
+
+    lf = pl.scan_parquet(files, hive_partitioning=True)
+    if start is not None:
+        lf = lf.filter(pl.col('pickup_datetime') >= start)
+    if end is not None:
+        lf = lf.filter(pl.col('pickup_datetime') < end)
+    if columns is not None:
+        lf = lf.select(columns)
+    return lf
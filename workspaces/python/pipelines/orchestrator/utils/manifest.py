@@ -0,0 +1,108 @@
+import datetime
+import hashlib
+from dataclasses import dataclass
+
+MANIFEST_TABLE = 'raw_load_manifest'
+
+# Bytes read per hashing step (keeps hashing memory flat for GB-sized files)
+HASH_BLOCK_SIZE = 1 << 20
+
+
+@dataclass
+class ManifestEntry:
+    """What was loaded for one (asset, partition) pair, and from which file."""
+
+    file_sha256: str
+    file_size: int
+    row_count: int | None = None
+    source_etag: str | None = None
+    schema_hash: str | None = None
+    loaded_at: datetime.datetime | None = None
+
+
+def file_sha256(path: str) -> str:
+    """Streams `path` through SHA-256 and returns the hex digest."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while block := f.read(HASH_BLOCK_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def ensure_manifest_table(cursor) -> None:
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE} (
+            asset_key TEXT NOT NULL,
+            partition_key TEXT NOT NULL,
+            file_sha256 TEXT NOT NULL,
+            file_size BIGINT NOT NULL,
+            row_count BIGINT,
+            source_etag TEXT,
+            schema_hash TEXT,
+            loaded_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            PRIMARY KEY (asset_key, partition_key)
+        )
+        """
+    )
+
+
+def get_entry(cursor, asset_key: str, partition_key: str) -> ManifestEntry | None:
+    """Returns the manifest entry for the partition, or None if never loaded."""
+    cursor.execute(
+        f"""
+        SELECT file_sha256, file_size, row_count, source_etag, schema_hash, loaded_at
+        FROM {MANIFEST_TABLE}
+        WHERE asset_key = %s AND partition_key = %s
+        """,
+        (asset_key, partition_key),
+    )
+    row = cursor.fetchone()
+    return ManifestEntry(*row) if row else None
+
+
+def record_entry(
+    cursor, asset_key: str, partition_key: str, entry: ManifestEntry
+) -> None:
+    """
+    Upserts the manifest entry for the partition.
+
+    Call it in the same transaction as the load itself, so the manifest can
+    never claim a file was loaded when the load rolled back.
+    """
+    cursor.execute(
+        f"""
+        INSERT INTO {MANIFEST_TABLE} (
+            asset_key, partition_key, file_sha256, file_size,
+            row_count, source_etag, schema_hash, loaded_at
+        )
+        VALUES (%s, %s, %s, %s, %s, %s, %s, now())
+        ON CONFLICT (asset_key, partition_key) DO UPDATE SET
+            file_sha256 = EXCLUDED.file_sha256,
+            file_size = EXCLUDED.file_size,
+            row_count = EXCLUDED.row_count,
+            source_etag = EXCLUDED.source_etag,
+            schema_hash = EXCLUDED.schema_hash,
+            loaded_at = EXCLUDED.loaded_at
+        """,
+        (
+            asset_key,
+            partition_key,
+            entry.file_sha256,
+            entry.file_size,
+            entry.row_count,
+            entry.source_etag,
+            entry.schema_hash,
+        ),
+    )
+
+
+def cached_metadata(entry: ManifestEntry) -> dict:
+    """Materialization metadata for a partition skipped because it's unchanged."""
+    return {
+        'skipped': True,
+        'file_sha256': entry.file_sha256,
+        'file_size': entry.file_size,
+        'row_count': entry.row_count or 0,
+        'loaded_at': entry.loaded_at.isoformat() if entry.loaded_at else '',
+    }
@@ -0,0 +1,129 @@
+import datetime
+from collections.abc import Iterator
+
+import polars as pl
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Column used to assign TLC trips to a monthly partition
+PICKUP_COLUMN = 'tpep_pickup_datetime'
+
+
+def partition_filter(start: datetime.datetime, end: datetime.datetime) -> ds.Expression:
+    """Arrow predicate selecting trips picked up in [start, end)."""
+    return (ds.field(PICKUP_COLUMN) >= start) & (ds.field(PICKUP_COLUMN) < end)
+
+
+def iter_partition_batches(
+    path: str,
+    start: datetime.datetime,
+    end: datetime.datetime,
+    batch_size: int,
+    columns: list[str] | None = None,
+    row_groups: list[int] | None = None,
+) -> Iterator[pl.DataFrame]:
+    """
+    Streams the trips of `path` that fall in [start, end) as Polars frames.
+
+    The window predicate is pushed into the Parquet scan, so row groups whose
+    statistics fall outside the month are skipped without being decoded, and
+    at most `batch_size` rows are held in memory at a time. `row_groups`
+    restricts the scan to a subset of the file (see `plan_slices`).
+    """
+    fragment = next(ds.dataset(path, format='parquet').get_fragments())
+    if row_groups is not None:
+        fragment = fragment.subset(row_group_ids=row_groups)
+
+    batches = fragment.to_batches(
+        columns=columns,
+        filter=partition_filter(start, end),
+        batch_size=batch_size,
+        # Keep read-ahead minimal: memory must scale with the batch, not the file
+        batch_readahead=1,
+    )
+    for batch in batches:
+        if batch.num_rows > 0:
+            yield pl.from_arrow(batch)
+
+
+def plan_slices(
+    path: str, start: datetime.datetime, end: datetime.datetime, parallelism: int
+) -> list[tuple[list[int] | None, datetime.datetime, datetime.datetime]]:
+    """
+    Splits a month's file into at most `parallelism` independently loadable
+    slices, each given as (row_groups, slice_start, slice_end).
+
+    Contiguous row groups are grouped into slices of roughly equal row count.
+    Files with fewer row groups than `parallelism` are split into equal
+    pickup-time ranges instead; every slice then scans the whole file but
+    keeps only its own range.
+    """
+    row_counts = [
+        row_group.num_rows
+        for row_group in next(
+            ds.dataset(path, format='parquet').get_fragments()
+        ).row_groups
+    ]
+
+    if parallelism <= 1:
+        return [(None, start, end)]
+
+    if len(row_counts) < parallelism:
+        step = (end - start) / parallelism
+        bounds = [start + step * i for i in range(parallelism)] + [end]
+        return [(None, bounds[i], bounds[i + 1]) for i in range(parallelism)]
+
+    target = sum(row_counts) / parallelism
+    slices, current, filled = [], [], 0
+    for row_group_id, num_rows in enumerate(row_counts):
+        current.append(row_group_id)
+        filled += num_rows
+        remaining_groups = len(row_counts) - row_group_id - 1
+        remaining_slices = parallelism - len(slices) - 1
+        if remaining_slices > 0 and (
+            filled >= target * (len(slices) + 1) or remaining_groups == remaining_slices
+        ):
+            slices.append(current)
+            current = []
+    slices.append(current)
+
+    return [(row_groups, start, end) for row_groups in slices]
+
+
+def resolve_columns(path: str, schema: dict[str, pl.DataType]) -> dict[str, str]:
+    """
+    Maps each canonical column in `schema` to its name in the file at `path`.
+
+    TLC has changed the casing of some columns over the years (e.g.
+    `airport_fee` vs `Airport_fee`), so the match is case-insensitive.
+    Columns the file doesn't have are left out of the mapping.
+    """
+    file_columns = {name.lower(): name for name in pq.read_schema(path).names}
+    return {
+        column: file_columns[column.lower()]
+        for column in schema
+        if column.lower() in file_columns
+    }
+
+
+def conform_frame(
+    df: pl.DataFrame | pl.LazyFrame,
+    schema: dict[str, pl.DataType],
+    columns: dict[str, str],
+) -> pl.DataFrame | pl.LazyFrame:
+    """
+    Renames, casts and orders `df` (eager or lazy) to match `schema`.
+
+    `columns` is the mapping returned by `resolve_columns`; canonical columns
+    missing from the file are filled with nulls. Casts are non-strict so
+    values that don't fit the target type (e.g. NaN counts) become null
+    instead of failing the whole month.
+    """
+    return df.select(
+        [
+            (pl.col(columns[name]) if name in columns else pl.lit(None))
+            .cast(dtype, strict=False)
+            .alias(name)
+            for name, dtype in schema.items()
+        ]
+    )
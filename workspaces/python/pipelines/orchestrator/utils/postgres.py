@@ -0,0 +1,218 @@
+import datetime
+import io
+import re
+from collections.abc import Iterable, Iterator
+
+import polars as pl
+
+# Bytes handed to psycopg2 per read() call while streaming a COPY
+COPY_BLOCK_SIZE = 1 << 20
+
+
+class CsvBatchStream(io.RawIOBase):
+    """
+    Read-only file object that encodes Polars frames to CSV on demand.
+
+    psycopg2's `copy_expert` pulls from it block by block, so a whole month
+    can be sent through one COPY while only the current batch (and its CSV
+    encoding) is ever held in memory.
+    """
+
+    def __init__(self, frames: Iterable[pl.DataFrame], columns: list[str]):
+        self._frames: Iterator[pl.DataFrame] = iter(frames)
+        self._columns = columns
+        self._chunk = b''
+        self._offset = 0
+        self.rows = 0
+        self.bytes = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        while self._offset >= len(self._chunk):
+            frame = next(self._frames, None)
+            if frame is None:
+                return b''
+            self._chunk = (
+                frame.select(self._columns).write_csv(include_header=False).encode()
+            )
+            self._offset = 0
+            self.rows += frame.height
+            self.bytes += len(self._chunk)
+
+        if size is None or size < 0:
+            size = len(self._chunk) - self._offset
+        piece = self._chunk[self._offset : self._offset + size]
+        self._offset += len(piece)
+        return piece
+
+
+def copy_frames(
+    conn, table: str, columns: list[str], frames: Iterable[pl.DataFrame]
+) -> CsvBatchStream:
+    """
+    Streams `frames` into `table` through a single COPY on `conn`.
+
+    The caller owns the transaction. Returns the drained stream, whose
+    `rows`/`bytes` counters describe what was sent.
+    """
+    stream = CsvBatchStream(frames, columns)
+    column_list = ', '.join(f'"{column}"' for column in columns)
+    with conn.cursor() as cursor:
+        cursor.copy_expert(
+            f'COPY {table} ({column_list}) FROM STDIN WITH (FORMAT csv)',
+            stream,
+            size=COPY_BLOCK_SIZE,
+        )
+    return stream
+
+
+# Postgres column types for the Polars dtypes used in explicit table schemas.
+# Spelled the way format_type() reports them so table_layout() can compare.
+PG_TYPES = {
+    pl.Int16: 'smallint',
+    pl.Int32: 'integer',
+    pl.Int64: 'bigint',
+    pl.Float32: 'real',
+    pl.Float64: 'double precision',
+    pl.Datetime: 'timestamp without time zone',
+    pl.String: 'text',
+}
+
+
+def column_definitions(schema: dict[str, pl.DataType]) -> str:
+    """Renders a Polars schema as the column list of a CREATE TABLE."""
+    return ', '.join(
+        f'"{name}" {PG_TYPES[dtype.base_type()]}' for name, dtype in schema.items()
+    )
+
+
+def table_layout(cursor, name: str) -> dict[str, str]:
+    """Returns the columns of `name` in order, mapped to their Postgres types."""
+    cursor.execute(
+        """
+        SELECT a.attname, format_type(a.atttypid, a.atttypmod)
+        FROM pg_attribute a
+        WHERE a.attrelid = %s::regclass AND a.attnum > 0 AND NOT a.attisdropped
+        ORDER BY a.attnum
+        """,
+        (name,),
+    )
+    return dict(cursor.fetchall())
+
+
+def relation_kind(cursor, name: str) -> str | None:
+    """
+    Returns the pg_class.relkind of `name` in the current schema, or None.
+
+    'r' is a plain table, 'p' a partitioned table, 'v' a view.
+    """
+    cursor.execute(
+        """
+        SELECT c.relkind
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = current_schema() AND c.relname = %s
+        """,
+        (name,),
+    )
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def swap_partition(
+    cursor, parent: str, child: str, staging: str, column: str, start, end
+) -> None:
+    """
+    Replaces the `child` range partition of `parent` with the `staging` table.
+
+    Runs inside the caller's transaction: the old child is detached and
+    dropped, and `staging` is renamed and attached for [start, end), so
+    readers see either the old month or the new one, never a mix. A `child`
+    that is a partition of another table raises ValueError rather than being
+    dropped. A CHECK
+    constraint matching the bounds is added first so ATTACH can skip its
+    validation scan; cost is O(month) regardless of the size of `parent`.
+    """
+    cursor.execute(
+        f'ALTER TABLE {staging} ADD CONSTRAINT {child}_bounds '
+        f'CHECK ({column} IS NOT NULL AND {column} >= %s AND {column} < %s)',
+        (start, end),
+    )
+
+    if relation_kind(cursor, child) is not None:
+        cursor.execute(
+            'SELECT inhparent = %s::regclass, inhparent::regclass::text '
+            'FROM pg_inherits WHERE inhrelid = %s::regclass',
+            (parent, child),
+        )
+        owner = cursor.fetchone()
+        if owner and not owner[0]:
+            # Never drop another table's partition (e.g. a renamed legacy parent's)
+            raise ValueError(f'{child} is a partition of {owner[1]}, not {parent}')
+        if owner:
+            cursor.execute(f'ALTER TABLE {parent} DETACH PARTITION {child}')
+        cursor.execute(f'DROP TABLE {child}')
+
+    cursor.execute(f'ALTER TABLE {staging} RENAME TO {child}')
+    cursor.execute(
+        f'ALTER TABLE {parent} ATTACH PARTITION {child} FOR VALUES FROM (%s) TO (%s)',
+        (start, end),
+    )
+
+
+def publish_version(
+    conn,
+    name: str,
+    schema: dict[str, pl.DataType],
+    frames: Iterable[pl.DataFrame],
+    keep: int,
+) -> str:
+    """
+    Loads `frames` into a new table `<name>_v<UTC timestamp>` (to the
+    microsecond, so back-to-back publishes get distinct tables) and points
+    the view `name` at it, keeping the newest `keep` versions.
+
+    Everything happens in one transaction, committed here: readers of `name`
+    see the previous version until the commit and the new one after, never
+    an empty or partial table. The COPY runs before the view is touched, so
+    the exclusive lock on the view is only held for the swap and the drops.
+    A plain table left at `name` by older code is dropped on first publish.
+    Returns the new version's table name.
+    """
+    version = f'{name}_v{datetime.datetime.now(datetime.UTC):%Y%m%d%H%M%S%f}'
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f'CREATE TABLE {version} ({column_definitions(schema)})')
+        copy_frames(conn, version, list(schema), frames)
+
+        with conn.cursor() as cursor:
+            if relation_kind(cursor, name) == 'r':
+                cursor.execute(f'DROP TABLE {name}')
+            cursor.execute(f'CREATE OR REPLACE VIEW {name} AS SELECT * FROM {version}')
+
+            cursor.execute(
+                """
+                SELECT c.relname
+                FROM pg_class c
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                WHERE n.nspname = current_schema() AND c.relkind = 'r'
+                  AND c.relname LIKE %s
+                """,
+                (f'{name}_v%',),
+            )
+            # Versions published before microseconds were added have 14 digits;
+            # they are prefixes of the newer stamps, so both sort in time order
+            pattern = re.compile(rf'{re.escape(name)}_v\d{{14}}(\d{{6}})?')
+            versions = sorted(
+                (table for (table,) in cursor.fetchall() if pattern.fullmatch(table)),
+                reverse=True,
+            )
+            for table in versions[max(keep, 1) :]:
+                cursor.execute(f'DROP TABLE {table}')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return version
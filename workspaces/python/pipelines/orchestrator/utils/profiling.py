@@ -0,0 +1,11 @@
+import resource
+
+
+def peak_rss_mb() -> float:
+    """
+    Returns the peak resident set size of the current process in MiB.
+
+    Dagster runs each step in its own process, so inside an asset this is the
+    high-water mark of that step (ru_maxrss is reported in KiB on Linux).
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
@@ -0,0 +1,147 @@
+import hashlib
+import os
+import struct
+import threading
+from collections.abc import Callable
+
+import httpx
+import pyarrow.parquet as pq
+
+# Tail fetched to find the footer; TLC footers are a few tens of KiB
+FOOTER_PROBE_SIZE = 64 * 1024
+# Bytes written to disk per chunk of the streamed body
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+PARQUET_MAGIC = b'PAR1'
+
+
+class ParquetDownload:
+    """
+    Downloads a remote Parquet file front to back, announcing each row group
+    as soon as its bytes have landed on disk.
+
+    The footer is fetched first with a ranged GET and written at the end of a
+    sparse `<path>.part` file, so the schema and row-group layout are known
+    before the body arrives. `download()` then streams the body in order;
+    any row group it has announced can already be read from `part_path` with
+    pyarrow. `finish()` renames the completed file to `path`.
+    """
+
+    def __init__(self, client: httpx.Client, url: str, path: str):
+        self.url = url
+        self.path = path
+        self.part_path = f'{path}.part'
+        self._client = client
+
+        self.size, self._footer, self.etag = _fetch_footer(client, url)
+        self.body_size = self.size - len(self._footer)
+        with open(self.part_path, 'wb') as f:
+            f.truncate(self.size)
+            f.seek(self.body_size)
+            f.write(self._footer)
+
+        self.metadata = pq.read_metadata(self.part_path)
+        self._row_group_ends = [
+            _row_group_end(self.metadata.row_group(i))
+            for i in range(self.metadata.num_row_groups)
+        ]
+        self.sha256: str | None = None
+
+    def download(
+        self, on_row_group: Callable[[int], None], stop: threading.Event | None = None
+    ) -> None:
+        """
+        Streams the body to disk, calling `on_row_group(index)` for every row
+        group whose byte range is complete. Returns early if `stop` is set.
+
+        The body is requested with If-Range on the footer's ETag, so a file
+        republished since the footer was read comes back whole (200) and is
+        rejected instead of being spliced onto the old footer.
+        """
+        pending = sorted(
+            range(len(self._row_group_ends)), key=self._row_group_ends.__getitem__
+        )
+        digest = hashlib.sha256()
+        received = 0
+
+        headers = {'Range': f'bytes=0-{self.body_size - 1}'}
+        # If-Range needs a strong validator
+        if self.etag and not self.etag.startswith('W/'):
+            headers['If-Range'] = self.etag
+        with (
+            open(self.part_path, 'r+b') as f,
+            self._client.stream('GET', self.url, headers=headers) as response,
+        ):
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise ValueError(
+                    f'{self.url} answered the body request with '
+                    f'{response.status_code} instead of 206: it changed since '
+                    f'its footer was read (ETag {self.etag}), or ignored the range'
+                )
+            for chunk in response.iter_bytes(DOWNLOAD_CHUNK_SIZE):
+                if stop is not None and stop.is_set():
+                    return
+                f.write(chunk)
+                digest.update(chunk)
+                received += len(chunk)
+
+                if pending and self._row_group_ends[pending[0]] <= received:
+                    # Readers open the file separately; make the bytes visible
+                    f.flush()
+                    while pending and self._row_group_ends[pending[0]] <= received:
+                        on_row_group(pending.pop(0))
+
+        if received != self.body_size:
+            raise OSError(
+                f'Download of {self.url} was truncated: '
+                f'got {received} of {self.body_size} bytes'
+            )
+
+        digest.update(self._footer)
+        self.sha256 = digest.hexdigest()
+
+    def finish(self) -> None:
+        """Moves the completed download to `path` once readers are done with it."""
+        os.replace(self.part_path, self.path)
+
+    def discard(self) -> None:
+        """Removes the partial file left behind by a failed download."""
+        if os.path.exists(self.part_path):
+            os.remove(self.part_path)
+
+
+def _fetch_footer(client: httpx.Client, url: str) -> tuple[int, bytes, str | None]:
+    """Returns (file size, footer bytes incl. length and magic, ETag) of `url`."""
+    size, tail, etag = _fetch_tail(client, url, FOOTER_PROBE_SIZE)
+    if tail[-4:] != PARQUET_MAGIC:
+        raise ValueError(f'{url} is not a Parquet file')
+
+    footer_size = struct.unpack('<I', tail[-8:-4])[0] + 8
+    if footer_size > len(tail):
+        size, tail, etag = _fetch_tail(client, url, footer_size)
+    return size, tail[-footer_size:], etag
+
+
+def _fetch_tail(
+    client: httpx.Client, url: str, length: int
+) -> tuple[int, bytes, str | None]:
+    with client.stream('GET', url, headers={'Range': f'bytes=-{length}'}) as response:
+        response.raise_for_status()
+        # Checked before reading: a server ignoring Range would send the whole file
+        if response.status_code != 206:
+            raise ValueError(f'{url} does not support range requests')
+        size = int(response.headers['content-range'].rsplit('/', 1)[1])
+        return size, response.read(), response.headers.get('etag')
+
+
+def _row_group_end(row_group: pq.RowGroupMetaData) -> int:
+    """Offset just past the last byte of `row_group`'s column chunks."""
+    end = 0
+    for i in range(row_group.num_columns):
+        column = row_group.column(i)
+        offsets = [column.data_page_offset]
+        if column.has_dictionary_page and column.dictionary_page_offset:
+            offsets.append(column.dictionary_page_offset)
+        end = max(end, min(offsets) + column.total_compressed_size)
+    return end
@@ -0,0 +1,93 @@
+import multiprocessing
+import pickle
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pandas as pd
+
+# Columns the anomaly model was trained on, in order
+ANOMALY_FEATURES = ['trip_distance', 'total_amount', 'duration_seconds']
+
+# Set in each worker process by _init_worker
+_model = None
+_features: np.ndarray | None = None
+_shared: SharedMemory | None = None
+
+
+def load_model(path: str, single_threaded: bool = False):
+    """
+    Unpickles the anomaly pipeline. Pool workers load it single-threaded:
+    parallelism comes from the processes, not from estimator threads
+    fighting over the same cores.
+    """
+    with open(path, 'rb') as f:
+        model = pickle.load(f)
+    if single_threaded:
+        for _, estimator in getattr(model, 'steps', [(None, model)]):
+            if hasattr(estimator, 'n_jobs'):
+                estimator.n_jobs = 1
+    return model
+
+
+def _init_worker(model_path: str, name: str, shape: tuple, dtype: str) -> None:
+    """Loads the model once per worker and maps the shared feature matrix."""
+    global _model, _features, _shared
+    _model = load_model(model_path, single_threaded=True)
+    _shared = SharedMemory(name=name)
+    _features = np.ndarray(shape, dtype=dtype, buffer=_shared.buf)
+
+
+def _score(model, features: np.ndarray) -> np.ndarray:
+    # A frame over the same memory (no copy), for the feature names
+    X = pd.DataFrame(features, columns=ANOMALY_FEATURES, copy=False)
+    return model.predict(X).astype(np.int8)
+
+
+def _score_chunk(start: int, stop: int) -> np.ndarray:
+    """Pool task: only the row range is pickled, and only the scores return."""
+    return _score(_model, _features[start:stop])
+
+
+def score_chunks(
+    model_path: str, features: np.ndarray, chunk_rows: int, max_workers: int
+) -> Iterator[tuple[int, int, np.ndarray]]:
+    """
+    Scores `features` (rows x ANOMALY_FEATURES) with the anomaly model in
+    chunks of `chunk_rows`, on a process pool if `max_workers` > 1 and
+    in-process otherwise.
+
+    The matrix is copied once into shared memory that every worker maps, so
+    chunks cost no pickling. Yields (start, stop, scores) in row order as
+    chunks finish, so the caller can write each chunk's flags while the
+    rest are still being scored.
+    """
+    bounds = [
+        (start, min(start + chunk_rows, len(features)))
+        for start in range(0, len(features), chunk_rows)
+    ]
+    if max_workers <= 1:
+        model = load_model(model_path)
+        for start, stop in bounds:
+            yield start, stop, _score(model, features[start:stop])
+        return
+
+    shared = SharedMemory(create=True, size=max(features.nbytes, 1))
+    try:
+        np.ndarray(features.shape, dtype=features.dtype, buffer=shared.buf)[:] = (
+            features
+        )
+        # Spawned, not forked: the Dagster run process has threads of its own
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(model_path, shared.name, features.shape, features.dtype.str),
+        ) as pool:
+            futures = [pool.submit(_score_chunk, start, stop) for start, stop in bounds]
+            for (start, stop), future in zip(bounds, futures):
+                yield start, stop, future.result()
+    finally:
+        shared.close()
+        shared.unlink()
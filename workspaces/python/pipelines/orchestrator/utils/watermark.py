@@ -0,0 +1,49 @@
+import datetime
+
+WATERMARK_TABLE = 'asset_watermarks'
+
+
+def ensure_watermark_table(cursor) -> None:
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE} (
+            asset_key TEXT PRIMARY KEY,
+            high_water_mark TIMESTAMP NOT NULL,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+        """
+    )
+
+
+def get_watermark(cursor, asset_key: str) -> datetime.datetime | None:
+    """Returns the asset's high-water mark, or None if it never processed a row."""
+    cursor.execute(
+        f'SELECT high_water_mark FROM {WATERMARK_TABLE} WHERE asset_key = %s',
+        (asset_key,),
+    )
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def set_watermark(cursor, asset_key: str, value: datetime.datetime) -> None:
+    """
+    Upserts the asset's high-water mark.
+
+    Call it in the same transaction as the writes it covers, so a run that
+    fails part-way resumes from the last batch that was actually committed.
+    """
+    cursor.execute(
+        f"""
+        INSERT INTO {WATERMARK_TABLE} (asset_key, high_water_mark, updated_at)
+        VALUES (%s, %s, now())
+        ON CONFLICT (asset_key) DO UPDATE SET
+            high_water_mark = EXCLUDED.high_water_mark,
+            updated_at = EXCLUDED.updated_at
+        """,
+        (asset_key, value),
+    )
+
+
+def clear_watermark(cursor, asset_key: str) -> None:
+    """Forgets the asset's progress; its next run starts from the beginning."""
+    cursor.execute(f'DELETE FROM {WATERMARK_TABLE} WHERE asset_key = %s', (asset_key,))
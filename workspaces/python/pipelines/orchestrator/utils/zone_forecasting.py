@@ -0,0 +1,141 @@
+from dataclasses import dataclass
+
+import numpy as np
+import polars as pl
+
+from .holiday_calendar import HolidayCalendar
+
+# Fourier orders of the daily (24h) and weekly (168h) seasonalities
+DAILY_ORDER = 6
+WEEKLY_ORDER = 4
+# Daily harmonics that shift on holidays (a holiday's profile looks like a
+# Sunday's, not a weekday's)
+HOLIDAY_DAILY_ORDER = 2
+
+# Normal quantile of the interval bounds; 80%, as Prophet's default
+INTERVAL_Z = 1.2816
+
+
+def design_matrix(
+    hours: np.ndarray, calendar: HolidayCalendar, origin: np.datetime64, span: int
+) -> np.ndarray:
+    """
+    Features shared by every zone, one row per hour in `hours`
+    (datetime64[h]): intercept, linear trend (0 at `origin`, 1 `span` hours
+    later), daily and weekly Fourier terms, and a holiday flag with its own
+    daily harmonics.
+    """
+    epoch_hours = hours.astype('datetime64[h]').astype(np.int64)
+    trend = (epoch_hours - origin.astype('datetime64[h]').astype(np.int64)) / span
+
+    def fourier(period: int, order: int) -> list[np.ndarray]:
+        angle = 2 * np.pi * (epoch_hours % period) / period
+        return [f(k * angle) for k in range(1, order + 1) for f in (np.sin, np.cos)]
+
+    holiday = calendar.is_holiday(hours).astype(np.float64)
+    columns = [
+        np.ones(len(hours)),
+        trend,
+        *fourier(24, DAILY_ORDER),
+        *fourier(24 * 7, WEEKLY_ORDER),
+        holiday,
+        *(holiday * term for term in fourier(24, HOLIDAY_DAILY_ORDER)),
+    ]
+    return np.column_stack(columns)
+
+
+def fit_ridge(X: np.ndarray, Y: np.ndarray, alpha: float) -> np.ndarray:
+    """
+    Ridge coefficients for every column of `Y` at once: one
+    (features x features) solve, whatever the number of series. The intercept
+    is not penalized.
+    """
+    penalty = alpha * np.eye(X.shape[1])
+    penalty[0, 0] = 0.0
+    return np.linalg.solve(X.T @ X + penalty, X.T @ Y)
+
+
+@dataclass
+class ZoneModel:
+    """Ridge coefficients of every zone, fitted together by `fit_zones`."""
+
+    zones: np.ndarray  # pickup_location_id of each column below
+    first: np.datetime64  # First history hour (trend origin)
+    span: int  # History hours
+    coef: np.ndarray  # (features x zones)
+    sigma: np.ndarray  # Residual std per zone, log scale
+    smearing: np.ndarray  # Retransformation factor per zone
+
+
+def fit_zones(
+    demand: pl.DataFrame, calendar: HolidayCalendar, alpha: float = 1.0
+) -> ZoneModel:
+    """
+    Fits every zone's hourly demand (demand_hour, pickup_location_id,
+    trip_count) in one batched ridge regression on log1p(trips).
+
+    Hours a zone has no row for count as zero trips.
+    """
+    hours = demand['demand_hour'].to_numpy().astype('datetime64[h]')
+    first, last = hours.min(), hours.max()
+    span = int((last - first).astype(np.int64)) + 1
+
+    # Dense (hours x zones) matrix of the history
+    zones, zone_index = np.unique(
+        demand['pickup_location_id'].to_numpy(), return_inverse=True
+    )
+    Y = np.zeros((span, len(zones)))
+    Y[(hours - first).astype(np.int64), zone_index] = demand['trip_count'].to_numpy()
+    Y = np.log1p(Y)
+
+    X = design_matrix(first + np.arange(span), calendar, first, span)
+    coef = fit_ridge(X, Y, alpha)
+    residuals = Y - X @ coef
+    # Per-zone residual spread, for the intervals, and smearing factor:
+    # expm1 of the mean log is the geometric, not arithmetic, mean demand
+    return ZoneModel(
+        zones,
+        first,
+        span,
+        coef,
+        sigma=residuals.std(axis=0),
+        smearing=np.exp(residuals).mean(axis=0),
+    )
+
+
+def predict_zones(
+    model: ZoneModel, calendar: HolidayCalendar, horizon_hours: int
+) -> pl.DataFrame:
+    """
+    Predicts `horizon_hours` past the model's history: forecast_timestamp,
+    pickup_location_id, predicted_demand, conf_lower and conf_upper.
+    """
+    future = model.first + model.span + np.arange(horizon_hours)
+    yhat = design_matrix(future, calendar, model.first, model.span) @ model.coef
+
+    def trips(log_demand: np.ndarray, scale: np.ndarray | float = 1.0) -> np.ndarray:
+        return np.clip(np.exp(log_demand) * scale - 1.0, 0.0, None).ravel()
+
+    zones = len(model.zones)
+    return pl.DataFrame(
+        {
+            'forecast_timestamp': np.repeat(future, zones).astype('datetime64[us]'),
+            'pickup_location_id': np.tile(model.zones, horizon_hours),
+            'predicted_demand': trips(yhat, model.smearing),
+            'conf_lower': trips(yhat - INTERVAL_Z * model.sigma),
+            'conf_upper': trips(yhat + INTERVAL_Z * model.sigma),
+        }
+    )
+
+
+def forecast_zones(
+    demand: pl.DataFrame,
+    calendar: HolidayCalendar,
+    horizon_hours: int,
+    alpha: float = 1.0,
+) -> pl.DataFrame:
+    """
+    Fits every zone (`fit_zones`) and predicts `horizon_hours` past the last
+    hour of `demand` (`predict_zones`), for the forecast horizon only.
+    """
+    return predict_zones(fit_zones(demand, calendar, alpha), calendar, horizon_hours)
@@ -0,0 +1,79 @@
+import os
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import psycopg2
+import pytest
+from orchestrator.resources.database import PostgresResource
+from pydantic import Field
+
+
+class _ScratchDatabase(PostgresResource):
+    """PostgresResource whose connections only see (and write) one schema."""
+
+    schema: str = Field(description='Schema put first on the search_path')
+
+    def get_connection(self):
+        return psycopg2.connect(
+            host=self.host,
+            port=self.port,
+            user=self.user,
+            password=self.password,
+            dbname=self.database,
+            options=f'-c search_path={self.schema}',
+        )
+
+
+@pytest.fixture
+def serve():
+    """
+    Starts a local HTTP server for a handler class and returns its base URL;
+    every server is shut down after the test.
+    """
+    servers = []
+
+    def start(handler: type[BaseHTTPRequestHandler]) -> str:
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f'http://127.0.0.1:{server.server_port}'
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def database():
+    """The Postgres at POSTGRES_* (defaults as in the benchmarks); skips if down."""
+    resource = PostgresResource(
+        host=os.getenv('POSTGRES_HOST', 'localhost'),
+        port=int(os.getenv('POSTGRES_PORT', '5432')),
+        user=os.getenv('POSTGRES_USER', 'admin'),
+        password=os.getenv('POSTGRES_PASSWORD', 'password'),
+        database=os.getenv('POSTGRES_DB', 'metrofleet'),
+    )
+    try:
+        resource.get_connection().close()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f'Postgres is not available: {e}')
+    return resource
+
+
+@pytest.fixture
+def scratch_database(database):
+    """`database` confined to a fresh schema, dropped after the test."""
+    schema = f'test_{uuid.uuid4().hex[:12]}'
+    conn = database.get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f'CREATE SCHEMA {schema}')
+        conn.commit()
+        yield _ScratchDatabase(**database.model_dump(), schema=schema)
+        with conn.cursor() as cursor:
+            cursor.execute(f'DROP SCHEMA {schema} CASCADE')
+        conn.commit()
+    finally:
+        conn.close()
@@ -0,0 +1,83 @@
+"""
+The holiday calendar file written by the pipelines, read back by the API and
+by training, which keep their own copies of its header.
+"""
+
+import datetime
+import importlib.util
+import os
+import sys
+
+import polars as pl
+import pytest
+from orchestrator.utils import holiday_calendar as owner
+from orchestrator.utils.holiday_calendar import HolidayCalendar
+
+WORKSPACE = os.path.join(os.path.dirname(__file__), '..', '..')
+API_MODULE = os.path.join(
+    WORKSPACE, 'apps', 'api_gateway', 'app', 'services', 'holiday_calendar.py'
+)
+DATES = pl.date_range(
+    datetime.date(2023, 12, 1), datetime.date(2026, 1, 31), eager=True
+)
+
+
+@pytest.fixture(scope='module')
+def calendar_path(tmp_path_factory) -> str:
+    path = str(tmp_path_factory.mktemp('reference') / 'holiday_calendar.bin')
+    assert HolidayCalendar.from_holidays(2024, 2025).write(path)
+    return path
+
+
+@pytest.fixture(scope='module')
+def expected(calendar_path) -> list[int]:
+    """Per DATES, from the pipelines' own reader; 0 outside 2024-2025."""
+    calendar = HolidayCalendar.read(calendar_path)
+    index = (DATES.cast(pl.Int32) - calendar.first_day).to_list()
+    flags = [int(0 <= i < len(calendar.codes) and calendar.codes[i] > 0) for i in index]
+    assert any(flags)
+    return flags
+
+
+def _assert_same_header(reader) -> None:
+    assert reader.CALENDAR_MAGIC == owner.CALENDAR_MAGIC
+    assert reader.CALENDAR_VERSION == owner.CALENDAR_VERSION
+    assert reader.CALENDAR_HEADER.format == owner.CALENDAR_HEADER.format
+
+
+def test_api_reads_the_calendar(calendar_path, expected):
+    spec = importlib.util.spec_from_file_location('api_holiday_calendar', API_MODULE)
+    reader = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(reader)
+    _assert_same_header(reader)
+
+    calendar = reader.HolidayCalendar()
+    calendar.load(calendar_path)
+    try:
+        assert calendar.is_loaded()
+        inside = [
+            (date, flag)
+            for date, flag in zip(DATES, expected, strict=True)
+            if date.year in (2024, 2025)
+        ]
+        assert [int(calendar.is_holiday(date)) for date, _ in inside] == [
+            flag for _, flag in inside
+        ]
+    finally:
+        calendar.close()
+
+
+def test_training_reads_the_calendar(calendar_path, expected):
+    # Training's dependencies aren't the pipelines'
+    for module in ('connectorx', 'dotenv', 'sklearn'):
+        pytest.importorskip(module)
+    sys.path.insert(0, WORKSPACE)
+    try:
+        from analytics.training import data_loader
+    finally:
+        sys.path.remove(WORKSPACE)
+    _assert_same_header(data_loader)
+
+    flags = data_loader.holiday_flags(DATES, calendar_path)
+
+    assert flags.to_list() == expected
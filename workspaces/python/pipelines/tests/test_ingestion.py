@@ -0,0 +1,45 @@
+"""The load manifest check raw_taxi_file uses to skip a download."""
+
+import os
+
+import pytest
+from orchestrator.assets.ingestion import _matches_manifest
+from orchestrator.utils.manifest import ManifestEntry, file_sha256
+
+ETAG = '"5f3a-2a1b"'
+
+
+@pytest.fixture
+def local_file(tmp_path) -> tuple[str, ManifestEntry]:
+    """A downloaded month and the manifest entry recorded for it."""
+    path = str(tmp_path / 'yellow_tripdata_2024-01.parquet')
+    with open(path, 'wb') as f:
+        f.write(b'PAR1' + bytes(1_000) + b'PAR1')
+    entry = ManifestEntry(
+        file_sha256=file_sha256(path),
+        file_size=os.path.getsize(path),
+        source_etag=ETAG,
+    )
+    return path, entry
+
+
+@pytest.mark.parametrize(
+    ('source_etag', 'matches'),
+    [(ETAG, True), (None, True), ('"6b10-0c2d"', False)],
+    ids=['same-etag', 'no-etag', 'new-etag'],
+)
+def test_etag_only_decides_when_the_source_reports_one(
+    local_file, source_etag, matches
+):
+    path, entry = local_file
+    assert _matches_manifest(path, entry, source_etag) is matches
+
+
+def test_without_an_etag_the_hash_decides(local_file):
+    path, entry = local_file
+    with open(path, 'r+b') as f:
+        f.write(b'XXXX')
+
+    assert not _matches_manifest(path, entry, None)
+    os.remove(path)
+    assert not _matches_manifest(path, entry, None)
@@ -0,0 +1,127 @@
+"""OpenMeteoResource against the benchmarks' local Open-Meteo archive stand-in."""
+
+import datetime
+import email.utils
+import os
+import time
+
+import httpx
+import pytest
+from benchmarks.ingestion import _ArchiveStandIn
+from orchestrator.resources.open_meteo import (
+    HOURLY_SCHEMA,
+    OpenMeteoResource,
+    _retry_after,
+)
+
+LOCATIONS = {'1': (40.78, -73.97), '2': (40.65, -73.95)}
+# A settled year: every month of it is cached
+YEAR_START = datetime.date(2023, 1, 1)
+YEAR_END = datetime.date(2024, 1, 1)
+HOURS_IN_YEAR = 365 * 24
+
+
+@pytest.fixture
+def archive(serve):
+    """Starts a fresh stand-in (own request counter); returns (handler, URL)."""
+
+    def start(fail_every: int = 0) -> tuple[type, str]:
+        handler = type(
+            '_Handler', (_ArchiveStandIn,), {'fail_every': fail_every, 'requests': 0}
+        )
+        return handler, f'{serve(handler)}/v1/archive'
+
+    return start
+
+
+def _resource(url: str, cache_dir: str = '', **overrides) -> OpenMeteoResource:
+    return OpenMeteoResource(
+        archive_url=url, cache_dir=cache_dir, backoff_seconds=0.01, **overrides
+    )
+
+
+@pytest.mark.parametrize(
+    ('months_per_request', 'requests_per_location'), [(1, 12), (5, 3), (12, 1)]
+)
+def test_months_are_coalesced(archive, months_per_request, requests_per_location):
+    handler, url = archive()
+    resource = _resource(url, months_per_request=months_per_request)
+
+    hourly, stats = resource.fetch_hourly(LOCATIONS, YEAR_START, YEAR_END)
+
+    expected = requests_per_location * len(LOCATIONS)
+    assert stats['requests'] == handler.requests == expected
+    assert hourly.height == HOURS_IN_YEAR * len(LOCATIONS)
+    assert hourly.group_by('location').len()['len'].to_list() == [HOURS_IN_YEAR] * 2
+
+
+def test_warm_cache_makes_no_requests(archive, tmp_path):
+    handler, url = archive()
+    resource = _resource(url, str(tmp_path))
+
+    cold, _ = resource.fetch_hourly(LOCATIONS, YEAR_START, YEAR_END)
+    fetched = handler.requests
+    warm, stats = resource.fetch_hourly(LOCATIONS, YEAR_START, YEAR_END)
+
+    assert handler.requests == fetched
+    assert stats == {'cache_hits': 24, 'cache_misses': 0, 'requests': 0}
+    assert warm.equals(cold)
+
+
+def test_recent_months_are_not_cached(archive, tmp_path):
+    handler, url = archive()
+    resource = _resource(url, str(tmp_path))
+    # The current month always ends within ARCHIVE_LAG_DAYS of today
+    today = datetime.date.today()
+    month_start = today.replace(day=1)
+    next_month = (month_start + datetime.timedelta(days=31)).replace(day=1)
+    location = {'1': LOCATIONS['1']}
+
+    resource.fetch_hourly(location, month_start, next_month)
+    _, stats = resource.fetch_hourly(location, month_start, next_month)
+
+    assert stats == {'cache_hits': 0, 'cache_misses': 1, 'requests': 1}
+    assert handler.requests == 2
+    assert not os.listdir(tmp_path)
+
+
+def test_retries_after_503(archive):
+    # Every second request fails, so each one-month request after the first
+    # is answered 503 once before it succeeds
+    handler, url = archive(fail_every=2)
+    resource = _resource(url, months_per_request=1, max_concurrency=1)
+
+    hourly, stats = resource.fetch_hourly(
+        {'1': LOCATIONS['1']}, YEAR_START, datetime.date(2023, 4, 1)
+    )
+
+    assert stats['requests'] == 3
+    assert handler.requests == 5
+    assert hourly.height == (31 + 28 + 31) * 24
+
+
+def test_gives_up_after_max_retries(archive):
+    handler, url = archive(fail_every=1)
+    resource = _resource(url, max_retries=2)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        resource.fetch_hourly({'1': LOCATIONS['1']}, YEAR_START, YEAR_END)
+    assert handler.requests == 3
+
+
+def test_retry_after_parses_both_forms():
+    assert _retry_after('2') == 2.0
+    in_a_minute = email.utils.formatdate(time.time() + 60, usegmt=True)
+    assert 55 < _retry_after(in_a_minute) <= 60
+    assert _retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+    assert _retry_after('soon') is None
+    assert _retry_after(None) is None
+
+
+def test_nothing_to_fetch_keeps_the_schema(archive):
+    _, url = archive()
+    hourly, stats = _resource(url).fetch_hourly({}, YEAR_START, YEAR_END)
+
+    assert hourly.is_empty()
+    assert hourly.schema == HOURLY_SCHEMA
+    assert stats['requests'] == 0
@@ -0,0 +1,98 @@
+"""orchestrator.utils.postgres helpers, in a scratch schema."""
+
+import datetime
+import logging
+
+import polars as pl
+from orchestrator.assets.ingestion import RAW_TRIPS_TABLE, _ensure_partitioned_table
+from orchestrator.utils.parquet import PICKUP_COLUMN
+from orchestrator.utils.postgres import publish_version, swap_partition
+
+SCHEMA = {'zone': pl.Int16, 'trips': pl.Float64}
+CHILD = f'{RAW_TRIPS_TABLE}_p2024_01'
+
+
+class _Context:
+    log = logging.getLogger(__name__)
+
+
+def _tables(cursor, prefix: str) -> list[str]:
+    cursor.execute(
+        """
+        SELECT relname FROM pg_class
+        WHERE relnamespace = current_schema()::regnamespace
+          AND relkind = 'r' AND relname LIKE %s
+        ORDER BY relname
+        """,
+        (f'{prefix}%',),
+    )
+    return [table for (table,) in cursor.fetchall()]
+
+
+def test_back_to_back_publishes_get_their_own_version(scratch_database):
+    conn = scratch_database.get_connection()
+    try:
+        with conn.cursor() as cursor:
+            # Left by the one-second naming; oldest, so pruned first
+            cursor.execute('CREATE TABLE forecasts_v20240101000000 (zone smallint)')
+        conn.commit()
+
+        versions = [
+            publish_version(
+                conn,
+                'forecasts',
+                SCHEMA,
+                [pl.DataFrame({'zone': [n], 'trips': [n]})],
+                2,
+            )
+            for n in range(3)
+        ]
+
+        assert len(set(versions)) == 3
+        with conn.cursor() as cursor:
+            assert _tables(cursor, 'forecasts_v') == versions[1:]
+            cursor.execute('SELECT zone FROM forecasts')
+            assert cursor.fetchall() == [(2,)]
+    finally:
+        conn.close()
+
+
+def test_legacy_partitions_survive_the_new_parent(scratch_database):
+    conn = scratch_database.get_connection()
+    try:
+        with conn.cursor() as cursor:
+            # The old 64-bit layout, with a loaded January
+            cursor.execute(
+                f"""
+                CREATE TABLE {RAW_TRIPS_TABLE} ({PICKUP_COLUMN} timestamp, fare bigint)
+                PARTITION BY RANGE ({PICKUP_COLUMN});
+                CREATE TABLE {CHILD} PARTITION OF {RAW_TRIPS_TABLE}
+                FOR VALUES FROM ('2024-01-01') TO ('2024-02-01');
+                INSERT INTO {RAW_TRIPS_TABLE} VALUES ('2024-01-15', 1);
+                """
+            )
+            _ensure_partitioned_table(_Context(), cursor)
+            cursor.execute(
+                f'CREATE TABLE january (LIKE {RAW_TRIPS_TABLE} INCLUDING DEFAULTS)'
+            )
+            swap_partition(
+                cursor,
+                RAW_TRIPS_TABLE,
+                CHILD,
+                'january',
+                PICKUP_COLUMN,
+                datetime.datetime(2024, 1, 1),
+                datetime.datetime(2024, 2, 1),
+            )
+            (legacy,) = [
+                table
+                for table in _tables(cursor, f'{RAW_TRIPS_TABLE}_legacy_')
+                if table.endswith('_p2024_01')
+            ]
+            cursor.execute(f'SELECT count(*) FROM {legacy}')
+            assert cursor.fetchone() == (1,)
+            cursor.execute(f'SELECT count(*) FROM {RAW_TRIPS_TABLE}')
+            assert cursor.fetchone() == (0,)
+        conn.commit()
+    finally:
+        conn.close()
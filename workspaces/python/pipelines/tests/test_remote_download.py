@@ -0,0 +1,235 @@
+"""
+ParquetDownload and the fused download -> decode -> COPY path of
+raw_yellow_trips, against the benchmarks' local stand-in for the TLC CDN.
+"""
+
+import datetime
+import os
+import time
+
+import httpx
+import polars as pl
+import pyarrow.parquet as pq
+import pytest
+from benchmarks.ingestion import _TripFileStandIn
+from benchmarks.synthetic import write_trips_parquet
+from orchestrator.assets.ingestion import RAW_TRIPS_SCHEMA, _fused_copy
+from orchestrator.utils.manifest import file_sha256
+from orchestrator.utils.parquet import PICKUP_COLUMN, resolve_columns
+from orchestrator.utils.postgres import column_definitions
+from orchestrator.utils.remote import ParquetDownload
+
+FILENAME = 'yellow_tripdata_2024-01.parquet'
+MONTH_START = datetime.datetime(2024, 1, 1)
+MONTH_END = datetime.datetime(2024, 2, 1)
+
+
+class _CutOff:
+    """File-like wrapper that fails once `limit` bytes have been written."""
+
+    def __init__(self, wfile, limit: int):
+        self._wfile = wfile
+        self._left = limit
+
+    def write(self, data: bytes) -> int:
+        if len(data) > self._left:
+            raise ConnectionResetError
+        self._left -= len(data)
+        return self._wfile.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._wfile, name)
+
+
+class _TruncatingStandIn(_TripFileStandIn):
+    """Answers the body request with a clean 206 for only its first half."""
+
+    def do_GET(self):
+        requested = self.headers.get('Range', '')
+        if requested.startswith('bytes=0-'):
+            last = int(requested.removeprefix('bytes=0-'))
+            self.headers.replace_header('Range', f'bytes=0-{last // 2}')
+        super().do_GET()
+
+
+class _RangeIgnoringStandIn(_TripFileStandIn):
+    """Answers the body request with the whole file (200), like a CDN miss."""
+
+    def do_GET(self):
+        if self.headers.get('Range', '').startswith('bytes=0-'):
+            del self.headers['Range']
+        super().do_GET()
+
+
+class _DroppingStandIn(_TripFileStandIn):
+    """Closes the connection halfway through the body."""
+
+    def do_GET(self):
+        if self.headers.get('Range', '').startswith('bytes=0-'):
+            size = os.path.getsize(os.path.join(self.directory, FILENAME))
+            self.wfile = _CutOff(self.wfile, size // 2)
+        super().do_GET()
+        self.close_connection = True
+
+
+@pytest.fixture(scope='module')
+def trip_file(tmp_path_factory) -> str:
+    """A synthetic month of trips in several row groups."""
+    path = tmp_path_factory.mktemp('cdn') / FILENAME
+    write_trips_parquet(str(path), 40_000, 2024, 1, row_group_size=8_000)
+    return str(path)
+
+
+@pytest.fixture
+def cdn(serve, trip_file):
+    """Serves `trip_file`'s directory with a stand-in handler; returns its URL."""
+
+    def start(handler=_TripFileStandIn, bytes_per_second=0) -> str:
+        attributes = {
+            'directory': os.path.dirname(trip_file),
+            'bytes_per_second': bytes_per_second,
+        }
+        base_url = serve(type('_Handler', (handler,), attributes))
+        return f'{base_url}/trip-data/{FILENAME}'
+
+    return start
+
+
+@pytest.fixture
+def staging(database):
+    """A connection with an empty temp table shaped like raw_yellow_trips."""
+    conn = database.get_connection()
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TEMP TABLE fused_trips ({column_definitions(RAW_TRIPS_SCHEMA)})'
+        )
+    yield conn
+    conn.close()
+
+
+def _rows_in_month(path: str) -> int:
+    return (
+        pl.scan_parquet(path)
+        .filter(
+            (pl.col(PICKUP_COLUMN) >= MONTH_START) & (pl.col(PICKUP_COLUMN) < MONTH_END)
+        )
+        .select(pl.len())
+        .collect()
+        .item()
+    )
+
+
+def test_download_announces_each_landed_row_group(cdn, trip_file, tmp_path):
+    path = str(tmp_path / FILENAME)
+    with httpx.Client() as client:
+        download = ParquetDownload(client, cdn(), path)
+        readable = []
+
+        def on_row_group(index: int) -> None:
+            # Announced row groups must be complete on disk already
+            table = pq.ParquetFile(download.part_path).read_row_group(index)
+            readable.append((index, table.num_rows))
+
+        download.download(on_row_group)
+
+    source = pq.ParquetFile(trip_file).metadata
+    assert readable == [
+        (i, source.row_group(i).num_rows) for i in range(source.num_row_groups)
+    ]
+    assert download.etag
+    assert download.sha256 == file_sha256(trip_file)
+
+    download.finish()
+    assert not os.path.exists(download.part_path)
+    assert file_sha256(path) == file_sha256(trip_file)
+
+
+def test_fused_copy_loads_the_month(cdn, trip_file, staging, tmp_path):
+    path = str(tmp_path / FILENAME)
+    with httpx.Client() as client:
+        download = ParquetDownload(client, cdn(), path)
+        columns = resolve_columns(download.part_path, RAW_TRIPS_SCHEMA)
+        stream = _fused_copy(
+            staging, download, 'fused_trips', columns, 5_000, MONTH_START, MONTH_END
+        )
+
+    expected = _rows_in_month(trip_file)
+    with staging.cursor() as cursor:
+        cursor.execute('SELECT count(*), min(tpep_pickup_datetime) FROM fused_trips')
+        rows, first_pickup = cursor.fetchone()
+    assert stream.rows == rows == expected
+    assert first_pickup >= MONTH_START
+    assert download.sha256 == file_sha256(trip_file)
+    assert os.path.exists(path)
+    assert not os.path.exists(download.part_path)
+
+
+@pytest.mark.parametrize(
+    ('handler', 'error'),
+    [
+        (_TruncatingStandIn, OSError),
+        (_DroppingStandIn, httpx.RemoteProtocolError),
+    ],
+    ids=['truncated', 'dropped'],
+)
+def test_failed_download_is_not_kept(cdn, staging, tmp_path, handler, error):
+    path = str(tmp_path / FILENAME)
+    with httpx.Client() as client:
+        download = ParquetDownload(client, cdn(handler), path)
+        columns = resolve_columns(download.part_path, RAW_TRIPS_SCHEMA)
+        with pytest.raises(error):
+            _fused_copy(
+                staging, download, 'fused_trips', columns, 5_000, MONTH_START, MONTH_END
+            )
+
+    # Never promoted to the final name; the asset discards the partial file
+    assert download.sha256 is None
+    assert not os.path.exists(path)
+    download.discard()
+    assert not os.path.exists(download.part_path)
+
+
+def test_failed_copy_stops_the_download(cdn, trip_file, staging, tmp_path):
+    # Throttled so the full download would take several seconds
+    url = cdn(bytes_per_second=os.path.getsize(trip_file) / 5)
+    with staging.cursor() as cursor:
+        cursor.execute('ALTER TABLE fused_trips DROP COLUMN "VendorID"')
+    staging.commit()
+
+    path = str(tmp_path / FILENAME)
+    started = time.perf_counter()
+    with httpx.Client() as client:
+        download = ParquetDownload(client, url, path)
+        columns = resolve_columns(download.part_path, RAW_TRIPS_SCHEMA)
+        with pytest.raises(Exception, match='VendorID'):
+            _fused_copy(
+                staging, download, 'fused_trips', columns, 5_000, MONTH_START, MONTH_END
+            )
+
+    assert time.perf_counter() - started < 4
+    assert download.sha256 is None
+    assert not os.path.exists(path)
+
+
+def test_body_must_be_a_range(cdn, tmp_path):
+    path = str(tmp_path / FILENAME)
+    with httpx.Client() as client:
+        download = ParquetDownload(client, cdn(_RangeIgnoringStandIn), path)
+        with pytest.raises(ValueError, match='200 instead of 206'):
+            download.download(lambda index: None)
+    assert download.sha256 is None
+
+
+def test_file_republished_after_its_footer_is_rejected(cdn, trip_file, tmp_path):
+    path = str(tmp_path / FILENAME)
+    stat = os.stat(trip_file)
+    with httpx.Client() as client:
+        download = ParquetDownload(client, cdn(), path)
+        # A new ETag, as if the month were republished
+        os.utime(trip_file, (stat.st_atime, stat.st_mtime + 60))
+        try:
+            with pytest.raises(ValueError, match='changed since its footer'):
+                download.download(lambda index: None)
+        finally:
+            os.utime(trip_file, (stat.st_atime, stat.st_mtime))
+    assert download.sha256 is None
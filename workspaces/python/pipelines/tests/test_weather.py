@@ -0,0 +1,161 @@
+"""
+raw_weather_data end to end: the archive stand-in in front, a scratch
+Postgres schema behind.
+"""
+
+import datetime
+
+import pytest
+from benchmarks.ingestion import _ArchiveStandIn
+from dagster import materialize
+from orchestrator.assets.weather import (
+    DEFAULT_STATION_ID,
+    load_stations,
+    raw_weather_data,
+)
+from orchestrator.resources.open_meteo import OpenMeteoResource
+
+PARTITION_KEY = '2023-01-01'
+HOURS_IN_MONTH = 31 * 24
+STATION_IDS = load_stations()['station_id'].to_list()
+
+
+@pytest.fixture
+def open_meteo(serve):
+    handler = type('_Handler', (_ArchiveStandIn,), {'requests': 0})
+    return OpenMeteoResource(
+        archive_url=f'{serve(handler)}/v1/archive', cache_dir='', backoff_seconds=0.01
+    )
+
+
+def _materialize(database, open_meteo, station_ids=()) -> dict:
+    result = materialize(
+        [raw_weather_data],
+        partition_key=PARTITION_KEY,
+        resources={'database': database, 'open_meteo': open_meteo},
+        run_config={
+            'ops': {'raw_weather_data': {'config': {'station_ids': list(station_ids)}}}
+        },
+    )
+    assert result.success
+    (materialization,) = result.asset_materializations_for_node('raw_weather_data')
+    return {key: value.value for key, value in materialization.metadata.items()}
+
+
+def _query(database, sql: str, params=None) -> list[tuple]:
+    conn = database.get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall() if cursor.description else []
+        conn.commit()
+        return rows
+    finally:
+        conn.close()
+
+
+def _rows_per_station(database) -> dict[int, int]:
+    return dict(
+        _query(
+            database,
+            'SELECT station_id, count(*) FROM raw_weather GROUP BY 1 ORDER BY 1',
+        )
+    )
+
+
+def test_fetches_every_station(scratch_database, open_meteo):
+    metadata = _materialize(scratch_database, open_meteo)
+
+    assert metadata['stations'] == len(STATION_IDS)
+    assert metadata['requests'] == len(STATION_IDS)
+    assert metadata['rows_loaded'] == HOURS_IN_MONTH * len(STATION_IDS)
+    assert _rows_per_station(scratch_database) == dict.fromkeys(
+        STATION_IDS, HOURS_IN_MONTH
+    )
+
+
+def test_rerun_upserts_on_station_and_timestamp(scratch_database, open_meteo):
+    _materialize(scratch_database, open_meteo)
+    _query(
+        scratch_database,
+        """
+        UPDATE raw_weather SET temp_c = -99
+        WHERE station_id = 2 AND timestamp = '2023-01-10 12:00';
+        -- An hour the API doesn't return, inside and outside the window
+        INSERT INTO raw_weather (station_id, timestamp, temp_c)
+        VALUES (2, '2023-01-10 12:30', 0), (2, '2022-12-31 23:00', 0);
+        """,
+    )
+
+    metadata = _materialize(scratch_database, open_meteo, station_ids=[2])
+
+    assert metadata['rows_loaded'] == HOURS_IN_MONTH
+    counts = _rows_per_station(scratch_database)
+    assert counts == {
+        **dict.fromkeys(STATION_IDS, HOURS_IN_MONTH),
+        2: HOURS_IN_MONTH + 1,
+    }
+    # The edited hour is overwritten, the stray one inside the window removed
+    (temp_c,) = _query(
+        scratch_database,
+        'SELECT temp_c FROM raw_weather WHERE station_id = 2 '
+        "AND timestamp = '2023-01-10 12:00'",
+    )[0]
+    assert temp_c != -99
+    assert (
+        _query(
+            scratch_database,
+            'SELECT timestamp FROM raw_weather WHERE station_id = 2 '
+            'AND extract(minute FROM timestamp) <> 0',
+        )
+        == []
+    )
+
+
+def test_migrates_a_single_station_table(scratch_database, open_meteo):
+    # raw_weather as loaded before the station grid: Central Park, keyed on time
+    _query(
+        scratch_database,
+        """
+        CREATE TABLE raw_weather (
+            timestamp TIMESTAMP PRIMARY KEY,
+            temp_c FLOAT,
+            precip_mm FLOAT,
+            snow_cm FLOAT,
+            wind_kmh FLOAT
+        );
+        INSERT INTO raw_weather (timestamp, temp_c)
+        SELECT t, 1.5
+        FROM generate_series(
+            '2022-12-01'::timestamp, '2022-12-31 23:00', interval '1 hour'
+        ) AS t;
+        """,
+    )
+
+    _materialize(scratch_database, open_meteo)
+
+    counts = _rows_per_station(scratch_database)
+    assert counts[DEFAULT_STATION_ID] == 2 * HOURS_IN_MONTH
+    assert all(counts[station] == HOURS_IN_MONTH for station in STATION_IDS[1:])
+    assert _query(
+        scratch_database,
+        'SELECT count(*) FROM raw_weather WHERE timestamp < %s',
+        (datetime.datetime(2023, 1, 1),),
+    ) == [(HOURS_IN_MONTH,)]
+    (primary_key,) = _query(
+        scratch_database,
+        """
+        SELECT pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = 'raw_weather'::regclass AND contype = 'p'
+        """,
+    )
+    assert primary_key == ('PRIMARY KEY (station_id, "timestamp")',)
+    (default,) = _query(
+        scratch_database,
+        """
+        SELECT column_default FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'raw_weather'
+          AND column_name = 'station_id'
+        """,
+    )
+    assert default == (None,)
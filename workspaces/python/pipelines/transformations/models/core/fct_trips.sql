@@ -1,4 +1,8 @@
-{{ config(materialized='table') }}
+{# Indexed on pickup time: incremental marts only read the months reloaded since their last run #}
+{{ config(
+    materialized='table',
+    indexes=[{'columns': ['pickup_datetime']}]
+) }}
 
 
 with yellow_data as (
@@ -11,6 +15,10 @@ weather as (
     select * from {{ ref('stg_weather') }}
 ),
 
+weather_stations as (
+    select * from {{ ref('zone_weather_stations') }}
+),
+
 holidays as (
     select * from {{ ref('stg_holidays') }}
 ),
@@ -36,7 +44,7 @@ select
     trips.tip_amount,
     trips.total_amount,
     trips.payment_type_description,
-    -- Weather Join (Round to nearest hour)
+    -- Weather Join (pickup zone's station, round to nearest hour)
     weather.temp_c,
     weather.precip_mm,
     weather.is_bad_weather,
@@ -53,8 +61,11 @@ from
     yellow_data as trips
     inner join zones as pickup_zone on trips.pickup_location_id = pickup_zone.locationid
     inner join zones as dropoff_zone on trips.dropoff_location_id = dropoff_zone.locationid
-    -- Left Join Weather on the exact hour
-    left join weather on date_trunc('hour', trips.pickup_datetime) = weather.weather_timestamp
+    -- Left Join Weather from the pickup zone's station on the exact hour
+    inner join weather_stations as station on trips.pickup_location_id = station.location_id
+    left join weather
+        on station.station_id = weather.station_id
+        and date_trunc('hour', trips.pickup_datetime) = weather.weather_timestamp
 
 -- Left Join Holidays on the date
 left join holidays on date (trips.pickup_datetime) = holidays.holiday_date
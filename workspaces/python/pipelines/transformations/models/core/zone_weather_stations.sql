@@ -0,0 +1,21 @@
+{{ config(
+    materialized='table',
+    indexes=[{'columns': ['location_id'], 'unique': True}]
+) }}
+
+-- One weather station per taxi zone: the station of the zone's borough.
+-- Zones without one (Unknown, N/A) fall back to Central Park (station 1).
+with zones as (
+    select "LocationID" as location_id, "Borough" as borough
+    from {{ ref('taxi_zone_lookup') }}
+),
+
+stations as (
+    select station_id, borough from {{ ref('weather_stations') }}
+)
+
+select
+    zones.location_id,
+    coalesce(stations.station_id, 1)::smallint as station_id
+from zones
+left join stations on zones.borough = stations.borough
@@ -6,11 +6,11 @@ select
     service_type,
     pickup_borough,
 
-    -- Metrics
+    -- Metrics (raw amounts are real; sum in double precision)
     count(*) as total_trips,
-    sum(fare_amount) as total_fare,
-    sum(tip_amount) as total_tips,
-    sum(total_amount) as total_revenue,
+    sum(fare_amount::double precision) as total_fare,
+    sum(tip_amount::double precision) as total_tips,
+    sum(total_amount::double precision) as total_revenue,
     avg(trip_distance) as avg_distance,
     avg(total_amount) as avg_ticket_size
 
@@ -0,0 +1,40 @@
+{{ config(
+    materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key='demand_month',
+    indexes=[{'columns': ['demand_hour']}, {'columns': ['demand_month']}]
+) }}
+
+-- Trips per pickup borough and hour, rolled up from the zone mart. Rebuilds
+-- the same months the zone mart did: those whose raw_load_manifest stamp
+-- differs from the one stored here (see dm_hourly_zone_demand)
+
+{% if is_incremental() %}
+with changed_months as (
+    select loads.partition_key::date as demand_month
+    from {{ source('staging', 'raw_load_manifest') }} as loads
+    left join lateral (
+        select built.source_loaded_at
+        from {{ this }} as built
+        where built.demand_month = loads.partition_key::date
+        limit 1
+    ) as built on true
+    where loads.asset_key = 'raw_yellow_trips'
+        and built.source_loaded_at is distinct from loads.loaded_at
+)
+{% endif %}
+
+select
+    zone_demand.demand_hour,
+    zone_demand.demand_month,
+    zone_demand.pickup_borough,
+    sum(zone_demand.trip_count)::bigint as trip_count,
+    sum(zone_demand.total_revenue) as total_revenue,
+    max(zone_demand.source_loaded_at) as source_loaded_at
+from {{ ref('dm_hourly_zone_demand') }} as zone_demand
+{% if is_incremental() %}
+inner join changed_months as changed
+    on zone_demand.demand_hour >= changed.demand_month
+    and zone_demand.demand_hour < changed.demand_month + interval '1 month'
+{% endif %}
+group by 1, 2, 3
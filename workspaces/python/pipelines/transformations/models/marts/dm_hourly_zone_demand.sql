@@ -0,0 +1,54 @@
+{{ config(
+    materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key='demand_month',
+    indexes=[{'columns': ['demand_hour']}, {'columns': ['demand_month']}]
+) }}
+
+-- Trips per pickup zone and hour. raw_yellow_trips is loaded (and reloaded)
+-- one pickup month at a time, and every load stamps the month's
+-- raw_load_manifest row. Incremental runs rebuild, whole, just the months
+-- whose stamp differs from the one the mart was built from, so an older
+-- month that was reloaded gets picked up too.
+
+with loads as (
+    select
+        partition_key::date as demand_month,
+        loaded_at as source_loaded_at
+    from {{ source('staging', 'raw_load_manifest') }}
+    where asset_key = 'raw_yellow_trips'
+)
+
+{% if is_incremental() %}
+, changed_months as (
+    select loads.demand_month
+    from loads
+    left join lateral (
+        select built.source_loaded_at
+        from {{ this }} as built
+        where built.demand_month = loads.demand_month
+        limit 1
+    ) as built on true
+    where built.source_loaded_at is distinct from loads.source_loaded_at
+)
+{% endif %}
+
+select
+    date_trunc('hour', trips.pickup_datetime) as demand_hour,
+    date_trunc('month', trips.pickup_datetime)::date as demand_month,
+    trips.pickup_location_id,
+    trips.pickup_borough,
+    trips.pickup_zone,
+    count(*) as trip_count,
+    sum(trips.total_amount::double precision) as total_revenue,
+    max(loads.source_loaded_at) as source_loaded_at
+from {{ ref('fct_trips') }} as trips
+{% if is_incremental() %}
+-- A pickup-time range per changed month, so fct_trips' index is used
+inner join changed_months as changed
+    on trips.pickup_datetime >= changed.demand_month
+    and trips.pickup_datetime < changed.demand_month + interval '1 month'
+{% endif %}
+left join loads
+    on date_trunc('month', trips.pickup_datetime)::date = loads.demand_month
+group by 1, 2, 3, 4, 5
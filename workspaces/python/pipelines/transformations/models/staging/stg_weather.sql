@@ -5,6 +5,7 @@ with source as (
 
 renamed as (
     select
+        station_id,
         timestamp as weather_timestamp,
         temp_c,
         precip_mm,